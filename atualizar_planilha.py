@@ -1,10 +1,19 @@
 import pandas as pd
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
 import sys
 import openpyxl
 import numpy as np  # Importa numpy para usar np.nan
 
+from functools import partial
+
+from cache_matching import CacheMatching, CAMINHO_CACHE_PADRAO, MAX_ENTRADAS_PADRAO
+from cache_planilhas import CATEGORIA, INTEIRO, QUALQUER, TEXTO, ColunasFaltandoError, ler_excel_esquema
+from chave_documento import limpar_documento, raizes_cnpj
+from indice_cnpj import IndiceCnpj, casar_bloco_cnpjs, casar_bloco_cnpjs_dois_melhores
+from matching_paralelo import casar_em_paralelo, MAX_WORKERS_PADRAO, TAMANHO_BLOCO_PADRAO
+from memo_execucao import DIRETORIO_MEMO_PADRAO, MemoExecucao
+from varredura_limiares import MARGEM_AMBIGUIDADE_PADRAO, PASTA_VARREDURAS_PADRAO, imprimir_varredura, \
+    resumir_varredura, salvar_varredura
+
 # --- Configurações dos Arquivos e Colunas ---
 
 # Planilha Principal (que será lida e de onde a aba será extraída e atualizada)
@@ -24,141 +33,307 @@ COL_QTD_RAZAO = "RAZÃO EMPRESARIAL"  # Ainda usada para leitura, mas não para
 COL_QTD_CNPJ = "CNPJ"
 COL_QTD_QUANTIDADE = "Quantidade de Máquinas"
 
+# --- Esquemas de Leitura (colunas obrigatórias e seus tipos) ---
+# A aba de devolução é regravada inteira, então as demais colunas dela também são carregadas.
+ESQUEMA_DEVOLUCAO = {
+    COL_DEVOLUCAO_DESCRICAO: QUALQUER,
+    COL_DEVOLUCAO_CNPJ_CPF: TEXTO,
+    COL_DEVOLUCAO_POS_PLANILHA: QUALQUER,
+}
+# Da quantidade de máquinas, que é só referência, apenas estas colunas são carregadas.
+ESQUEMA_QTD_MAQUINAS = {
+    COL_QTD_RAZAO: CATEGORIA,
+    COL_QTD_CNPJ: TEXTO,
+    COL_QTD_QUANTIDADE: INTEIRO,
+}
+
 # --- Limiar para Fuzzy Matching de CNPJ ---
 # ATENÇÃO: Um valor muito baixo pode levar a falsos positivos.
 # CNPJs são identificadores únicos, e pequenas diferenças podem significar empresas diferentes.
 # Recomenda-se um limiar MUITO ALTO (ex: 90-95) para CNPJs.
 FUZZY_CNPJ_THRESHOLD = 90  # Porcentagem de similaridade (0-100). Ajuste com cautela.
 
+# --- Raiz do CNPJ (8 primeiros dígitos, comuns à matriz e às filiais) ---
+# O CNPJ é procurado primeiro entre os estabelecimentos da mesma raiz (mesma empresa); só se
+# nenhum deles atingir o limiar a busca se estende aos CNPJs das demais empresas.
+PRIORIZAR_RAIZ_CNPJ = True
+# Soma as máquinas de todos os estabelecimentos da raiz: a 'POS Planilha' recebe o total da
+# empresa, e CNPJs cuja raiz está na referência são casados pela raiz, sem fuzzy.
+SOMAR_MAQUINAS_POR_RAIZ = False
+
+# --- Paralelismo do Fuzzy Matching ---
+MATCHING_WORKERS = MAX_WORKERS_PADRAO  # Número de processos (1 = execução serial)
+MATCHING_TAMANHO_BLOCO = TAMANHO_BLOCO_PADRAO  # CNPJs enviados a cada processo por vez
+
+# --- Cache de Matching entre Execuções ---
+# Guarda o melhor match de cada CNPJ em disco: nas próximas execuções, só os CNPJs novos
+# (ou uma referência alterada) são pontuados novamente.
+USAR_CACHE_MATCHING = True
+CACHE_MATCHING_PATH = CAMINHO_CACHE_PADRAO
+CACHE_MATCHING_MAX_ENTRADAS = MAX_ENTRADAS_PADRAO
+
+# --- Varredura de Limiares (python atualizar_planilha.py --varredura) ---
+# Pontua cada CNPJ uma única vez, guardando o melhor e o segundo melhor candidato, e mostra
+# quantas linhas casariam (e quantas seriam ambíguas) em cada limiar. Não grava a planilha.
+LIMIARES_VARREDURA = list(range(81, 101))
+MARGEM_AMBIGUIDADE = MARGEM_AMBIGUIDADE_PADRAO
+PASTA_VARREDURAS = PASTA_VARREDURAS_PADRAO
+
 # --- Caminho do Novo Arquivo de Saída (apenas com a aba de devolução) ---
 NOVA_PLANILHA_SAIDA_PATH = "devolucao_maquininhas_atualizada_por_cnpj_fuzzy.xlsx"
 
-# --- Carregar Planilhas ---
-try:
-    print(f"🔄 Carregando '{PLANILHA_PRINCIPAL_PATH}' para extrair a aba '{ABA_DEVOLUCAO}'...")
-    df_devolucao = pd.read_excel(PLANILHA_PRINCIPAL_PATH, sheet_name=ABA_DEVOLUCAO)
+# --- Memória de Execuções (pular reexecuções com as mesmas entradas) ---
+# Se as planilhas de entrada, os parâmetros abaixo (abas, colunas, limiares) e o código não mudaram
+# desde a última execução, e a saída dela continua igual, o script termina sem refazer o matching.
+# Para processar mesmo assim: --forcar
+USAR_MEMO_EXECUCAO = True
+MEMO_EXECUCAO_DIRETORIO = DIRETORIO_MEMO_PADRAO
+ENTRADAS_EXECUCAO = [PLANILHA_PRINCIPAL_PATH, PLANILHA_QTD_MAQUINAS_PATH]
+SAIDA_EXECUCAO = NOVA_PLANILHA_SAIDA_PATH
+
+
+# --- Colunas Essenciais (verificadas na leitura, pelos esquemas) ---
+def informar_colunas_faltando(erro):
+    print(f"\n❌ ERRO: As seguintes colunas esperadas não foram encontradas no DataFrame de '{erro.sheet_name or erro.caminho}':")
+    for col in erro.faltando:
+        print(f"- '{col}'")
+    print(f"Colunas disponíveis: {erro.disponiveis}")
+    sys.exit(1)
 
-    print(f"🔄 Carregando '{PLANILHA_QTD_MAQUINAS_PATH}'...")
-    df_quantidade = pd.read_excel(PLANILHA_QTD_MAQUINAS_PATH)
 
-    print("✅ Planilhas carregadas com sucesso.")
+def carregar_planilhas():
+    """
+    Carrega a aba de devolução da planilha principal e a planilha de quantidade de máquinas,
+    já verificando as colunas essenciais (ESQUEMA_DEVOLUCAO e ESQUEMA_QTD_MAQUINAS).
+    As colunas de CNPJ/CPF são lidas como texto, para não virarem float.
+    """
+    try:
+        print(f"🔄 Carregando '{PLANILHA_PRINCIPAL_PATH}' para extrair a aba '{ABA_DEVOLUCAO}'...")
+        df_devolucao = ler_excel_esquema(PLANILHA_PRINCIPAL_PATH, ABA_DEVOLUCAO, ESQUEMA_DEVOLUCAO,
+                                         manter_demais_colunas=True)
 
-except FileNotFoundError as e:
-    print(
-        f"\n❌ ERRO: Arquivo não encontrado. Verifique os caminhos dos arquivos e certifique-se de que estão na mesma pasta do script.")
-    print(f"Detalhes: {e}")
-    sys.exit(1)
-except ValueError as e:  # Captura o erro específico se a aba não for encontrada
-    if f"Worksheet named '{ABA_DEVOLUCAO}' not found" in str(e):
-        print(f"\n❌ ERRO: A aba '{ABA_DEVOLUCAO}' não foi encontrada em '{PLANILHA_PRINCIPAL_PATH}'.")
-        print("Por favor, verifique o nome exato da aba na sua planilha e corrija na variável 'ABA_DEVOLUCAO'.")
-    else:
-        print(f"\n❌ Ocorreu um erro ao carregar os arquivos Excel. Detalhes: {e}")
-    sys.exit(1)
-except Exception as e:
-    print(f"\n❌ Ocorreu um erro inesperado ao carregar os arquivos Excel. Detalhes: {e}")
-    print("Verifique se os arquivos não estão abertos em outro programa e se estão no formato correto.")
-    sys.exit(1)
+        print(f"🔄 Carregando '{PLANILHA_QTD_MAQUINAS_PATH}'...")
+        df_quantidade = ler_excel_esquema(PLANILHA_QTD_MAQUINAS_PATH, 0, ESQUEMA_QTD_MAQUINAS)
+
+        print("✅ Planilhas carregadas com sucesso.")
+        print("✅ Colunas essenciais verificadas.")
 
+    except ColunasFaltandoError as e:
+        informar_colunas_faltando(e)
 
-# --- Validação de Colunas Essenciais ---
-def validar_colunas(df, df_nome_str, colunas_requeridas):
-    missing_cols = [col for col in colunas_requeridas if col not in df.columns]
-    if missing_cols:
-        print(f"\n❌ ERRO: As seguintes colunas esperadas não foram encontradas no DataFrame de '{df_nome_str}':")
-        for col in missing_cols:
-            print(f"- '{col}'")
-        print(f"Colunas disponíveis: {list(df.columns)}")
+    except FileNotFoundError as e:
+        print(
+            f"\n❌ ERRO: Arquivo não encontrado. Verifique os caminhos dos arquivos e certifique-se de que estão na mesma pasta do script.")
+        print(f"Detalhes: {e}")
+        sys.exit(1)
+    except ValueError as e:  # Captura o erro específico se a aba não for encontrada
+        if f"Worksheet named '{ABA_DEVOLUCAO}' not found" in str(e):
+            print(f"\n❌ ERRO: A aba '{ABA_DEVOLUCAO}' não foi encontrada em '{PLANILHA_PRINCIPAL_PATH}'.")
+            print("Por favor, verifique o nome exato da aba na sua planilha e corrija na variável 'ABA_DEVOLUCAO'.")
+        else:
+            print(f"\n❌ Ocorreu um erro ao carregar os arquivos Excel. Detalhes: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Ocorreu um erro inesperado ao carregar os arquivos Excel. Detalhes: {e}")
+        print("Verifique se os arquivos não estão abertos em outro programa e se estão no formato correto.")
         sys.exit(1)
 
+    return df_devolucao, df_quantidade
+
+
+def preencher_pos_planilha(df_devolucao, df_quantidade, cache_matching=None):
+    """
+    Preenche a coluna 'POS Planilha' de df_devolucao com a quantidade de máquinas do CNPJ
+    correspondente (fuzzy matching) em df_quantidade. Retorna o DataFrame de devolução atualizado.
+    """
+    # --- Preparação dos Dados para Matching ---
+    print("🔄 Padronizando dados de CNPJ/CPF para o matching fuzzy...")
+
+    # Limpar CNPJs/CPFs em ambas as planilhas (manter apenas dígitos)
+    df_devolucao['CNPJ_LIMPO'] = limpar_documento(df_devolucao[COL_DEVOLUCAO_CNPJ_CPF])
+    df_quantidade['CNPJ_LIMPO'] = limpar_documento(df_quantidade[COL_QTD_CNPJ])
+
+    print("✅ Dados padronizados.")
+
+    # --- Preparar Dicionário de Quantidade de Máquinas por CNPJ (Limpo e Agrupado) ---
+    # Agrupa df_quantidade por CNPJ_LIMPO e soma as Quantidade de Máquinas
+    # Isso é feito para ter um valor único de máquinas por CNPJ limpo como referência.
+    print("🔄 Agrupando 'Quantidade de Máquinas' por CNPJ na planilha de referência...")
+    df_quantidade_agrupado = df_quantidade.groupby('CNPJ_LIMPO')[COL_QTD_QUANTIDADE].sum().reset_index()
+    # Converte para um dicionário para busca eficiente por CNPJ limpo
+    cnpj_para_quantidade_total = df_quantidade_agrupado.set_index('CNPJ_LIMPO')[COL_QTD_QUANTIDADE].to_dict()
+
+    if SOMAR_MAQUINAS_POR_RAIZ:
+        # CNPJs passam a valer o total da raiz; CPFs (sem raiz) mantêm a própria quantidade
+        raizes_ref = raizes_cnpj(df_quantidade_agrupado['CNPJ_LIMPO'])
+        quantidade_por_raiz = df_quantidade_agrupado.groupby(raizes_ref)[COL_QTD_QUANTIDADE].sum()
+        totais = raizes_ref.map(quantidade_por_raiz).fillna(df_quantidade_agrupado[COL_QTD_QUANTIDADE])
+        cnpj_para_quantidade_total = dict(zip(df_quantidade_agrupado['CNPJ_LIMPO'], totais))
+        print(f"✅ Máquinas somadas por raiz de CNPJ ({len(quantidade_por_raiz)} empresas).")
+
+    # Lista de CNPJs limpos da planilha de quantidade para o fuzzy matching
+    lista_cnpjs_ref = df_quantidade_agrupado['CNPJ_LIMPO'].tolist()
+
+    print("✅ Dicionário e lista de CNPJs de referência criados.")
+
+    # --- Executar Fuzzy Matching de CNPJ e Preencher Coluna ---
+    print(f"🔄 Iniciando o processo de fuzzy matching de CNPJ e preenchimento da coluna '{COL_DEVOLUCAO_POS_PLANILHA}'...")
+
+    # Busca o melhor match uma única vez por CNPJ distinto da planilha de devolução.
+    # Cada processo monta uma única vez o índice (match exato por hash, grupos por raiz e
+    # árvore BK), que só pontua com fuzz.ratio os CNPJs capazes de atingir FUZZY_CNPJ_THRESHOLD.
+    cnpjs_dev_unicos = df_devolucao['CNPJ_LIMPO'].unique().tolist()
+    casar_cnpjs = partial(casar_em_paralelo, referencias=lista_cnpjs_ref,
+                          preparar=partial(IndiceCnpj, limiar=FUZZY_CNPJ_THRESHOLD, priorizar_raiz=PRIORIZAR_RAIZ_CNPJ),
+                          casar_bloco=casar_bloco_cnpjs,
+                          max_workers=MATCHING_WORKERS, tamanho_bloco=MATCHING_TAMANHO_BLOCO)
+    if cache_matching:
+        # A prioridade da raiz entra na chave do scorer porque pode mudar o match escolhido
+        scorer = "fuzz.ratio/raiz" if PRIORIZAR_RAIZ_CNPJ else "fuzz.ratio"
+        melhores_matches = cache_matching.casar(cnpjs_dev_unicos, lista_cnpjs_ref, scorer,
+                                                FUZZY_CNPJ_THRESHOLD, casar_cnpjs)
+    else:
+        melhores_matches = casar_cnpjs(cnpjs_dev_unicos)
+    cnpj_dev_para_cnpj_ref = {cnpj_dev_limpo: melhor_match[0]
+                              for cnpj_dev_limpo, melhor_match in zip(cnpjs_dev_unicos, melhores_matches)
+                              if melhor_match}
+
+    # Preenche a coluna 'POS Planilha' com a quantidade total de máquinas do CNPJ que deu match.
+    # As linhas sem match ficam como NaN. O valor pode ser 0 se a soma das máquinas for 0.
+    df_devolucao[COL_DEVOLUCAO_POS_PLANILHA] = (
+        df_devolucao['CNPJ_LIMPO'].map(cnpj_dev_para_cnpj_ref).map(cnpj_para_quantidade_total).astype(float)
+    )
+    if SOMAR_MAQUINAS_POR_RAIZ:
+        # A raiz presente na referência tem precedência sobre o fuzzy (que poderia apontar outra empresa)
+        total_da_raiz = raizes_cnpj(df_devolucao['CNPJ_LIMPO']).map(quantidade_por_raiz).astype(float)
+        df_devolucao[COL_DEVOLUCAO_POS_PLANILHA] = total_da_raiz.fillna(df_devolucao[COL_DEVOLUCAO_POS_PLANILHA])
+
+    # Contabiliza como atualizadas SOMENTE as linhas em que um valor válido (não NaN) foi preenchido.
+    linhas_atualizadas = int(df_devolucao[COL_DEVOLUCAO_POS_PLANILHA].notna().sum())
+
+    print(f"✅ Fuzzy matching de CNPJ concluído. {linhas_atualizadas} linhas atualizadas na aba '{ABA_DEVOLUCAO}'.")
+    if linhas_atualizadas == 0:
+        print("\n⚠️ Nenhuma linha foi atualizada. Isso pode indicar:")
+        print("  - CNPJs muito diferentes entre as planilhas, mesmo com fuzzy matching.")
+        print(f"  - O limiar de similaridade de CNPJ ({FUZZY_CNPJ_THRESHOLD}%) pode ser muito alto.")
+        print("  - Considere diminuir 'FUZZY_CNPJ_THRESHOLD' com CAUTELA, ou inspecione os dados manualmente.")
+
+    # --- Remover colunas temporárias ---
+    return df_devolucao.drop(columns=['CNPJ_LIMPO'])
+
+
+def varrer_limiares(df_devolucao, df_quantidade, limiares=LIMIARES_VARREDURA):
+    """
+    Pontua cada CNPJ distinto da devolução uma única vez (melhor e segundo melhor candidato)
+    e mostra, para cada limiar, as linhas casadas, as ambíguas e exemplos perto da fronteira.
+    """
+    print("🔄 Padronizando dados de CNPJ/CPF para a varredura de limiares...")
+    cnpjs_devolucao = limpar_documento(df_devolucao[COL_DEVOLUCAO_CNPJ_CPF])
+    lista_cnpjs_ref = limpar_documento(df_quantidade[COL_QTD_CNPJ]).drop_duplicates().sort_values().tolist()
+
+    # Número de linhas de cada CNPJ: a pontuação é feita por CNPJ distinto
+    contagem = cnpjs_devolucao.value_counts(sort=False)
+    cnpjs = contagem.index.tolist()
+    # O índice poda pelo menor limiar menos a margem, para que o segundo candidato de
+    # qualquer linha ambígua também seja encontrado
+    limiar_indice = max(min(limiares) - MARGEM_AMBIGUIDADE, 0)
+    print(f"🔄 Pontuando {len(cnpjs)} CNPJs distintos uma única vez...")
+    dois_melhores = casar_em_paralelo(cnpjs, lista_cnpjs_ref, preparar=partial(IndiceCnpj, limiar=limiar_indice),
+                                      casar_bloco=casar_bloco_cnpjs_dois_melhores,
+                                      max_workers=MATCHING_WORKERS, tamanho_bloco=MATCHING_TAMANHO_BLOCO)
+
+    resumo = resumir_varredura(cnpjs, dois_melhores, contagem.to_numpy(), limiares, margem=MARGEM_AMBIGUIDADE)
+    print(f"✅ Varredura concluída (ambíguas: segundo candidato a até {MARGEM_AMBIGUIDADE} pontos do melhor).")
+    imprimir_varredura(resumo, FUZZY_CNPJ_THRESHOLD, len(df_devolucao))
+
+    caminho = salvar_varredura("atualizar_planilha", resumo, {
+        "scorer": "fuzz.ratio",
+        "limiar_atual": FUZZY_CNPJ_THRESHOLD,
+        "margem_ambiguidade": MARGEM_AMBIGUIDADE,
+    }, PASTA_VARREDURAS)
+    print(f"\n📒 Varredura gravada em '{caminho}'.")
+
+
+def salvar_planilha(df_devolucao, caminho=NOVA_PLANILHA_SAIDA_PATH):
+    """
+    Salva apenas a aba de devolução atualizada em uma nova planilha Excel.
+    """
+    print(f"🔄 Salvando a aba '{ABA_DEVOLUCAO}' atualizada em '{caminho}'...")
+    try:
+        # Salva apenas o DataFrame 'df_devolucao' no novo arquivo.
+        df_devolucao.to_excel(caminho, sheet_name=ABA_DEVOLUCAO, index=False)
+
+        print(
+            f"\n🎉 Sucesso! A nova planilha com a aba '{ABA_DEVOLUCAO}' atualizada foi criada em: '{caminho}'")
+
+    except Exception as e:
+        print(f"\n❌ ERRO ao salvar a nova planilha '{caminho}'.")
+        print(f"Detalhes: {e}")
+        sys.exit(1)
+
+
+def criar_cache_matching():
+    """
+    Retorna o cache de matching entre execuções, ou None se USAR_CACHE_MATCHING estiver desligado.
+    """
+    if not USAR_CACHE_MATCHING:
+        return None
+    return CacheMatching(CACHE_MATCHING_PATH, CACHE_MATCHING_MAX_ENTRADAS)
+
+
+def criar_memo_execucao():
+    """
+    Retorna a memória de execuções deste script, ou None se USAR_MEMO_EXECUCAO estiver desligado.
+    """
+    if not USAR_MEMO_EXECUCAO:
+        return None
+    return MemoExecucao("atualizar_planilha", ENTRADAS_EXECUCAO, parametros_execucao(), SAIDA_EXECUCAO,
+                        MEMO_EXECUCAO_DIRETORIO)
+
+
+def parametros_execucao():
+    """
+    Constantes que mudam o resultado do preenchimento (entram na impressão da memória de execuções).
+    """
+    return {
+        "abas": [ABA_DEVOLUCAO],
+        "colunas": [COL_DEVOLUCAO_DESCRICAO, COL_DEVOLUCAO_CNPJ_CPF, COL_DEVOLUCAO_POS_PLANILHA,
+                    COL_QTD_RAZAO, COL_QTD_CNPJ, COL_QTD_QUANTIDADE],
+        "limiar": FUZZY_CNPJ_THRESHOLD,
+        "priorizar_raiz": PRIORIZAR_RAIZ_CNPJ,
+        "somar_por_raiz": SOMAR_MAQUINAS_POR_RAIZ,
+    }
+
+
+def main():
+    memo_execucao = criar_memo_execucao()
+    if memo_execucao and not {'--forcar', '--varredura'} & set(sys.argv[1:]) and memo_execucao.repetida():
+        print(f"✅ Entradas e parâmetros iguais aos da execução de {memo_execucao.data_ultima_execucao()}: "
+              f"'{SAIDA_EXECUCAO}' já está atualizada (use --forcar para processar de novo).")
+        print("\n✨ Processamento finalizado. ✨")
+        return
+
+    df_devolucao, df_quantidade = carregar_planilhas()
+
+    if '--varredura' in sys.argv[1:]:
+        varrer_limiares(df_devolucao, df_quantidade)
+        print("\n✨ Varredura finalizada (a planilha não foi alterada). ✨")
+        return
+
+    cache_matching = criar_cache_matching()
+    df_devolucao = preencher_pos_planilha(df_devolucao, df_quantidade, cache_matching)
+
+    # --- Salvar Apenas a Aba Atualizada em uma Nova Planilha Excel ---
+    salvar_planilha(df_devolucao)
+    if memo_execucao:
+        memo_execucao.registrar()
+
+    if cache_matching:
+        print(f"\n{cache_matching.resumo()}")
+        cache_matching.fechar()
+
+    print("\n✨ Processamento finalizado. ✨")
 
-validar_colunas(df_devolucao, ABA_DEVOLUCAO,
-                [COL_DEVOLUCAO_DESCRICAO, COL_DEVOLUCAO_CNPJ_CPF, COL_DEVOLUCAO_POS_PLANILHA])
-validar_colunas(df_quantidade, PLANILHA_QTD_MAQUINAS_PATH, [COL_QTD_RAZAO, COL_QTD_CNPJ, COL_QTD_QUANTIDADE])
-print("✅ Colunas essenciais verificadas.")
-
-# --- Preparação dos Dados para Matching ---
-print("🔄 Padronizando dados de CNPJ/CPF para o matching fuzzy...")
-
-# Limpar CNPJs/CPFs em ambas as planilhas (manter apenas dígitos)
-df_devolucao['CNPJ_LIMPO'] = df_devolucao[COL_DEVOLUCAO_CNPJ_CPF].astype(str).str.replace(r'[^\d]', '',
-                                                                                          regex=True).str.strip()
-df_quantidade['CNPJ_LIMPO'] = df_quantidade[COL_QTD_CNPJ].astype(str).str.replace(r'[^\d]', '', regex=True).str.strip()
-
-print("✅ Dados padronizados.")
-
-# --- Preparar Dicionário de Quantidade de Máquinas por CNPJ (Limpo e Agrupado) ---
-# Agrupa df_quantidade por CNPJ_LIMPO e soma as Quantidade de Máquinas
-# Isso é feito para ter um valor único de máquinas por CNPJ limpo como referência.
-print("🔄 Agrupando 'Quantidade de Máquinas' por CNPJ na planilha de referência...")
-df_quantidade_agrupado = df_quantidade.groupby('CNPJ_LIMPO')[COL_QTD_QUANTIDADE].sum().reset_index()
-# Converte para um dicionário para busca eficiente por CNPJ limpo
-cnpj_para_quantidade_total = df_quantidade_agrupado.set_index('CNPJ_LIMPO')[COL_QTD_QUANTIDADE].to_dict()
-
-# Lista de CNPJs limpos da planilha de quantidade para o fuzzy matching
-lista_cnpjs_ref = df_quantidade_agrupado['CNPJ_LIMPO'].tolist()
-print("✅ Dicionário e lista de CNPJs de referência criados.")
-
-# --- Executar Fuzzy Matching de CNPJ e Preencher Coluna ---
-print(f"🔄 Iniciando o processo de fuzzy matching de CNPJ e preenchimento da coluna '{COL_DEVOLUCAO_POS_PLANILHA}'...")
-linhas_atualizadas = 0
-
-# Pré-preenche a coluna 'POS Planilha' com NaN para todas as linhas.
-# Isso garante que as linhas sem match serão NaN, como solicitado.
-df_devolucao[COL_DEVOLUCAO_POS_PLANILHA] = np.nan
-
-# Iterar sobre as linhas da planilha de Devolução de Maquininhas - Inat
-for idx_dev, row_dev in df_devolucao.iterrows():
-    cnpj_dev_limpo = row_dev['CNPJ_LIMPO']
-
-    # Busca o melhor match fuzzy para o CNPJ atual na lista de CNPJs de referência
-    if lista_cnpjs_ref:  # Garante que a lista de referência não está vazia
-        melhor_match = process.extractOne(
-            query=cnpj_dev_limpo,
-            choices=lista_cnpjs_ref,
-            scorer=fuzz.ratio  # Ou fuzz.partial_ratio, fuzz.token_set_ratio dependendo da sua necessidade
-        )
-
-        if melhor_match:
-            cnpj_match_ref, score_cnpj = melhor_match[0], melhor_match[1]
-
-            # Se o score for maior ou igual ao limiar definido
-            if score_cnpj >= FUZZY_CNPJ_THRESHOLD:
-                # Pega a quantidade total de máquinas para o CNPJ que deu match na referência.
-                # O valor pode ser 0 se a soma das máquinas for 0 para aquele CNPJ.
-                valor_encontrado_na_ref = cnpj_para_quantidade_total.get(cnpj_match_ref)
-
-                # Atribui o valor encontrado (que pode ser 0) à coluna.
-                # Se valor_encontrado_na_ref for None por algum motivo (não deveria acontecer aqui),
-                # o valor original de np.nan para essa linha permanecerá.
-                df_devolucao.at[idx_dev, COL_DEVOLUCAO_POS_PLANILHA] = valor_encontrado_na_ref
-
-                # Contabiliza a linha como atualizada SOMENTE se um valor válido (não NaN) foi preenchido.
-                if not pd.isna(valor_encontrado_na_ref):
-                    linhas_atualizadas += 1
-
-print(f"✅ Fuzzy matching de CNPJ concluído. {linhas_atualizadas} linhas atualizadas na aba '{ABA_DEVOLUCAO}'.")
-if linhas_atualizadas == 0:
-    print("\n⚠️ Nenhuma linha foi atualizada. Isso pode indicar:")
-    print("  - CNPJs muito diferentes entre as planilhas, mesmo com fuzzy matching.")
-    print(f"  - O limiar de similaridade de CNPJ ({FUZZY_CNPJ_THRESHOLD}%) pode ser muito alto.")
-    print("  - Considere diminuir 'FUZZY_CNPJ_THRESHOLD' com CAUTELA, ou inspecione os dados manualmente.")
-
-# --- Remover colunas temporárias ---
-df_devolucao = df_devolucao.drop(columns=['CNPJ_LIMPO'])
-
-# --- Salvar Apenas a Aba Atualizada em uma Nova Planilha Excel ---
-print(f"🔄 Salvando a aba '{ABA_DEVOLUCAO}' atualizada em '{NOVA_PLANILHA_SAIDA_PATH}'...")
-try:
-    # Salva apenas o DataFrame 'df_devolucao' no novo arquivo.
-    df_devolucao.to_excel(NOVA_PLANILHA_SAIDA_PATH, sheet_name=ABA_DEVOLUCAO, index=False)
-
-    print(
-        f"\n🎉 Sucesso! A nova planilha com a aba '{ABA_DEVOLUCAO}' atualizada foi criada em: '{NOVA_PLANILHA_SAIDA_PATH}'")
-
-except Exception as e:
-    print(f"\n❌ ERRO ao salvar a nova planilha '{NOVA_PLANILHA_SAIDA_PATH}'.")
-    print(f"Detalhes: {e}")
-    sys.exit(1)
 
-print("\n✨ Processamento finalizado. ✨")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import csv
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from dados_sinteticos import SEMENTE_PADRAO, gerar_fixtures
+
+try:
+    import resource  # Só existe em sistemas Unix; no Windows o pico de memória fica em branco
+except ImportError:
+    resource = None
+
+# --- Benchmark com Dados Sintéticos ---
+# Gera as planilhas de entrada com dados_sinteticos.py em uma pasta temporária para cada tamanho
+# e mede o tempo e o pico de memória de cada script rodando nela, na mesma ordem do uso real, além
+# do tempo de cada etapa dos scripts instrumentados (métricas gravadas por instrumentacao.py).
+# Uso: python benchmark.py [tamanho ...]   (ex.: python benchmark.py 1000 10000)
+
+TAMANHOS_PADRAO = [1_000, 10_000, 100_000, 1_000_000]
+SCRIPTS_BENCHMARK = [
+    "tratar_planilha_csv.py",
+    "atualizar_planilha.py",
+    "cruzar_pos_bi.py",
+    "contasencerrar.py",
+    "controle_semanal.py",
+]
+PASTA_RESULTADOS = "resultados_benchmark"
+# Pasta em que os scripts instrumentados (instrumentacao.py) gravam as métricas de cada etapa
+PASTA_METRICAS_SCRIPTS = "metricas"
+ETAPA_TOTAL = "total"  # Linha do script inteiro; as demais linhas do script são as etapas dele
+TEMPO_LIMITE_SCRIPT = 6 * 60 * 60  # segundos
+
+DIRETORIO_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+
+# Processo intermediário que roda o script e informa o pico de memória dele (RUSAGE_CHILDREN). Medir
+# direto do benchmark não serve: o RUSAGE_CHILDREN acumula o maior pico entre todos os scripts já
+# executados, e no Linux o pico de um filho já começa com a memória do processo que o criou.
+_LANCADOR = """
+import resource, subprocess, sys
+codigo = subprocess.call(sys.argv[3:], timeout=float(sys.argv[2]))
+with open(sys.argv[1], "w") as arquivo:
+    arquivo.write(str(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss))
+sys.exit(codigo)
+"""
+
+
+def executar_script(script, diretorio):
+    """
+    Roda um script em um processo separado, com a pasta das planilhas sintéticas como diretório
+    de trabalho, e retorna (segundos, código de saída, pico de memória do script em MB).
+    O pico de memória só é medido em sistemas Unix; no Windows fica em branco.
+    """
+    comando = [sys.executable, os.path.join(DIRETORIO_SCRIPTS, script)]
+    arquivo_pico = os.path.join(diretorio, f".pico_memoria_{script}.txt")
+    if resource is not None:
+        comando = [sys.executable, "-c", _LANCADOR, arquivo_pico, str(TEMPO_LIMITE_SCRIPT)] + comando
+
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        comando,
+        cwd=diretorio, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        timeout=TEMPO_LIMITE_SCRIPT + 60,
+        env={**os.environ, "PYTHONIOENCODING": "utf-8"},
+    )
+    segundos = time.perf_counter() - inicio
+    if processo.returncode != 0:
+        print(f"⚠️ '{script}' terminou com código {processo.returncode}: {processo.stderr.strip()[-500:]}")
+
+    pico_memoria_mb = None
+    if os.path.exists(arquivo_pico):
+        with open(arquivo_pico, encoding="utf-8") as arquivo:
+            pico = int(arquivo.read())
+        os.remove(arquivo_pico)
+        pico_memoria_mb = round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # macOS: bytes
+    return segundos, processo.returncode, pico_memoria_mb
+
+
+def _arquivos_metricas(diretorio):
+    return set(glob.glob(os.path.join(diretorio, PASTA_METRICAS_SCRIPTS, "*.json")))
+
+
+def resultados_etapas(arquivos, linhas, script, codigo_saida):
+    """
+    Uma linha de resultado por etapa registrada pela instrumentação do script (JSON em metricas/).
+    """
+    resultados = []
+    for caminho in sorted(arquivos):
+        with open(caminho, encoding="utf-8") as arquivo:
+            metricas = json.load(arquivo)
+        for etapa in metricas["etapas"]:
+            resultados.append({
+                "linhas": linhas, "script": script, "etapa": etapa["etapa"], "segundos": etapa["segundos"],
+                "codigo_saida": codigo_saida, "pico_memoria_mb": etapa["pico_memoria_mb"],
+                "aumento_pico_rss_mb": etapa.get("aumento_pico_rss_mb"), "linhas_entrada": etapa["linhas_entrada"],
+            })
+    return resultados
+
+
+def medir_tamanho(linhas, semente=SEMENTE_PADRAO):
+    """
+    Gera as entradas com 'linhas' linhas e mede a geração, cada um dos scripts (etapa ETAPA_TOTAL)
+    e as etapas dos scripts instrumentados. Retorna uma lista de resultados (um dicionário por linha).
+    """
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix=f"benchmark_{linhas}_") as diretorio:
+        print(f"\n--- {linhas:,} linhas ---".replace(",", "."))
+        print("🔄 Gerando planilhas sintéticas...")
+        inicio = time.perf_counter()
+        tamanhos = gerar_fixtures(diretorio, linhas, semente)
+        resultados.append({
+            "linhas": linhas, "script": "dados_sinteticos.py", "etapa": ETAPA_TOTAL,
+            "segundos": round(time.perf_counter() - inicio, 3), "codigo_saida": 0, "pico_memoria_mb": None,
+            "aumento_pico_rss_mb": None, "linhas_entrada": sum(tamanhos.values()),
+        })
+        print(f"✅ Planilhas geradas em {resultados[-1]['segundos']:.2f}s")
+
+        for script in SCRIPTS_BENCHMARK:
+            print(f"🔄 Executando '{script}'...")
+            metricas_anteriores = _arquivos_metricas(diretorio)
+            segundos, codigo_saida, pico_memoria_mb = executar_script(script, diretorio)
+            resultados.append({
+                "linhas": linhas, "script": script, "etapa": ETAPA_TOTAL, "segundos": round(segundos, 3),
+                "codigo_saida": codigo_saida, "pico_memoria_mb": pico_memoria_mb, "aumento_pico_rss_mb": None,
+                "linhas_entrada": None,
+            })
+            etapas = resultados_etapas(_arquivos_metricas(diretorio) - metricas_anteriores, linhas, script,
+                                       codigo_saida)
+            resultados.extend(etapas)
+            print(f"{'✅' if codigo_saida == 0 else '❌'} '{script}': {segundos:.2f}s"
+                  + (f", pico de memória {pico_memoria_mb:.0f} MB" if pico_memoria_mb is not None else "")
+                  + (f", {len(etapas)} etapas medidas" if etapas else ""))
+    return resultados
+
+
+def salvar_resultados(resultados, pasta=PASTA_RESULTADOS):
+    """
+    Grava os resultados em JSON e CSV com a data/hora da execução no nome. Retorna os dois caminhos.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    base = os.path.join(pasta, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}")
+    with open(f"{base}.json", "w", encoding="utf-8") as arquivo:
+        json.dump({
+            "python": sys.version.split()[0], "plataforma": sys.platform, "semente": SEMENTE_PADRAO,
+            "resultados": resultados,
+        }, arquivo, ensure_ascii=False, indent=2)
+    with open(f"{base}.csv", "w", encoding="utf-8", newline="") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=list(resultados[0].keys()))
+        escritor.writeheader()
+        escritor.writerows(resultados)
+    return f"{base}.json", f"{base}.csv"
+
+
+def main():
+    tamanhos = [int(arg.replace("_", "")) for arg in sys.argv[1:]] or TAMANHOS_PADRAO
+
+    resultados = []
+    for linhas in sorted(tamanhos):
+        resultados.extend(medir_tamanho(linhas))
+
+    caminho_json, caminho_csv = salvar_resultados(resultados)
+    print(f"\n🎉 Benchmark concluído. Resultados em '{caminho_json}' e '{caminho_csv}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+# --- Configurações Padrão do Cache ---
+CAMINHO_CACHE_PADRAO = ".cache_matching.sqlite3"
+MAX_ENTRADAS_PADRAO = 1_000_000  # Acima disso, as entradas usadas há mais tempo são removidas
+_TAMANHO_LOTE_SQL = 500  # Parâmetros por consulta SQL (o SQLite limita a quantidade de '?')
+
+
+def impressao_referencias(referencias):
+    """
+    Gera uma impressão digital (SHA-256) da lista de referência, na ordem em que ela é usada,
+    já que a ordem decide os empates do matching.
+    """
+    hasher = hashlib.sha256()
+    for referencia in referencias:
+        hasher.update(str(referencia).encode('utf-8'))
+        hasher.update(b'\x00')
+    return hasher.hexdigest()
+
+
+class CacheMatching:
+    """
+    Cache em disco (SQLite) do melhor match de cada consulta, persistente entre execuções.
+
+    A chave é (consulta normalizada, impressão digital da referência, scorer, limiar) e o
+    valor é o melhor match e seu score (ou a ausência de match). Quando o número de entradas
+    passa de 'max_entradas', as usadas há mais tempo são removidas.
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE_PADRAO, max_entradas=MAX_ENTRADAS_PADRAO):
+        self.caminho = caminho
+        self.max_entradas = max_entradas
+        self.acertos = 0
+        self.falhas = 0
+        self.conexao = sqlite3.connect(caminho)
+        self.conexao.execute(
+            """
+            CREATE TABLE IF NOT EXISTS matches (
+                consulta TEXT NOT NULL,
+                referencia TEXT NOT NULL,
+                scorer TEXT NOT NULL,
+                limiar REAL NOT NULL,
+                match TEXT,
+                score INTEGER,
+                ultimo_acesso REAL NOT NULL,
+                PRIMARY KEY (consulta, referencia, scorer, limiar)
+            )
+            """
+        )
+        self.conexao.execute("CREATE INDEX IF NOT EXISTS idx_matches_acesso ON matches (ultimo_acesso)")
+        self.conexao.commit()
+
+    def buscar(self, consultas, referencia, scorer, limiar):
+        """
+        Retorna um dicionário {consulta: (match, score) ou None} apenas com as consultas
+        encontradas no cache, atualizando o horário do último acesso delas.
+        """
+        encontrados = {}
+        consultas = list(dict.fromkeys(consultas))
+        for inicio in range(0, len(consultas), _TAMANHO_LOTE_SQL):
+            lote = consultas[inicio:inicio + _TAMANHO_LOTE_SQL]
+            marcadores = ",".join("?" * len(lote))
+            cursor = self.conexao.execute(
+                f"SELECT consulta, match, score FROM matches "
+                f"WHERE referencia = ? AND scorer = ? AND limiar = ? AND consulta IN ({marcadores})",
+                [referencia, scorer, limiar, *lote]
+            )
+            for consulta, match, score in cursor:
+                encontrados[consulta] = None if match is None else (match, score)
+
+        agora = time.time()
+        self.conexao.executemany(
+            "UPDATE matches SET ultimo_acesso = ? WHERE consulta = ? AND referencia = ? AND scorer = ? AND limiar = ?",
+            [(agora, consulta, referencia, scorer, limiar) for consulta in encontrados]
+        )
+        self.conexao.commit()
+
+        self.acertos += len(encontrados)
+        self.falhas += len(consultas) - len(encontrados)
+        return encontrados
+
+    def gravar(self, resultados, referencia, scorer, limiar):
+        """
+        Grava {consulta: (match, score) ou None} no cache e aplica o limite de tamanho.
+        """
+        agora = time.time()
+        self.conexao.executemany(
+            "INSERT OR REPLACE INTO matches (consulta, referencia, scorer, limiar, match, score, ultimo_acesso) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(consulta, referencia, scorer, limiar,
+              None if resultado is None else resultado[0],
+              None if resultado is None else int(resultado[1]),
+              agora)
+             for consulta, resultado in resultados.items()]
+        )
+        self.conexao.commit()
+        self.remover_excedentes()
+
+    def remover_excedentes(self):
+        """
+        Remove as entradas usadas há mais tempo até o cache voltar a 'max_entradas'.
+        """
+        total = self.conexao.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        excedente = total - self.max_entradas
+        if excedente > 0:
+            self.conexao.execute(
+                "DELETE FROM matches WHERE rowid IN "
+                "(SELECT rowid FROM matches ORDER BY ultimo_acesso LIMIT ?)",
+                (excedente,)
+            )
+            self.conexao.commit()
+
+    def casar(self, consultas, referencias, scorer, limiar, funcao_casar):
+        """
+        Retorna o resultado do matching para cada consulta (alinhado com 'consultas'),
+        chamando funcao_casar(lista_de_consultas) somente para as que não estão no cache.
+        """
+        consultas = list(consultas)
+        referencia = impressao_referencias(referencias)
+        resultados = self.buscar(consultas, referencia, scorer, limiar)
+
+        faltantes = [consulta for consulta in dict.fromkeys(consultas) if consulta not in resultados]
+        if faltantes:
+            novos = dict(zip(faltantes, funcao_casar(faltantes)))
+            self.gravar(novos, referencia, scorer, limiar)
+            resultados.update(novos)
+
+        return [resultados[consulta] for consulta in consultas]
+
+    def resumo(self):
+        total = self.acertos + self.falhas
+        taxa = (100 * self.acertos / total) if total else 0.0
+        return (f"📦 Cache de matching ('{os.path.basename(self.caminho)}'): "
+                f"{self.acertos} acertos, {self.falhas} falhas ({taxa:.1f}% de acerto).")
+
+    def fechar(self):
+        self.conexao.close()
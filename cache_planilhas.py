@@ -0,0 +1,292 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# --- Configurações Padrão do Cache de Planilhas ---
+CACHE_PLANILHAS_ATIVO = True
+DIRETORIO_CACHE_PADRAO = ".cache_planilhas"
+LIMITE_CACHE_BYTES_PADRAO = 2 * 1024 ** 3  # 2 GB; acima disso, os arquivos usados há mais tempo são removidos
+_TAMANHO_BLOCO_HASH = 1024 * 1024
+
+# --- Tipos dos Esquemas de Leitura (ver ler_excel_esquema) ---
+TEXTO = 'texto'  # Lido como texto (CNPJ/CPF, contas): não vira float nem perde zeros à esquerda
+CATEGORIA = 'categoria'  # Lido como 'category': nomes repetidos ocupam memória uma vez só
+INTEIRO = 'inteiro'  # Convertido para int32 quando todos os valores são inteiros (ex.: totais de POS)
+QUALQUER = None  # Coluna obrigatória, mantida como o pandas ler (ex.: valores em dinheiro, que seguem float64)
+
+
+class ColunasFaltandoError(Exception):
+    """
+    Colunas obrigatórias de um esquema que não existem na aba lida.
+    """
+
+    def __init__(self, caminho, sheet_name, faltando, disponiveis):
+        self.caminho = caminho
+        self.sheet_name = sheet_name
+        self.faltando = faltando
+        self.disponiveis = disponiveis
+        super().__init__(f"Colunas não encontradas em '{caminho}' (aba '{sheet_name}'): {faltando}")
+
+    def __reduce__(self):  # Permite devolver o erro de um processo do ProcessPoolExecutor
+        return self.__class__, (self.caminho, self.sheet_name, self.faltando, self.disponiveis)
+
+
+def _hash_arquivo(caminho):
+    """
+    Calcula o SHA-256 do conteúdo do arquivo, lendo em blocos.
+    """
+    hasher = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(_TAMANHO_BLOCO_HASH), b''):
+            hasher.update(bloco)
+    return hasher.hexdigest()
+
+
+def _hash_texto(texto):
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _descrever_parametro(valor):
+    """
+    Representação estável de usecols/dtype para compor a chave do cache.
+    """
+    if isinstance(valor, dict):
+        return repr(sorted((str(chave), repr(tipo)) for chave, tipo in valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return repr(list(valor))
+    return repr(valor)
+
+
+def _prefixo_leitura(caminho, sheet_name, usecols, dtype):
+    """
+    Identifica a leitura (arquivo, aba, usecols, dtype).
+    """
+    return _hash_texto(json.dumps([os.path.abspath(caminho), repr(sheet_name), _descrever_parametro(usecols),
+                                   _descrever_parametro(dtype)]))[:32]
+
+
+def _impressao_arquivo(caminho):
+    """
+    Identifica a versão do arquivo (tamanho, mtime e hash do conteúdo).
+    """
+    caminho_abs = os.path.abspath(caminho)
+    status = os.stat(caminho_abs)
+    return _hash_texto(f"{status.st_size}|{status.st_mtime_ns}|{_hash_arquivo(caminho_abs)}")[:32]
+
+
+def _chaves_cache(caminho, sheet_name, usecols, dtype):
+    """
+    Retorna (prefixo, impressao): o prefixo identifica a leitura (arquivo, aba, usecols, dtype)
+    e a impressão identifica a versão do arquivo (tamanho, mtime e hash do conteúdo).
+    """
+    return _prefixo_leitura(caminho, sheet_name, usecols, dtype), _impressao_arquivo(caminho)
+
+
+def _ler_do_cache(base):
+    """
+    Lê o DataFrame salvo em Parquet (ou no pickle de reserva). Retorna None se não existir.
+    Um arquivo de cache ilegível (truncado ou corrompido) é removido e tratado como ausente.
+    """
+    caminho_parquet = base + '.parquet'
+    caminho_pickle = base + '.pkl'
+    for caminho, ler in [(caminho_parquet, _ler_parquet), (caminho_pickle, pd.read_pickle)]:
+        if not os.path.exists(caminho):
+            continue
+        try:
+            df = ler(caminho)
+        except Exception:
+            _remover_se_existir(caminho)
+            return None
+        os.utime(caminho)  # Marca como usado recentemente (LRU)
+        return df
+    return None
+
+
+def _ler_parquet(caminho):
+    df = pd.read_parquet(caminho)
+    # O Parquet devolve None nas colunas de texto; o read_excel devolve NaN
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _remover_se_existir(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def _gravar_atomico(gravar, caminho):
+    """
+    Chama gravar(caminho_temporario) e move o resultado para 'caminho' com os.replace, para que
+    uma execução interrompida nunca deixe um arquivo de cache pela metade no nome definitivo.
+    """
+    descritor, caminho_temporario = tempfile.mkstemp(dir=os.path.dirname(caminho),
+                                                     prefix=os.path.basename(caminho) + '-', suffix='.tmp')
+    os.close(descritor)
+    try:
+        gravar(caminho_temporario)
+        os.replace(caminho_temporario, caminho)
+    finally:
+        _remover_se_existir(caminho_temporario)
+
+
+def _gravar_no_cache(df, base):
+    """
+    Grava em Parquet. Colunas com tipos misturados (ex.: CNPJ com números e textos) não são
+    aceitas pelo Parquet; nesse caso o DataFrame é gravado em pickle, que preserva tudo.
+    """
+    try:
+        _gravar_atomico(lambda destino: df.to_parquet(destino, index=False), base + '.parquet')
+        return
+    except Exception:
+        pass
+    _gravar_atomico(df.to_pickle, base + '.pkl')
+
+
+def _guardar_no_cache(df, diretorio, prefixo, impressao, limite_bytes):
+    try:
+        # Remove as versões antigas desta mesma leitura (o arquivo de origem mudou)
+        for antigo in glob.glob(os.path.join(diretorio, f"{prefixo}-*")):
+            os.remove(antigo)
+        _gravar_no_cache(df, os.path.join(diretorio, f"{prefixo}-{impressao}"))
+        aplicar_limite_cache(diretorio, limite_bytes)
+    except OSError:
+        pass  # Falha ao gravar o cache não impede o processamento
+
+
+def aplicar_limite_cache(diretorio=DIRETORIO_CACHE_PADRAO, limite_bytes=LIMITE_CACHE_BYTES_PADRAO):
+    """
+    Remove os arquivos de cache usados há mais tempo até o total caber em 'limite_bytes'.
+    """
+    arquivos = [os.path.join(diretorio, nome) for nome in os.listdir(diretorio)]
+    arquivos = sorted((os.stat(arq).st_mtime, os.path.getsize(arq), arq) for arq in arquivos if os.path.isfile(arq))
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, arquivo in arquivos:
+        if total <= limite_bytes:
+            break
+        os.remove(arquivo)
+        total -= tamanho
+
+
+def ler_excel_cache(caminho, sheet_name=0, usecols=None, dtype=None,
+                    diretorio=DIRETORIO_CACHE_PADRAO, limite_bytes=LIMITE_CACHE_BYTES_PADRAO):
+    """
+    Equivalente a pd.read_excel(caminho, sheet_name=sheet_name, usecols=usecols, dtype=dtype),
+    guardando o resultado em um cache local (Parquet) para que as próximas leituras do mesmo
+    arquivo, aba, usecols e dtype sejam quase instantâneas.
+
+    O cache é invalidado quando o arquivo muda (tamanho, data de modificação ou conteúdo) e o
+    diretório é limitado a 'limite_bytes', removendo os arquivos usados há mais tempo.
+    Os erros de leitura (arquivo ou aba inexistente) são os mesmos do pd.read_excel.
+    """
+    if not CACHE_PLANILHAS_ATIVO or callable(usecols) or not os.path.exists(caminho):
+        return pd.read_excel(caminho, sheet_name=sheet_name, usecols=usecols, dtype=dtype)
+    return _ler_com_cache(caminho, sheet_name, usecols, usecols, dtype, diretorio, limite_bytes)
+
+
+def _ler_com_cache(caminho, sheet_name, chave_usecols, usecols, dtype, diretorio, limite_bytes):
+    """
+    Leitura com cache em que a chave usa 'chave_usecols' (uma lista) e o pd.read_excel recebe
+    'usecols' (que pode ser uma função, que não tem representação estável).
+    """
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        prefixo, impressao = _chaves_cache(caminho, sheet_name, chave_usecols, dtype)
+        base = os.path.join(diretorio, f"{prefixo}-{impressao}")
+        df = _ler_do_cache(base)
+        if df is not None:
+            return df
+    except OSError:
+        # Sem acesso ao diretório de cache: segue com a leitura normal
+        return pd.read_excel(caminho, sheet_name=sheet_name, usecols=usecols, dtype=dtype)
+
+    df = pd.read_excel(caminho, sheet_name=sheet_name, usecols=usecols, dtype=dtype)
+    _guardar_no_cache(df, diretorio, prefixo, impressao, limite_bytes)
+    return df
+
+
+def ler_excel_esquema(caminho, sheet_name, esquema, manter_demais_colunas=False,
+                      diretorio=DIRETORIO_CACHE_PADRAO, limite_bytes=LIMITE_CACHE_BYTES_PADRAO):
+    """
+    Lê uma aba de acordo com um esquema {coluna: tipo} (TEXTO, CATEGORIA, INTEIRO ou QUALQUER),
+    passando pelo cache do ler_excel_cache.
+
+    Só as colunas do esquema são carregadas, a menos que 'manter_demais_colunas' seja True
+    (abas que são regravadas inteiras e precisam preservar as outras colunas). As colunas
+    obrigatórias são verificadas na mesma leitura: se faltar alguma, levanta ColunasFaltandoError.
+    Os erros de arquivo ou aba inexistente são os mesmos do pd.read_excel.
+    """
+    colunas = list(esquema)
+    dtype = {coluna: str if tipo == TEXTO else 'category'
+             for coluna, tipo in esquema.items() if tipo in (TEXTO, CATEGORIA)} or None
+    if manter_demais_colunas:
+        df = ler_excel_cache(caminho, sheet_name=sheet_name, dtype=dtype, diretorio=diretorio,
+                             limite_bytes=limite_bytes)
+    else:
+        # A função não falha com colunas ausentes (a lista falharia), e a ausência é tratada abaixo
+        nomes = set(colunas)
+        usecols = lambda coluna: coluna in nomes
+        if not CACHE_PLANILHAS_ATIVO or not os.path.exists(caminho):
+            df = pd.read_excel(caminho, sheet_name=sheet_name, usecols=usecols, dtype=dtype)
+        else:
+            df = _ler_com_cache(caminho, sheet_name, sorted(colunas), usecols, dtype, diretorio, limite_bytes)
+
+    faltando = [coluna for coluna in colunas if coluna not in df.columns]
+    if faltando:
+        disponiveis = list(df.columns) if manter_demais_colunas else \
+            list(pd.read_excel(caminho, sheet_name=sheet_name, nrows=0).columns)
+        raise ColunasFaltandoError(caminho, sheet_name, faltando, disponiveis)
+
+    for coluna, tipo in esquema.items():
+        if tipo == INTEIRO:
+            df[coluna] = _inteiro_compacto(df[coluna])
+    return df
+
+
+def _inteiro_compacto(serie):
+    """
+    Converte para int32 se todos os valores forem inteiros que cabem nele; senão, não altera.
+    """
+    if not pd.api.types.is_numeric_dtype(serie) or serie.isna().any():
+        return serie
+    valores = serie.to_numpy()
+    limites = np.iinfo(np.int32)
+    if len(valores) and ((valores % 1 != 0).any() or valores.min() < limites.min or valores.max() > limites.max):
+        return serie
+    return serie.astype(np.int32)
+
+
+def ler_abas_excel_cache(caminho, abas, usecols=None, dtype=None,
+                         diretorio=DIRETORIO_CACHE_PADRAO, limite_bytes=LIMITE_CACHE_BYTES_PADRAO):
+    """
+    Lê várias abas do mesmo arquivo e retorna {aba: DataFrame}, na ordem de 'abas'.
+    As abas que não estão no cache são lidas com uma única chamada ao pd.read_excel, que abre
+    o arquivo (zip e strings compartilhadas) uma vez só. O cache é o mesmo do ler_excel_cache,
+    e 'usecols'/'dtype' valem para todas as abas.
+    """
+    abas = list(abas)
+    if not CACHE_PLANILHAS_ATIVO or callable(usecols) or not os.path.exists(caminho):
+        return pd.read_excel(caminho, sheet_name=abas, usecols=usecols, dtype=dtype)
+
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        impressao = _impressao_arquivo(caminho)
+        prefixos = {aba: _prefixo_leitura(caminho, aba, usecols, dtype) for aba in abas}
+        resultado = {aba: _ler_do_cache(os.path.join(diretorio, f"{prefixos[aba]}-{impressao}")) for aba in abas}
+    except OSError:
+        return pd.read_excel(caminho, sheet_name=abas, usecols=usecols, dtype=dtype)
+
+    faltando = [aba for aba in abas if resultado[aba] is None]
+    if faltando:
+        lidas = pd.read_excel(caminho, sheet_name=faltando, usecols=usecols, dtype=dtype)
+        for aba in faltando:
+            resultado[aba] = lidas[aba]
+            _guardar_no_cache(lidas[aba], diretorio, prefixos[aba], impressao, limite_bytes)
+    return resultado
@@ -0,0 +1,113 @@
+import numpy as np
+from fuzzywuzzy import fuzz
+from fuzzywuzzy import process
+from fuzzywuzzy import utils
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# --- Configurações Padrão do Gerador de Candidatos ---
+TOP_K_PADRAO = 10  # Quantos candidatos por nome são re-pontuados com o scorer do fuzzywuzzy
+NGRAM_RANGE_PADRAO = (2, 4)  # Tamanhos dos n-gramas de caracteres
+TAMANHO_BLOCO_PADRAO = 2000  # Consultas por multiplicação de matrizes (limita a memória)
+
+
+def _preprocessar(nome):
+    """
+    Aplica o mesmo pré-processamento que o fuzzywuzzy usa antes do token_set_ratio
+    (minúsculas, sem pontuação, apenas ASCII), para que os n-gramas reflitam o que é pontuado.
+    """
+    return utils.full_process(nome, force_ascii=True)
+
+
+class IndiceNomes:
+    """
+    Gera candidatos para o fuzzy matching de nomes de empresas.
+
+    Os nomes de referência viram uma matriz esparsa TF-IDF de n-gramas de caracteres.
+    Para um bloco de consultas, uma única multiplicação de matrizes dá a similaridade
+    de cosseno contra todas as referências, e apenas os 'top_k' mais similares de cada
+    consulta são re-pontuados com o scorer original (process.extractOne).
+    """
+
+    def __init__(self, lista_nomes_ref, scorer=fuzz.token_set_ratio, top_k=TOP_K_PADRAO,
+                 ngram_range=NGRAM_RANGE_PADRAO, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+        # Remove repetidos mantendo a ordem da primeira ocorrência, que decide os empates
+        self.lista_nomes_ref = list(dict.fromkeys(lista_nomes_ref))
+        self.scorer = scorer
+        self.top_k = top_k
+        self.tamanho_bloco = tamanho_bloco
+        self.vetorizador = TfidfVectorizer(analyzer='char_wb', ngram_range=ngram_range,
+                                           preprocessor=_preprocessar, lowercase=False,
+                                           dtype=np.float32)
+        try:
+            self.matriz_ref_t = self.vetorizador.fit_transform(self.lista_nomes_ref).T.tocsr()
+        except ValueError:
+            # Lista vazia ou nomes sem nenhum caractere aproveitável: nenhum candidato possível
+            self.matriz_ref_t = None
+
+    def candidatos(self, consultas):
+        """
+        Retorna, para cada consulta, as posições (em ordem crescente) dos nomes de
+        referência mais similares pela similaridade de cosseno dos n-gramas.
+        """
+        if self.matriz_ref_t is None:
+            return [np.array([], dtype=np.int64) for _ in consultas]
+
+        resultado = []
+        for inicio in range(0, len(consultas), self.tamanho_bloco):
+            bloco = consultas[inicio:inicio + self.tamanho_bloco]
+            similaridades = (self.vetorizador.transform(bloco) @ self.matriz_ref_t).tocsr()
+            for i in range(similaridades.shape[0]):
+                ini, fim = similaridades.indptr[i], similaridades.indptr[i + 1]
+                colunas = similaridades.indices[ini:fim]
+                if len(colunas) > self.top_k:
+                    selecionados = np.argpartition(-similaridades.data[ini:fim], self.top_k - 1)[:self.top_k]
+                    colunas = colunas[selecionados]
+                resultado.append(np.sort(colunas))
+        return resultado
+
+    def melhores_matches(self, consultas):
+        """
+        Retorna uma lista alinhada com 'consultas' contendo (nome_ref, score) do melhor
+        candidato segundo o scorer, ou None quando não há candidatos.
+        """
+        consultas = list(consultas)
+        matches = []
+        for consulta, posicoes in zip(consultas, self.candidatos(consultas)):
+            if len(posicoes) == 0:
+                matches.append(None)
+                continue
+            # Candidatos na ordem original da referência: o extractOne mantém o critério de empate
+            escolhas = [self.lista_nomes_ref[p] for p in posicoes]
+            melhor = process.extractOne(query=consulta, choices=escolhas, scorer=self.scorer)
+            matches.append((melhor[0], melhor[1]) if melhor else None)
+        return matches
+
+    def dois_melhores(self, consultas):
+        """
+        Retorna, para cada consulta, a lista com até dois (nome_ref, score) dos candidatos,
+        do maior score para o menor. O primeiro é o mesmo de melhores_matches; o segundo
+        é o melhor entre os demais candidatos do top-k.
+        """
+        consultas = list(consultas)
+        resultado = []
+        for consulta, posicoes in zip(consultas, self.candidatos(consultas)):
+            escolhas = [self.lista_nomes_ref[p] for p in posicoes]
+            # process.extract ordena de forma estável: nos empates, vale a ordem da referência
+            resultado.append([(nome, score) for nome, score in
+                              process.extract(consulta, escolhas, scorer=self.scorer, limit=2)])
+        return resultado
+
+
+# --- Funções para o matching_paralelo ---
+def casar_bloco_nomes(indice, nomes_consulta):
+    """
+    Retorna a lista de melhores_matches (ou None) para cada nome do bloco.
+    """
+    return indice.melhores_matches(nomes_consulta)
+
+
+def casar_bloco_nomes_dois_melhores(indice, nomes_consulta):
+    """
+    Retorna a lista de dois_melhores para cada nome do bloco (modo de varredura de limiares).
+    """
+    return indice.dois_melhores(nomes_consulta)
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+# --- Tipos de Documento ---
+# O tipo de uma chave é a quantidade de dígitos do documento limpo. Junto com o número em int64,
+# ele preserva os zeros à esquerda: '01234567000189' -> (1234567000189, TIPO_CNPJ).
+TIPO_VAZIO = 0
+TIPO_CPF = 11
+TIPO_CNPJ = 14
+TIPO_INVALIDO = -1  # Documentos com mais de MAX_DIGITOS_CHAVE dígitos (não cabem em um int64)
+CHAVE_INVALIDA = -1
+MAX_DIGITOS_CHAVE = 18
+# Os 8 primeiros dígitos do CNPJ (raiz) identificam a empresa; os 6 seguintes, o estabelecimento
+# (0001 é a matriz, 0002 em diante as filiais) e os dígitos verificadores.
+TAMANHO_RAIZ_CNPJ = 8
+
+
+def limpar_documento(serie):
+    """
+    Mantém apenas os dígitos de uma série de CNPJs/CPFs, sem apply/lambda.
+    Valores que chegaram como float ('12345678000195.0') perdem o '.0' antes da limpeza,
+    e células vazias viram '' (em qualquer versão do pandas: o astype(str) do pandas 3 mantém o NaN).
+    """
+    texto = serie.astype(object).where(serie.notna(), '').astype(str).str.replace(r'\.0$', '', regex=True)
+    return texto.str.replace(r'[^0-9]', '', regex=True)
+
+
+def raizes_cnpj(documentos_limpos):
+    """
+    Raiz (8 primeiros dígitos) de cada documento limpo com 14 dígitos; NaN para CPFs e
+    documentos incompletos, que não têm raiz.
+    """
+    return documentos_limpos.where(documentos_limpos.str.len() == TIPO_CNPJ).str[:TAMANHO_RAIZ_CNPJ]
+
+
+def chaves_documento(serie):
+    """
+    Converte uma série de CNPJs/CPFs em duas séries alinhadas (chave, tipo): a chave é o número
+    do documento em int64 e o tipo é a quantidade de dígitos (TIPO_CPF, TIPO_CNPJ, ...) em int8.
+    Documentos vazios viram (0, TIPO_VAZIO); os longos demais, (CHAVE_INVALIDA, TIPO_INVALIDO).
+    """
+    digitos = limpar_documento(serie)
+    quantidade = digitos.str.len()
+    valido = quantidade.between(1, MAX_DIGITOS_CHAVE)
+
+    chave = pd.to_numeric(digitos.where(valido, '0')).astype(np.int64)
+    chave = chave.where(quantidade <= MAX_DIGITOS_CHAVE, CHAVE_INVALIDA)
+    tipo = quantidade.where(quantidade <= MAX_DIGITOS_CHAVE, TIPO_INVALIDO).astype(np.int8)
+    return chave, tipo
@@ -3,12 +3,21 @@ import sys
 import numpy as np
 import logging
 import os
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from cache_planilhas import CATEGORIA, QUALQUER, TEXTO, ColunasFaltandoError, ler_excel_esquema
+from chave_documento import TIPO_VAZIO, chaves_documento
+from delta_planilha import PASTA_DELTAS_PADRAO, registrar_delta
+from escritor_planilha import substituir_aba
+from instrumentacao import Instrumentacao
+from livro_semanal import LivroSemanal, CAMINHO_LIVRO_PADRAO
+from relatorios import AMOSTRA_CONSOLE_PADRAO, PASTA_RELATORIOS_PADRAO, bufferizar_log, relatar_lista
 
 # --- Configuração de Logging ---
+# O arquivo de log é configurado no main(): os processos da leitura paralela (spawn, no Windows)
+# importam este módulo de novo e não devem abrir o log nem instalar outro buffer.
 LOG_FILE_NAME = 'controle_semanal.log'
-logging.basicConfig(filename=LOG_FILE_NAME, level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    encoding='utf-8')
 logger = logging.getLogger(__name__)
 
 # --- Configurações dos Arquivos e Abas (Variáveis RENOMEADAS) ---
@@ -21,6 +30,40 @@ ABA_SEMANAL = "Export"
 PLANILHA_FUTURA_PATH = "adicional2207.xlsx"
 ABA_FUTURA = "Planilha1"
 
+# --- Livro Semanal (histórico dos pagamentos aplicados, por loja e semana) ---
+# Com o livro ativo, o "Valor já liquidado" vem do saldo acumulado no livro e cada semana é somada uma única vez.
+# Nas lojas sem pagamento na semana, um valor da planilha diferente do saldo do livro (correção manual) é mantido,
+# lançado no livro como ajuste e listado em PASTA_RELATORIOS/controle_semanal_divergencias_livro.csv.
+USAR_LIVRO_SEMANAL = True
+LIVRO_SEMANAL_PATH = CAMINHO_LIVRO_PADRAO
+# Identificador da semana no livro: o nome do arquivo semanal (ex.: 'semana 18 a 25')
+SEMANA_ID = os.path.splitext(os.path.basename(PLANILHA_SEMANAL_PATH))[0]
+
+# Carrega as três planilhas ao mesmo tempo, uma por processo (a leitura do openpyxl usa a CPU)
+CARREGAMENTO_PARALELO_ATIVO = True
+
+# --- Instrumentação (tempo, CPU, memória e linhas de cada etapa) ---
+# Os números vão para o log e para um JSON por execução em PASTA_METRICAS.
+PASTA_METRICAS = "metricas"
+# Etapa a ser executada sob o cProfile (ex.: "6/7 Match e atualização de valores"), ou None.
+# Também pode ser escolhida na linha de comando: --perfil="6/7 Match e atualização de valores"
+ETAPA_PERFIL = None
+# Pico de memória de cada etapa com o tracemalloc (deixa o script bem mais lento). Também: --memoria
+MEDIR_MEMORIA = False
+
+# --- Relatório das Novas Lojas ---
+# O console mostra a quantidade e as primeiras AMOSTRA_CONSOLE lojas; a lista completa vai para
+# PASTA_RELATORIOS/controle_semanal_novas_lojas.csv.
+AMOSTRA_CONSOLE = AMOSTRA_CONSOLE_PADRAO
+PASTA_RELATORIOS = PASTA_RELATORIOS_PADRAO
+
+# --- Saída Delta (também: --delta) ---
+# Compara o relatório antes e depois, linha a linha, e grava só as linhas inseridas, alteradas e
+# removidas (com os valores antes e depois) em um arquivo pequeno em PASTA_DELTAS, para revisão.
+# Se nada mudou, a planilha anterior não é regravada.
+SAIDA_DELTA = False
+PASTA_DELTAS = PASTA_DELTAS_PADRAO
+
 # --- Nomes das Colunas (DEFINIDOS COM EXATIDÃO PARA CADA PLANILHA) ---
 COL_ANTERIOR_CNPJ = "CNPJ/CPF do EC \n(sem / ou -)"
 COL_ANTERIOR_NOME = "Razão Social do EC"
@@ -35,30 +78,40 @@ COL_FUTURA_CNPJ = "Cnpj"
 COL_FUTURA_NOME = "Nome"
 COL_FUTURA_AGENDA_FUTURA = "Valor a Antecipar"
 
-# --- Mensagens de Início e Log ---
-print("=" * 80)
-print("             INICIANDO PROCESSAMENTO DE RELATÓRIO SEMANAL (controle_semanal.py)             ")
-print("=" * 80)
-logger.info("Iniciando script de atualização de relatório semanal.")
-
+# --- Esquemas de Leitura (colunas obrigatórias e seus tipos, verificadas na própria leitura) ---
+# CNPJ/CPF como texto: lidos como float, perdem zeros e ganham '.0'. Os valores em dinheiro
+# seguem em float64 (float32 mudaria as somas) e são convertidos na Etapa 3.
+# A planilha anterior é regravada inteira, então as demais colunas dela também são carregadas.
+ESQUEMA_ANTERIOR = {
+    COL_ANTERIOR_CNPJ: TEXTO,
+    COL_ANTERIOR_NOME: QUALQUER,
+    COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO: QUALQUER,
+    COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO: QUALQUER,
+}
+# Da semanal e da futura, apenas estas colunas são carregadas.
+ESQUEMA_SEMANAL = {
+    COL_SEMANAL_CNPJ: TEXTO,
+    COL_SEMANAL_NOME: CATEGORIA,
+    COL_SEMANAL_PAGAMENTOS: QUALQUER,
+}
+ESQUEMA_FUTURA = {
+    COL_FUTURA_CNPJ: TEXTO,
+    COL_FUTURA_NOME: CATEGORIA,
+    COL_FUTURA_AGENDA_FUTURA: QUALQUER,
+}
+
+# Chave de identificação de uma loja (colunas padronizadas na Etapa 3).
+# O CNPJ/CPF fica como número inteiro (CNPJ_CHAVE) mais a quantidade de dígitos (CNPJ_TIPO).
+CHAVE_CNPJ = ['CNPJ_CHAVE', 'CNPJ_TIPO']
+CHAVE_LOJA = CHAVE_CNPJ + ['NOME_LIMPO']
 
 # --- Funções Auxiliares Comuns ---
-def padronizar_cnpj(cnpj_series):
+def padronizar_cnpj(df, coluna_cnpj):
     """
-    Remove caracteres não numéricos de uma série de CNPJs,
-    garantindo que o tipo seja string antes da operação, e removendo '.0' se for float.
+    Cria as colunas CNPJ_CHAVE (int64) e CNPJ_TIPO (quantidade de dígitos) a partir
+    da coluna de CNPJ/CPF original, removendo caracteres não numéricos e o '.0' de floats.
     """
-    if cnpj_series.empty:
-        return pd.Series(dtype=str)
-
-    # Primeiro, converte para string para lidar com floats que viraram '123.0'
-    cnpj_str_series = cnpj_series.astype(str)
-
-    # Remove '.0' de números que foram lidos como float
-    cnpj_str_series = cnpj_str_series.apply(lambda x: x.replace('.0', '') if x.endswith('.0') else x)
-
-    # Remove caracteres não numéricos e espaços extras
-    return cnpj_str_series.str.replace(r'[^\d]', '', regex=True).str.strip()
+    df['CNPJ_CHAVE'], df['CNPJ_TIPO'] = chaves_documento(df[coluna_cnpj])
 
 
 def padronizar_nome(nome_series):
@@ -71,30 +124,76 @@ def padronizar_nome(nome_series):
     return nome_series.astype(str).str.lower().str.strip()
 
 
-def validar_colunas(df, df_path_str, df_name_str, required_cols):
+def consolidar_duplicatas(df):
     """
-    Verifica se todas as colunas essenciais estão presentes no DataFrame.
-    Em caso de falha, imprime um erro crítico e encerra o script.
-    """
-    missing_cols = [col for col in required_cols if col not in df.columns]
-    if missing_cols:
-        error_msg = (
-            f"\n❌ ERRO CRÍTICO: As seguintes colunas esperadas NÃO foram encontradas no DataFrame de '{df_name_str}'.\n"
-            f"   Arquivo: '{df_path_str}'\n"
-            f"   Colunas faltando: {missing_cols}\n"
-            f"   Por favor, verifique a ortografia exata e a existência das colunas no seu arquivo Excel.\n"
-            f"   Colunas disponíveis em '{df_name_str}': {list(df.columns)}"
-        )
-        print(error_msg)
-        logger.critical(error_msg)
-        sys.exit(1)
-    logger.info(f"Todas as colunas essenciais verificadas em {df_name_str}.")
+    Junta as linhas com a mesma CHAVE_LOJA: o valor já liquidado é somado e as demais colunas
+    ficam com o primeiro valor não vazio do grupo (o mesmo que groupby(...).agg('first')).
+    O resultado sai ordenado pela chave, como no groupby, e com as colunas na mesma ordem dele.
 
-
-def carregar_planilha_robusto(file_path, sheet_name, display_name):
+    Em vez de uma agregação por coluna, ordena só as colunas da chave e copia de uma vez a
+    primeira linha de cada chave; só as linhas duplicadas passam por groupby, e apenas na coluna
+    somada e nas colunas em que a primeira linha do grupo está vazia.
+    """
+    chaves = df[CHAVE_LOJA].reset_index(drop=True).sort_values(CHAVE_LOJA, kind='stable')
+    ordem = chaves.index.to_numpy()
+    duplicada = chaves.duplicated(keep=False).to_numpy()
+    primeira = ~chaves.duplicated(keep='first').to_numpy()
+
+    consolidado = df.take(ordem[primeira]).reset_index(drop=True)
+    linhas_grupos = np.flatnonzero(duplicada[primeira])  # Linhas do consolidado que vieram de duplicatas
+    valor_passado = consolidado[COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO]
+    # O groupby soma uma linha vazia isolada como 0; as linhas únicas seguem a mesma regra
+    consolidado[COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] = valor_passado.fillna(0)
+
+    if len(linhas_grupos):
+        # 'first' ignora vazios: onde a primeira linha do grupo está vazia, vale o próximo valor do grupo
+        primeiras_dos_grupos = consolidado.iloc[linhas_grupos]
+        colunas_com_vazio = [col for col in primeiras_dos_grupos.columns[primeiras_dos_grupos.isna().any()]
+                             if col not in CHAVE_LOJA + [COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO]]
+        colunas_grupo = CHAVE_LOJA + [COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] + colunas_com_vazio
+        # dropna=False: uma chave com nome vazio (NaN) também é um grupo, como no sort_values acima
+        grupos = df[colunas_grupo].take(ordem[duplicada]).groupby(CHAVE_LOJA, sort=False, dropna=False)
+
+        posicao_soma = consolidado.columns.get_loc(COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO)
+        consolidado.iloc[linhas_grupos, posicao_soma] = grupos[COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO].sum().to_numpy()
+        if colunas_com_vazio:
+            primeiros_valores = grupos[colunas_com_vazio].first()
+            for col in colunas_com_vazio:  # Coluna a coluna, para não misturar os tipos
+                consolidado.iloc[linhas_grupos, consolidado.columns.get_loc(col)] = primeiros_valores[col].to_numpy()
+
+    colunas = CHAVE_LOJA + [COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO, COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO]
+    colunas += [col for col in df.columns if col not in colunas + [COL_ANTERIOR_CNPJ, COL_ANTERIOR_NOME]]
+    return consolidado[colunas + [COL_ANTERIOR_CNPJ, COL_ANTERIOR_NOME]]
+
+
+def conciliar_com_livro(livro, df, sem_pagamento):
+    """
+    Retorna (saldos, df_divergentes): o saldo do livro de cada linha do relatório e as lojas em que ele
+    difere do valor já liquidado da planilha. Só as lojas sem pagamento na semana ('sem_pagamento') são
+    comparadas, já que o saldo delas não mudou; a diferença é uma correção manual, que é mantida e
+    lançada no livro como ajuste, para valer também nas próximas semanas.
+    """
+    chaves_relatorio = pd.MultiIndex.from_frame(df[CHAVE_LOJA].astype({'CNPJ_TIPO': 'int64'}))
+    saldos_livro = livro.saldos().reindex(chaves_relatorio).to_numpy()
+    valores_planilha = df[COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO].to_numpy(dtype=float)
+    divergentes = (sem_pagamento & np.isfinite(valores_planilha) & np.isfinite(saldos_livro)
+                   & ~np.isclose(valores_planilha, saldos_livro, atol=0.005))
+
+    df_divergentes = df.loc[divergentes, [COL_ANTERIOR_CNPJ, COL_ANTERIOR_NOME]].assign(
+        Valor_Planilha=valores_planilha[divergentes], Saldo_Livro=saldos_livro[divergentes])
+    if divergentes.any():
+        livro.registrar_ajustes(df.loc[divergentes, CHAVE_LOJA].assign(valor=valores_planilha[divergentes]))
+        saldos_livro = np.where(divergentes, valores_planilha, saldos_livro)
+    return saldos_livro, df_divergentes
+
+
+def carregar_planilha_robusto(file_path, sheet_name, display_name, esquema, manter_demais_colunas=False,
+                              leitura=None):
     """
     Carrega uma planilha Excel de forma robusta, com tratamento de erros para
-    arquivo não encontrado, aba inexistente, arquivo vazio ou outros erros.
+    arquivo não encontrado, aba inexistente, colunas essenciais faltando, arquivo vazio ou outros erros.
+    Só as colunas do 'esquema' são carregadas, com os tipos dele, a menos que 'manter_demais_colunas'
+    seja True. 'leitura' é uma leitura já iniciada em outro processo (Future); se vier, o resultado dela é usado.
     """
     if not os.path.exists(file_path):
         error_msg = f"\n❌ ERRO FATAL: Arquivo '{file_path}' NÃO encontrado.\n   Verifique o caminho e o nome do arquivo."
@@ -104,10 +203,25 @@ def carregar_planilha_robusto(file_path, sheet_name, display_name):
 
     try:
         print(f"\n🔄 Carregando {display_name}: '{file_path}' (aba '{sheet_name}')...")
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
+        if leitura is not None:
+            df = leitura.result()
+        else:
+            df = ler_excel_esquema(file_path, sheet_name, esquema, manter_demais_colunas)
         print(f"   ✅ {display_name} carregada. Total de linhas: {len(df)}")
         logger.info(f"{display_name} carregada: {file_path} ({sheet_name}) com {len(df)} linhas.")
+        logger.info(f"Todas as colunas essenciais verificadas em {display_name}.")
         return df
+    except ColunasFaltandoError as e:
+        error_msg = (
+            f"\n❌ ERRO CRÍTICO: As seguintes colunas esperadas NÃO foram encontradas no DataFrame de '{display_name}'.\n"
+            f"   Arquivo: '{file_path}'\n"
+            f"   Colunas faltando: {e.faltando}\n"
+            f"   Por favor, verifique a ortografia exata e a existência das colunas no seu arquivo Excel.\n"
+            f"   Colunas disponíveis em '{display_name}': {e.disponiveis}"
+        )
+        print(error_msg)
+        logger.critical(error_msg)
+        sys.exit(1)
     except ValueError as e:
         error_msg = (
             f"\n❌ ERRO FATAL: A aba '{sheet_name}' NÃO foi encontrada no arquivo '{file_path}'.\n"
@@ -136,327 +250,393 @@ def carregar_planilha_robusto(file_path, sheet_name, display_name):
         sys.exit(1)
 
 
-# --- INÍCIO DO FLUXO PRINCIPAL ---
-
-# --- Etapa 1/7: Carregamento de Planilhas ---
-print("\n--- Etapa 1/7: Carregamento de Planilhas ---")
-df_anterior = carregar_planilha_robusto(PLANILHA_ANTERIOR_PATH, ABA_ANTERIOR, "planilha anterior")
-df_semanal = carregar_planilha_robusto(PLANILHA_SEMANAL_PATH, ABA_SEMANAL, "planilha semanal")
-df_futura = carregar_planilha_robusto(PLANILHA_FUTURA_PATH, ABA_FUTURA, "planilha futura (agenda futura)")
-
-# --- Etapa 2/7: Validação de Colunas Essenciais ---
-print("\n--- Etapa 2/7: Validação de Colunas Essenciais ---")
-required_cols_anterior = [COL_ANTERIOR_CNPJ, COL_ANTERIOR_NOME, COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO,
-                          COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO]
-required_cols_semanal = [COL_SEMANAL_CNPJ, COL_SEMANAL_NOME, COL_SEMANAL_PAGAMENTOS]
-required_cols_futura = [COL_FUTURA_CNPJ, COL_FUTURA_NOME, COL_FUTURA_AGENDA_FUTURA]
-
-validar_colunas(df_anterior, PLANILHA_ANTERIOR_PATH, "planilha anterior", required_cols_anterior)
-validar_colunas(df_semanal, PLANILHA_SEMANAL_PATH, "planilha semanal", required_cols_semanal)
-validar_colunas(df_futura, PLANILHA_FUTURA_PATH, "planilha futura (agenda futura)", required_cols_futura)
-print("✅ Todas as colunas essenciais foram encontradas em todas as planilhas.")
-
-# --- Etapa 3/7: Padronização de Dados e Preparação de Valores Numéricos ---
-print("\n--- Etapa 3/7: Padronizando CNPJs e Nomes, e preparando valores numéricos ---")
-try:
-    # Planilha Anterior
-    df_anterior[COL_ANTERIOR_CNPJ] = df_anterior[COL_ANTERIOR_CNPJ].astype(
-        str)  # Garante que a coluna original é string
-    df_anterior['CNPJ_LIMPO'] = padronizar_cnpj(df_anterior[COL_ANTERIOR_CNPJ])
-    df_anterior['NOME_LIMPO'] = padronizar_nome(df_anterior[COL_ANTERIOR_NOME])
-
-    for col_val in [COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO, COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO]:
-        initial_nan_count = df_anterior[col_val].isnull().sum()
-        df_anterior[col_val] = pd.to_numeric(df_anterior[col_val], errors='coerce').fillna(0)
-        if initial_nan_count > 0:
+def carregar_planilhas_paralelo(planilhas):
+    """
+    Carrega várias planilhas ao mesmo tempo, cada uma em um processo.
+    'planilhas' é uma lista de (file_path, sheet_name, display_name, esquema, manter_demais_colunas); os DataFrames voltam
+    na mesma ordem, com o mesmo tratamento de erros de carregar_planilha_robusto.
+    """
+    if not CARREGAMENTO_PARALELO_ATIVO or len(planilhas) < 2:
+        return [carregar_planilha_robusto(*planilha) for planilha in planilhas]
+
+    # Os processos não herdam o tracemalloc (com fork, herdariam): a leitura ficaria muito mais lenta
+    with ProcessPoolExecutor(max_workers=len(planilhas), initializer=tracemalloc.stop) as executor:
+        leituras = [executor.submit(ler_excel_esquema, file_path, sheet_name, esquema, manter_demais_colunas)
+                    if os.path.exists(file_path) else None
+                    for file_path, sheet_name, _, esquema, manter_demais_colunas in planilhas]
+        return [carregar_planilha_robusto(*planilha, leitura=leitura) for planilha, leitura in zip(planilhas, leituras)]
+
+
+def main():
+    logging.basicConfig(filename=LOG_FILE_NAME, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s',
+                        encoding='utf-8')
+    # O arquivo de log é gravado em lotes (erros e críticos vão na hora)
+    bufferizar_log()
+
+    # --- Mensagens de Início e Log ---
+    print("=" * 80)
+    print("             INICIANDO PROCESSAMENTO DE RELATÓRIO SEMANAL (controle_semanal.py)             ")
+    print("=" * 80)
+    logger.info("Iniciando script de atualização de relatório semanal.")
+
+    etapa_perfil = next((arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--perfil=")), ETAPA_PERFIL)
+    medir_memoria = MEDIR_MEMORIA or '--memoria' in sys.argv[1:]
+    saida_delta = SAIDA_DELTA or '--delta' in sys.argv[1:]
+    instrumentacao = Instrumentacao("controle_semanal", logger, pasta_metricas=PASTA_METRICAS,
+                                    medir_memoria=medir_memoria, etapa_perfil=etapa_perfil)
+
+    # --- INÍCIO DO FLUXO PRINCIPAL ---
+
+    # --- Etapa 1/7: Carregamento de Planilhas ---
+    print("\n--- Etapa 1/7: Carregamento de Planilhas ---")
+    instrumentacao.iniciar_etapa("1/7 Carregamento")
+    # Cada planilha é lida de acordo com o seu esquema (ESQUEMA_ANTERIOR, ESQUEMA_SEMANAL e ESQUEMA_FUTURA)
+    df_anterior, df_semanal, df_futura = carregar_planilhas_paralelo([
+        (PLANILHA_ANTERIOR_PATH, ABA_ANTERIOR, "planilha anterior", ESQUEMA_ANTERIOR, True),
+        (PLANILHA_SEMANAL_PATH, ABA_SEMANAL, "planilha semanal", ESQUEMA_SEMANAL, False),
+        (PLANILHA_FUTURA_PATH, ABA_FUTURA, "planilha futura (agenda futura)", ESQUEMA_FUTURA, False),
+    ])
+    instrumentacao.finalizar_etapa(linhas_saida=len(df_anterior) + len(df_semanal) + len(df_futura))
+    # Cópia do relatório como foi lido (a Etapa 3 altera o df_anterior), para a saída delta
+    df_anterior_lido = df_anterior.copy() if saida_delta else None
+
+    # --- Etapa 2/7: Validação de Colunas Essenciais ---
+    print("\n--- Etapa 2/7: Validação de Colunas Essenciais ---")
+    # A verificação é feita na leitura (Etapa 1), pelos esquemas de cada planilha
+    print("✅ Todas as colunas essenciais foram encontradas em todas as planilhas.")
+
+    # --- Etapa 3/7: Padronização de Dados e Preparação de Valores Numéricos ---
+    print("\n--- Etapa 3/7: Padronizando CNPJs e Nomes, e preparando valores numéricos ---")
+    instrumentacao.iniciar_etapa("3/7 Padronização", linhas_entrada=len(df_anterior) + len(df_semanal) + len(df_futura))
+    try:
+        # Planilha Anterior
+        df_anterior[COL_ANTERIOR_CNPJ] = df_anterior[COL_ANTERIOR_CNPJ].astype(
+            str)  # Garante que a coluna original é string
+        padronizar_cnpj(df_anterior, COL_ANTERIOR_CNPJ)
+        df_anterior['NOME_LIMPO'] = padronizar_nome(df_anterior[COL_ANTERIOR_NOME])
+
+        for col_val in [COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO, COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO]:
+            initial_nan_count = df_anterior[col_val].isnull().sum()
+            df_anterior[col_val] = pd.to_numeric(df_anterior[col_val], errors='coerce').fillna(0)
+            if initial_nan_count > 0:
+                print(
+                    f"   ⚠️ ATENÇÃO: Coluna '{col_val}' (anterior) continha {initial_nan_count} valores não numéricos/vazios, convertidos para 0.")
+                logger.warning(
+                    f"Coluna {col_val} na anterior tinha {initial_nan_count} NaN/não numéricos, convertidos para 0.")
+
+        # Planilha Semanal
+        df_semanal[COL_SEMANAL_CNPJ] = df_semanal[COL_SEMANAL_CNPJ].astype(
+            str)  # Garante que a coluna original é string
+        padronizar_cnpj(df_semanal, COL_SEMANAL_CNPJ)
+        df_semanal['NOME_LIMPO'] = padronizar_nome(df_semanal[COL_SEMANAL_NOME])
+        initial_nan_semanal_pagamentos = df_semanal[COL_SEMANAL_PAGAMENTOS].isnull().sum()
+        df_semanal[COL_SEMANAL_PAGAMENTOS] = pd.to_numeric(df_semanal[COL_SEMANAL_PAGAMENTOS], errors='coerce').fillna(0)
+        if initial_nan_semanal_pagamentos > 0:
             print(
-                f"   ⚠️ ATENÇÃO: Coluna '{col_val}' (anterior) continha {initial_nan_count} valores não numéricos/vazios, convertidos para 0.")
+                f"   ⚠️ ATENÇÃO: Coluna '{COL_SEMANAL_PAGAMENTOS}' (semanal) continha {initial_nan_semanal_pagamentos} valores não numéricos/vazios, convertidos para 0.")
             logger.warning(
-                f"Coluna {col_val} na anterior tinha {initial_nan_count} NaN/não numéricos, convertidos para 0.")
-
-    # Planilha Semanal
-    df_semanal[COL_SEMANAL_CNPJ] = df_semanal[COL_SEMANAL_CNPJ].astype(
-        str)  # Garante que a coluna original é string
-    df_semanal['CNPJ_LIMPO'] = padronizar_cnpj(df_semanal[COL_SEMANAL_CNPJ])
-    df_semanal['NOME_LIMPO'] = padronizar_nome(df_semanal[COL_SEMANAL_NOME])
-    initial_nan_semanal_pagamentos = df_semanal[COL_SEMANAL_PAGAMENTOS].isnull().sum()
-    df_semanal[COL_SEMANAL_PAGAMENTOS] = pd.to_numeric(df_semanal[COL_SEMANAL_PAGAMENTOS], errors='coerce').fillna(0)
-    if initial_nan_semanal_pagamentos > 0:
-        print(
-            f"   ⚠️ ATENÇÃO: Coluna '{COL_SEMANAL_PAGAMENTOS}' (semanal) continha {initial_nan_semanal_pagamentos} valores não numéricos/vazios, convertidos para 0.")
-        logger.warning(
-            f"Coluna {COL_SEMANAL_PAGAMENTOS} na semanal tinha {initial_nan_semanal_pagamentos} NaN/não numéricos, convertidos para 0.")
-
-    # Planilha Futura
-    df_futura[COL_FUTURA_CNPJ] = df_futura[COL_FUTURA_CNPJ].astype(str)  # Garante que a coluna original é string
-    df_futura['CNPJ_LIMPO'] = padronizar_cnpj(df_futura[COL_FUTURA_CNPJ])
-    df_futura['NOME_LIMPO'] = padronizar_nome(df_futura[COL_FUTURA_NOME])
-    initial_nan_futura_agenda = df_futura[COL_FUTURA_AGENDA_FUTURA].isnull().sum()
-    df_futura[COL_FUTURA_AGENDA_FUTURA] = pd.to_numeric(df_futura[COL_FUTURA_AGENDA_FUTURA],
-                                                          errors='coerce').fillna(0)
-    if initial_nan_futura_agenda > 0:
-        print(
-            f"   ⚠️ ATENÇÃO: Coluna '{COL_FUTURA_AGENDA_FUTURA}' (futura) continha {initial_nan_futura_agenda} valores não numéricos/vazios, convertidos para 0.")
-        logger.warning(
-            f"Coluna {COL_FUTURA_AGENDA_FUTURA} na futura tinha {initial_nan_futura_agenda} NaN/não numéricos, convertidos para 0.")
-
-    empty_cnpj_anterior = df_anterior[df_anterior['CNPJ_LIMPO'] == ''].shape[0]
-    empty_cnpj_semanal = df_semanal[df_semanal['CNPJ_LIMPO'] == ''].shape[0]
-    empty_cnpj_futura = df_futura[df_futura['CNPJ_LIMPO'] == ''].shape[0]
-
-    if empty_cnpj_anterior > 0:
-        print(
-            f"   ⚠️ ATENÇÃO: {empty_cnpj_anterior} linhas na planilha anterior possuem CNPJ vazio após padronização. Isso pode afetar o matching.")
-        logger.warning(f"{empty_cnpj_anterior} CNPJs vazios na planilha anterior.")
-    if empty_cnpj_semanal > 0:
-        print(
-            f"   ⚠️ ATENÇÃO: {empty_cnpj_semanal} linhas na planilha semanal possuem CNPJ vazio após padronização. Isso pode afetar o matching.")
-        logger.warning(f"{empty_cnpj_semanal} CNPJs vazios na planilha semanal.")
-    if empty_cnpj_futura > 0:
-        print(
-            f"   ⚠️ ATENÇÃO: {empty_cnpj_futura} linhas na planilha futura possuem CNPJ vazio após padronização. Isso pode afetar o matching.")
-        logger.warning(f"{empty_cnpj_futura} CNPJs vazios na planilha futura.")
-
-    print("✅ CNPJs e Nomes padronizados e valores numéricos preparados em todas as planilhas.")
-    logger.info("Padronização de dados e preparação numérica concluídas.")
-
-except Exception as e:
-    error_msg = f"\n❌ ERRO FATAL: Falha durante a padronização de dados ou conversão de tipo.\n   Detalhes técnicos: {e}"
-    print(error_msg)
-    logger.critical(error_msg)
-    sys.exit(1)
-
-# --- Etapa 4/7: Agrupando dados das planilhas de origem ---
-print("\n--- Etapa 4/7: Agrupando dados das planilhas de origem (Semanal e Futura) ---")
-try:
-    df_semanal_agrupado = df_semanal.groupby(['CNPJ_LIMPO', 'NOME_LIMPO'])[COL_SEMANAL_PAGAMENTOS].sum().reset_index()
-    df_semanal_agrupado.rename(columns={COL_SEMANAL_PAGAMENTOS: 'Soma_Pagamentos_Semanal'}, inplace=True)
-    print(f"   ✅ Dados da Semanal agrupados por CNPJ e Nome. Total de entradas únicas na semanal: {len(df_semanal_agrupado)}")
-    logger.info(f"Dados Semanais agrupados. {len(df_semanal_agrupado)} entradas únicas.")
-
-    # Para a planilha futura, se houver múltiplos valores para o mesmo CNPJ/Nome,
-    # estamos pegando o PRIMEIRO.
-    df_futura_agrupado = df_futura.groupby(['CNPJ_LIMPO', 'NOME_LIMPO'])[
-        COL_FUTURA_AGENDA_FUTURA].first().reset_index()
-    df_futura_agrupado.rename(columns={COL_FUTURA_AGENDA_FUTURA: 'Valor_Agenda_Futura_Futura'}, inplace=True)
-    print(
-        f"   ✅ Dados da planilha futura agrupados por CNPJ e Nome. Total de entradas únicas: {len(df_futura_agrupado)}")
-    logger.info(f"Dados da futura agrupados. {len(df_futura_agrupado)} entradas únicas.")
-
-except Exception as e:
-    error_msg = f"\n❌ ERRO CRÍTICO: Falha ao agrupar dados das planilhas de origem.\n   Detalhes técnicos: {e}"
-    print(error_msg)
-    logger.critical(error_msg)
-    sys.exit(1)
+                f"Coluna {COL_SEMANAL_PAGAMENTOS} na semanal tinha {initial_nan_semanal_pagamentos} NaN/não numéricos, convertidos para 0.")
+
+        # Planilha Futura
+        df_futura[COL_FUTURA_CNPJ] = df_futura[COL_FUTURA_CNPJ].astype(str)  # Garante que a coluna original é string
+        padronizar_cnpj(df_futura, COL_FUTURA_CNPJ)
+        df_futura['NOME_LIMPO'] = padronizar_nome(df_futura[COL_FUTURA_NOME])
+        initial_nan_futura_agenda = df_futura[COL_FUTURA_AGENDA_FUTURA].isnull().sum()
+        df_futura[COL_FUTURA_AGENDA_FUTURA] = pd.to_numeric(df_futura[COL_FUTURA_AGENDA_FUTURA],
+                                                              errors='coerce').fillna(0)
+        if initial_nan_futura_agenda > 0:
+            print(
+                f"   ⚠️ ATENÇÃO: Coluna '{COL_FUTURA_AGENDA_FUTURA}' (futura) continha {initial_nan_futura_agenda} valores não numéricos/vazios, convertidos para 0.")
+            logger.warning(
+                f"Coluna {COL_FUTURA_AGENDA_FUTURA} na futura tinha {initial_nan_futura_agenda} NaN/não numéricos, convertidos para 0.")
 
-# --- Etapa 5/7: Identificando e adicionando novas lojas da Semanal ao relatório ---
-print("\n--- Etapa 5/7: Identificando e adicionando novas lojas da Semanal ao relatório ---")
+        empty_cnpj_anterior = int((df_anterior['CNPJ_TIPO'] == TIPO_VAZIO).sum())
+        empty_cnpj_semanal = int((df_semanal['CNPJ_TIPO'] == TIPO_VAZIO).sum())
+        empty_cnpj_futura = int((df_futura['CNPJ_TIPO'] == TIPO_VAZIO).sum())
 
-novas_lojas_encontradas = []
-df_novas_lojas_para_adicionar_list = [] # Usar uma lista de dicionários para construir o DF
+        if empty_cnpj_anterior > 0:
+            print(
+                f"   ⚠️ ATENÇÃO: {empty_cnpj_anterior} linhas na planilha anterior possuem CNPJ vazio após padronização. Isso pode afetar o matching.")
+            logger.warning(f"{empty_cnpj_anterior} CNPJs vazios na planilha anterior.")
+        if empty_cnpj_semanal > 0:
+            print(
+                f"   ⚠️ ATENÇÃO: {empty_cnpj_semanal} linhas na planilha semanal possuem CNPJ vazio após padronização. Isso pode afetar o matching.")
+            logger.warning(f"{empty_cnpj_semanal} CNPJs vazios na planilha semanal.")
+        if empty_cnpj_futura > 0:
+            print(
+                f"   ⚠️ ATENÇÃO: {empty_cnpj_futura} linhas na planilha futura possuem CNPJ vazio após padronização. Isso pode afetar o matching.")
+            logger.warning(f"{empty_cnpj_futura} CNPJs vazios na planilha futura.")
 
-# Cria um set de chaves (CNPJ_LIMPO, NOME_LIMPO) do df_anterior ORIGINAL
-# para identificar o que já existe no relatório.
-chaves_anterior_existente = set(zip(df_anterior['CNPJ_LIMPO'], df_anterior['NOME_LIMPO']))
+        print("✅ CNPJs e Nomes padronizados e valores numéricos preparados em todas as planilhas.")
+        logger.info("Padronização de dados e preparação numérica concluídas.")
 
-for _, row_semanal in df_semanal_agrupado.iterrows():
-    semanal_cnpj_limpo = row_semanal['CNPJ_LIMPO']
-    semanal_nome_limpo = row_semanal['NOME_LIMPO']
-    semanal_pagamento = row_semanal['Soma_Pagamentos_Semanal']
+    except Exception as e:
+        error_msg = f"\n❌ ERRO FATAL: Falha durante a padronização de dados ou conversão de tipo.\n   Detalhes técnicos: {e}"
+        print(error_msg)
+        logger.critical(error_msg)
+        sys.exit(1)
 
-    # VERIFICA SE A LOJA JÁ EXISTE NO RELATÓRIO ANTERIOR
-    if (semanal_cnpj_limpo, semanal_nome_limpo) not in chaves_anterior_existente:
-        nova_linha_dict = {}
+    instrumentacao.finalizar_etapa(linhas_saida=len(df_anterior) + len(df_semanal) + len(df_futura))
 
-        # Tenta pegar os valores originais da semanal antes da padronização para a nova linha
-        original_semanal_row = df_semanal[(df_semanal['CNPJ_LIMPO'] == semanal_cnpj_limpo) & (df_semanal['NOME_LIMPO'] == semanal_nome_limpo)]
+    # --- Etapa 4/7: Agrupando dados das planilhas de origem ---
+    print("\n--- Etapa 4/7: Agrupando dados das planilhas de origem (Semanal e Futura) ---")
+    instrumentacao.iniciar_etapa("4/7 Agrupamento", linhas_entrada=len(df_semanal) + len(df_futura))
+    try:
+        df_semanal_agrupado = df_semanal.groupby(CHAVE_LOJA)[COL_SEMANAL_PAGAMENTOS].sum().reset_index()
+        df_semanal_agrupado.rename(columns={COL_SEMANAL_PAGAMENTOS: 'Soma_Pagamentos_Semanal'}, inplace=True)
+        print(f"   ✅ Dados da Semanal agrupados por CNPJ e Nome. Total de entradas únicas na semanal: {len(df_semanal_agrupado)}")
+        logger.info(f"Dados Semanais agrupados. {len(df_semanal_agrupado)} entradas únicas.")
+
+        # Para a planilha futura, se houver múltiplos valores para o mesmo CNPJ/Nome,
+        # estamos pegando o PRIMEIRO.
+        df_futura_agrupado = df_futura.groupby(CHAVE_LOJA)[
+            COL_FUTURA_AGENDA_FUTURA].first().reset_index()
+        df_futura_agrupado.rename(columns={COL_FUTURA_AGENDA_FUTURA: 'Valor_Agenda_Futura_Futura'}, inplace=True)
+        print(
+            f"   ✅ Dados da planilha futura agrupados por CNPJ e Nome. Total de entradas únicas: {len(df_futura_agrupado)}")
+        logger.info(f"Dados da futura agrupados. {len(df_futura_agrupado)} entradas únicas.")
 
-        if not original_semanal_row.empty:
-            # Pega o primeiro valor original encontrado para CNPJ e Nome
-            original_cnpj = str(original_semanal_row[COL_SEMANAL_CNPJ].iloc[0])
-            if original_cnpj.endswith('.0'):
-                original_cnpj = original_cnpj.replace('.0', '')
-            nova_linha_dict[COL_ANTERIOR_CNPJ] = original_cnpj
+    except Exception as e:
+        error_msg = f"\n❌ ERRO CRÍTICO: Falha ao agrupar dados das planilhas de origem.\n   Detalhes técnicos: {e}"
+        print(error_msg)
+        logger.critical(error_msg)
+        sys.exit(1)
 
-            nova_linha_dict[COL_ANTERIOR_NOME] = original_semanal_row[COL_SEMANAL_NOME].iloc[0]
-        else:
-            # Fallback para os valores padronizados se o original não for encontrado (improvável)
-            nova_linha_dict[COL_ANTERIOR_CNPJ] = semanal_cnpj_limpo
-            nova_linha_dict[COL_ANTERIOR_NOME] = semanal_nome_limpo
-
-        nova_linha_dict[COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] = semanal_pagamento
-        nova_linha_dict[COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO] = 0.0 # Nova loja começa com 0 para agenda futura
-
-        # Preenche outras colunas com NaN (ou 0 se for numérico, dependendo da necessidade) para as novas lojas
-        for col in df_anterior.columns:
-            if col not in nova_linha_dict:
-                if col in [COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO, COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO]:
-                     nova_linha_dict[col] = 0.0
-                else:
-                    nova_linha_dict[col] = np.nan
-
-        # Adiciona as colunas padronizadas para o futuro re-cálculo da chave
-        nova_linha_dict['CNPJ_LIMPO'] = semanal_cnpj_limpo
-        nova_linha_dict['NOME_LIMPO'] = semanal_nome_limpo
-
-        df_novas_lojas_para_adicionar_list.append(nova_linha_dict)
-        novas_lojas_encontradas.append(
-            f"CNPJ: {nova_linha_dict[COL_ANTERIOR_CNPJ]}, Loja: {nova_linha_dict[COL_ANTERIOR_NOME]}, Valor Pagamento Semanal: {semanal_pagamento:.2f}")
-
-# Concatena as novas lojas APENAS SE HOUVEREM
-if df_novas_lojas_para_adicionar_list:
-    df_novas_lojas_para_adicionar_df = pd.DataFrame(df_novas_lojas_para_adicionar_list)
-    print("\n   --- Novas lojas encontradas e adicionadas ao relatório: ---")
-    for loja_info in novas_lojas_encontradas:
-        print(f"   ➕ {loja_info}")
-    print("   ---------------------------------------------------------")
-    df_anterior_atualizado = pd.concat([df_anterior, df_novas_lojas_para_adicionar_df], ignore_index=True)
-    print(f"   ✅ Total de lojas na planilha anterior após adicionar novas: {len(df_anterior_atualizado)}")
-    logger.info(f"Novas lojas adicionadas: {len(novas_lojas_encontradas)}")
-else:
-    print("   ✅ Nenhuma nova loja encontrada na planilha semanal para adicionar.")
-    df_anterior_atualizado = df_anterior.copy()
-
-# Garante que as colunas _LIMPO estão atualizadas para o df_anterior_atualizado
-df_anterior_atualizado['CNPJ_LIMPO'] = padronizar_cnpj(df_anterior_atualizado[COL_ANTERIOR_CNPJ])
-df_anterior_atualizado['NOME_LIMPO'] = padronizar_nome(df_anterior_atualizado[COL_ANTERIOR_NOME])
-
-logger.info("Processo de identificação de novas lojas concluído.")
-
-# --- INÍCIO DA NOVA ETAPA: Remoção e Consolidação de Duplicatas ---
-print("\n--- Etapa 5.5/7: Verificando e Consolidando Duplicatas ---")
-duplicatas = df_anterior_atualizado.duplicated(subset=['CNPJ_LIMPO', 'NOME_LIMPO'], keep=False)
-num_duplicatas_detectadas = duplicatas.sum()
-if num_duplicatas_detectadas > 0:
-    print(f"   ⚠️ ATENÇÃO: {num_duplicatas_detectadas} linhas com CNPJ/Nome duplicados detectadas no relatório.")
-    logger.warning(f"{num_duplicatas_detectadas} linhas duplicadas detectadas antes da consolidação.")
-    agg_funcs = {
-        COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO: 'sum',
-        COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO: 'first'
-    }
-    for col in df_anterior_atualizado.columns:
-        if col not in [COL_ANTERIOR_CNPJ, COL_ANTERIOR_NOME, 'CNPJ_LIMPO', 'NOME_LIMPO',
-                       COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO, COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO]:
-            agg_funcs[col] = 'first'
-    agg_funcs[COL_ANTERIOR_CNPJ] = 'first'
-    agg_funcs[COL_ANTERIOR_NOME] = 'first'
-    df_anterior_atualizado = df_anterior_atualizado.groupby(['CNPJ_LIMPO', 'NOME_LIMPO'], as_index=False).agg(agg_funcs)
-    num_linhas_apos_consolidacao = len(df_anterior_atualizado)
-    print(f"   ✅ Duplicatas consolidadas. Total de linhas após consolidação: {num_linhas_apos_consolidacao}")
-    logger.info(f"Duplicatas consolidadas. {num_linhas_apos_consolidacao} linhas após consolidação.")
-else:
-    print("   ✅ Nenhuma duplicata encontrada para consolidação.")
-    logger.info("Nenhuma duplicata encontrada para consolidação.")
-
-# --- FIM DA NOVA ETAPA ---
-
-# --- Etapa 6/7: Realizar Match e Atualizações de Valores (Agora com Fuzzy Match apenas no CNPJ para a Futura) ---
-print("\n--- Etapa 6/7: Realizando match e atualizando valores nas colunas do relatório ---")
-
-semanal_combined_map = {(row['CNPJ_LIMPO'], row['NOME_LIMPO']): row['Soma_Pagamentos_Semanal']
-                       for _, row in df_semanal_agrupado.iterrows()}
-# Não usaremos o mapa da futura, faremos o merge
-# adicional_combined_map = {(row['CNPJ_LIMPO'], row['NOME_LIMPO']): row['Valor_Agenda_Futura_Futura']
-#                           for _, row in df_futura_agrupado.iterrows()}
-
-lojas_somadas_semanal = 0
-lojas_substituidas_futura = 0
-
-# Itera sobre cada linha do DataFrame de entrega atualizado
-for idx, row in df_anterior_atualizado.iterrows():
-    cnpj_anterior = row['CNPJ_LIMPO']
-    nome_anterior = row['NOME_LIMPO']
-    chave_combinada = (cnpj_anterior, nome_anterior)
+    instrumentacao.finalizar_etapa(linhas_saida=len(df_semanal_agrupado) + len(df_futura_agrupado))
+
+    # --- Etapa 5/7: Identificando e adicionando novas lojas da Semanal ao relatório ---
+    print("\n--- Etapa 5/7: Identificando e adicionando novas lojas da Semanal ao relatório ---")
+    instrumentacao.iniciar_etapa("5/7 Novas lojas", linhas_entrada=len(df_anterior) + len(df_semanal_agrupado))
+
+    # Cria o conjunto de chaves (CNPJ_CHAVE, CNPJ_TIPO, NOME_LIMPO) do df_anterior ORIGINAL
+    # para identificar o que já existe no relatório.
+    chaves_anterior_existente = pd.MultiIndex.from_frame(df_anterior[CHAVE_LOJA])
+
+    # Anti-join: lojas da semanal (já agrupada) cuja chave não está no relatório anterior
+    chaves_semanal = pd.MultiIndex.from_frame(df_semanal_agrupado[CHAVE_LOJA])
+    df_novas_lojas = df_semanal_agrupado[~chaves_semanal.isin(chaves_anterior_existente)]
+
+    # Valores originais (antes da padronização) da primeira ocorrência de cada chave na semanal.
+    # Toda chave agrupada vem da própria semanal, então o merge sempre encontra a linha original.
+    originais_semanal = df_semanal.drop_duplicates(subset=CHAVE_LOJA)[CHAVE_LOJA + [COL_SEMANAL_CNPJ, COL_SEMANAL_NOME]]
+    df_novas_lojas = df_novas_lojas.merge(originais_semanal, on=CHAVE_LOJA, how='left')
+
+    # Remove '.0' de CNPJs que foram lidos como float
+    cnpj_original = df_novas_lojas[COL_SEMANAL_CNPJ].astype(str)
+    cnpj_original = cnpj_original.where(~cnpj_original.str.endswith('.0'),
+                                        cnpj_original.str.replace('.0', '', regex=False))
+
+    # Monta todas as novas linhas de uma vez: colunas do relatório com NaN, exceto as preenchidas abaixo
+    df_novas_lojas_para_adicionar_df = pd.DataFrame(np.nan, index=range(len(df_novas_lojas)), columns=df_anterior.columns)
+    df_novas_lojas_para_adicionar_df[COL_ANTERIOR_CNPJ] = cnpj_original.to_numpy()
+    df_novas_lojas_para_adicionar_df[COL_ANTERIOR_NOME] = df_novas_lojas[COL_SEMANAL_NOME].to_numpy()
+    df_novas_lojas_para_adicionar_df[COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] = df_novas_lojas['Soma_Pagamentos_Semanal'].to_numpy()
+    df_novas_lojas_para_adicionar_df[COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO] = 0.0  # Nova loja começa com 0 para agenda futura
+    # Adiciona as colunas padronizadas para o futuro re-cálculo da chave
+    df_novas_lojas_para_adicionar_df['CNPJ_CHAVE'] = df_novas_lojas['CNPJ_CHAVE'].to_numpy()
+    df_novas_lojas_para_adicionar_df['CNPJ_TIPO'] = df_novas_lojas['CNPJ_TIPO'].to_numpy()
+    df_novas_lojas_para_adicionar_df['NOME_LIMPO'] = df_novas_lojas['NOME_LIMPO'].to_numpy()
+
+    # Concatena as novas lojas APENAS SE HOUVEREM
+    if not df_novas_lojas_para_adicionar_df.empty:
+        print("\n   --- Novas lojas encontradas e adicionadas ao relatório: ---")
+        caminho_novas_lojas = relatar_lista(
+            df_novas_lojas_para_adicionar_df[[COL_ANTERIOR_CNPJ, COL_ANTERIOR_NOME, COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO]],
+            "controle_semanal_novas_lojas",
+            lambda loja: f"➕ CNPJ: {loja[0]}, Loja: {loja[1]}, Valor Pagamento Semanal: {loja[2]:.2f}",
+            "Novas lojas", AMOSTRA_CONSOLE, PASTA_RELATORIOS, recuo="   ")
+        print("   ---------------------------------------------------------")
+        df_anterior_atualizado = pd.concat([df_anterior, df_novas_lojas_para_adicionar_df], ignore_index=True)
+        print(f"   ✅ Total de lojas na planilha anterior após adicionar novas: {len(df_anterior_atualizado)}")
+        logger.info(f"Novas lojas adicionadas: {len(df_novas_lojas_para_adicionar_df)} (lista em {caminho_novas_lojas})")
+    else:
+        print("   ✅ Nenhuma nova loja encontrada na planilha semanal para adicionar.")
+        df_anterior_atualizado = df_anterior.copy()
+
+    # Garante que as colunas da chave (CNPJ e nome padronizados) estão atualizadas para o df_anterior_atualizado
+    padronizar_cnpj(df_anterior_atualizado, COL_ANTERIOR_CNPJ)
+    df_anterior_atualizado['NOME_LIMPO'] = padronizar_nome(df_anterior_atualizado[COL_ANTERIOR_NOME])
+
+    logger.info("Processo de identificação de novas lojas concluído.")
+    instrumentacao.finalizar_etapa(linhas_saida=len(df_anterior_atualizado))
+
+    # --- INÍCIO DA NOVA ETAPA: Remoção e Consolidação de Duplicatas ---
+    print("\n--- Etapa 5.5/7: Verificando e Consolidando Duplicatas ---")
+    instrumentacao.iniciar_etapa("5.5/7 Consolidação de duplicatas", linhas_entrada=len(df_anterior_atualizado))
+    duplicatas = df_anterior_atualizado.duplicated(subset=CHAVE_LOJA, keep=False)
+    num_duplicatas_detectadas = duplicatas.sum()
+    if num_duplicatas_detectadas > 0:
+        print(f"   ⚠️ ATENÇÃO: {num_duplicatas_detectadas} linhas com CNPJ/Nome duplicados detectadas no relatório.")
+        logger.warning(f"{num_duplicatas_detectadas} linhas duplicadas detectadas antes da consolidação.")
+        df_anterior_atualizado = consolidar_duplicatas(df_anterior_atualizado)
+        num_linhas_apos_consolidacao = len(df_anterior_atualizado)
+        print(f"   ✅ Duplicatas consolidadas. Total de linhas após consolidação: {num_linhas_apos_consolidacao}")
+        logger.info(f"Duplicatas consolidadas. {num_linhas_apos_consolidacao} linhas após consolidação.")
+    else:
+        print("   ✅ Nenhuma duplicata encontrada para consolidação.")
+        logger.info("Nenhuma duplicata encontrada para consolidação.")
+
+    instrumentacao.finalizar_etapa(linhas_saida=len(df_anterior_atualizado))
+    # --- FIM DA NOVA ETAPA ---
+
+    # --- Etapa 6/7: Realizar Match e Atualizações de Valores (Agora com Fuzzy Match apenas no CNPJ para a Futura) ---
+    print("\n--- Etapa 6/7: Realizando match e atualizando valores nas colunas do relatório ---")
+    instrumentacao.iniciar_etapa("6/7 Match e atualização de valores", linhas_entrada=len(df_anterior_atualizado))
+
+    # Pagamento semanal de cada chave (CNPJ_CHAVE, CNPJ_TIPO, NOME_LIMPO); as chaves são únicas após o groupby
+    semanal_combined_map = df_semanal_agrupado.set_index(CHAVE_LOJA)['Soma_Pagamentos_Semanal']
+    # Não usaremos o mapa da futura, faremos o merge
+    # adicional_combined_map = {(row['CNPJ_CHAVE'], row['CNPJ_TIPO'], row['NOME_LIMPO']): row['Valor_Agenda_Futura_Futura']
+    #                           for _, row in df_futura_agrupado.iterrows()}
+
+    lojas_substituidas_futura = 0
 
     # === Atualização da coluna de SOMA (Valor já liquidado ao EC até a data base) ===
     # Esta parte permanece inalterada, pois a regra de somar do BI (semanal) se mantém.
-    if chave_combinada in semanal_combined_map:
-        pagamento_semanal_para_somar = semanal_combined_map[chave_combinada]
-        # Atualiza a linha usando .loc para melhor performance e segurança
-        df_anterior_atualizado.loc[idx, COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] += pagamento_semanal_para_somar
-        lojas_somadas_semanal += 1
-
-# === Implementando o Fuzzy Match para a planilha futura APENAS PELO CNPJ ===
-print("\n   🔄 Realizando o 'fuzzy match' (merge) da planilha futura apenas pelo CNPJ...")
-
-# Prepara a planilha futura para o merge, renomeando as colunas necessárias
-df_futura_para_merge = df_futura_agrupado.rename(columns={'CNPJ_LIMPO': 'CNPJ_LIMPO_FUTURA',
-                                                          'Valor_Agenda_Futura_Futura': 'Valor_Agenda_Futura_Futura'})
-# Mantém apenas o CNPJ limpo e a coluna de valor
-df_futura_para_merge = df_futura_para_merge[['CNPJ_LIMPO_FUTURA', 'Valor_Agenda_Futura_Futura']]
-
-# Realiza o merge. O 'how="left"' garante que todas as linhas da planilha anterior sejam mantidas.
-# O 'on' é a chave de junção, que é apenas o CNPJ_LIMPO.
-df_merged = pd.merge(df_anterior_atualizado,
-                     df_futura_para_merge,
-                     left_on='CNPJ_LIMPO',
-                     right_on='CNPJ_LIMPO_FUTURA',
-                     how='left')
-
-# Agora, substitui os valores na coluna de agenda futura da planilha anterior,
-# usando os valores que vieram do merge.
-# Se o valor do merge for NaN (não encontrou correspondência), o valor original é mantido.
-df_merged[COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO] = df_merged['Valor_Agenda_Futura_Futura'].fillna(
-    df_merged[COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO])
-
-# Contagem de quantas linhas foram substituídas
-# Pega o número de linhas onde a coluna do merge não é nula
-lojas_substituidas_futura = df_merged['Valor_Agenda_Futura_Futura'].notna().sum()
-
-# Remove as colunas temporárias criadas pelo merge
-df_anterior_atualizado = df_merged.drop(columns=['CNPJ_LIMPO_FUTURA', 'Valor_Agenda_Futura_Futura'])
-
-
-print(f"\n   ✅ Atualização de valores concluída.")
-print(f"      - Lojas com valores 'já liquidado' SOMADOS (da semanal): {lojas_somadas_semanal}")
-print(
-    f"      - Lojas com valores 'a liquidar (agenda futura)' SUBSTITUÍDOS (da futura): {lojas_substituidas_futura}")
-
-if lojas_substituidas_futura == 0 and len(df_futura_agrupado) > 0:
-    print("\n   ⚠️ ATENÇÃO: Nenhuma atualização de 'agenda futura' foi realizada pela planilha futura.")
-    logger.warning("Nenhuma atualização de agenda futura da planilha futura foi realizada.")
-
-logger.info(
-    f"Atualização de valores concluída. Somadas: {lojas_somadas_semanal}, Substituídas: {lojas_substituidas_futura}")
-
-# --- Etapa 7/7: Finalização e Salvamento da Planilha Atualizada ---
-print("\n--- Etapa 7/7: Finalização e Salvamento da Planilha Atualizada ---")
-
-# Remove as colunas temporárias de CNPJ/Nome padronizados
-df_final = df_anterior_atualizado.drop(columns=['CNPJ_LIMPO', 'NOME_LIMPO'])
-
-# Garante que as colunas na planilha final mantenham a ordem original da planilha anterior.
-colunas_originais_df_anterior_inicial = df_anterior.columns.tolist()
-colunas_finais_ordenadas = [col for col in colunas_originais_df_anterior_inicial if col in df_final.columns]
-for col in df_final.columns:
-    if col not in colunas_finais_ordenadas:
-        colunas_finais_ordenadas.append(col)
-
-df_final = df_final[colunas_finais_ordenadas]
-
-# Salva o DataFrame final no mesmo arquivo da planilha anterior, substituindo a aba.
-try:
-    print(f"\n💾 Salvando planilha atualizada em: '{PLANILHA_ANTERIOR_PATH}' (aba '{ABA_ANTERIOR}')...")
-    with pd.ExcelWriter(PLANILHA_ANTERIOR_PATH, engine='openpyxl', mode='a',
-                        if_sheet_exists='replace') as writer:
-        df_final.to_excel(writer, sheet_name=ABA_ANTERIOR, index=False)
-
-    print(f"\n🎉 SUCESSO! A planilha '{PLANILHA_ANTERIOR_PATH}' foi atualizada com sucesso.")
-    print("   Verifique o arquivo e o log para os resultados finais.")
-    logger.info("Script finalizado com sucesso. Planilha salva.")
-
-except Exception as e:
-    error_msg = (
-        f"\n❌ ERRO FATAL: Ocorreu um erro ao salvar a planilha atualizada.\n"
-        f"   Por favor, feche o arquivo '{PLANILHA_ANTERIOR_PATH}' se estiver aberto\n"
-        f"   e tente novamente. Certifique-se de ter permissão de escrita na pasta.\n"
-        f"   Detalhes técnicos: {e}"
-    )
-    print(error_msg)
-    logger.critical(error_msg)
-    sys.exit(1)
-
-print("\n" + "=" * 80)
-print("               PROCESSAMENTO CONCLUÍDO COM SUCESSO!               ")
-print("=" + "=" * 80)
-logger.info("Fim da execução do script.")
+    # Localiza a chave de cada linha do relatório no mapa da semanal (-1 = sem pagamento na semana)
+    posicoes_semanal = semanal_combined_map.index.get_indexer(pd.MultiIndex.from_frame(df_anterior_atualizado[CHAVE_LOJA]))
+    mascara_semanal = posicoes_semanal >= 0
+    lojas_somadas_semanal = int(mascara_semanal.sum())
+
+    if USAR_LIVRO_SEMANAL:
+        # O valor já liquidado passa a ser o saldo do livro: valor inicial (BASE) + semanas aplicadas
+        livro = LivroSemanal(LIVRO_SEMANAL_PATH)
+        try:
+            lojas_novas_no_livro = livro.registrar_saldos_iniciais(
+                df_anterior_atualizado[CHAVE_LOJA + [COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO]])
+            if lojas_novas_no_livro > 0:
+                print(f"   📒 {lojas_novas_no_livro} lojas registradas no livro semanal com o valor atual do relatório.")
+                logger.info(f"{lojas_novas_no_livro} lojas registradas no livro semanal ({LIVRO_SEMANAL_PATH}).")
+
+            if not livro.registrar_semana(SEMANA_ID, df_semanal_agrupado[CHAVE_LOJA + ['Soma_Pagamentos_Semanal']]):
+                print(f"   ⚠️ ATENÇÃO: A semana '{SEMANA_ID}' já foi aplicada no livro semanal. "
+                      f"Os pagamentos NÃO foram somados novamente.")
+                logger.warning(f"Semana {SEMANA_ID} já aplicada no livro semanal; pagamentos não somados novamente.")
+                lojas_somadas_semanal = 0
+
+            saldos_livro, df_divergentes = conciliar_com_livro(livro, df_anterior_atualizado, ~mascara_semanal)
+            if not df_divergentes.empty:
+                print("   ⚠️ ATENÇÃO: O valor já liquidado na planilha difere do saldo do livro semanal em "
+                      "lojas sem pagamento nesta semana. O valor da planilha foi mantido e lançado no "
+                      "livro como ajuste.")
+                caminho_divergencias = relatar_lista(
+                    df_divergentes, "controle_semanal_divergencias_livro",
+                    lambda loja: f"⚠️ CNPJ: {loja[0]}, Loja: {loja[1]}, Planilha: {loja[2]:.2f}, "
+                                 f"Livro: {loja[3]:.2f}",
+                    "Divergências com o livro", AMOSTRA_CONSOLE, PASTA_RELATORIOS, recuo="   ")
+                logger.warning(f"{len(df_divergentes)} lojas com valor já liquidado diferente do saldo do livro "
+                               f"semanal; valor da planilha mantido e lançado como ajuste (lista em "
+                               f"{caminho_divergencias}).")
+            df_anterior_atualizado[COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] = saldos_livro
+        except Exception as e:
+            error_msg = f"\n❌ ERRO FATAL: Falha ao atualizar o livro semanal '{LIVRO_SEMANAL_PATH}'.\n   Detalhes técnicos: {e}"
+            print(error_msg)
+            logger.critical(error_msg)
+            sys.exit(1)
+        finally:
+            livro.fechar()
+    elif lojas_somadas_semanal > 0:
+        # Soma de uma vez na coluna inteira; as linhas sem match recebem 0
+        pagamentos_para_somar = np.where(mascara_semanal, semanal_combined_map.to_numpy()[posicoes_semanal], 0)
+        df_anterior_atualizado[COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] = (
+            df_anterior_atualizado[COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] + pagamentos_para_somar)
+
+    # === Implementando o Fuzzy Match para a planilha futura APENAS PELO CNPJ ===
+    print("\n   🔄 Realizando o 'fuzzy match' (merge) da planilha futura apenas pelo CNPJ...")
+
+    # Prepara a planilha futura para o merge: mantém apenas a chave do CNPJ e a coluna de valor
+    df_futura_para_merge = df_futura_agrupado[CHAVE_CNPJ + ['Valor_Agenda_Futura_Futura']]
+
+    # Realiza o merge. O 'how="left"' garante que todas as linhas da planilha anterior sejam mantidas.
+    # O 'on' é a chave de junção, que é apenas o CNPJ (CNPJ_CHAVE, CNPJ_TIPO), comparado como inteiro.
+    df_merged = pd.merge(df_anterior_atualizado,
+                         df_futura_para_merge,
+                         on=CHAVE_CNPJ,
+                         how='left')
+
+    # Agora, substitui os valores na coluna de agenda futura da planilha anterior,
+    # usando os valores que vieram do merge.
+    # Se o valor do merge for NaN (não encontrou correspondência), o valor original é mantido.
+    df_merged[COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO] = df_merged['Valor_Agenda_Futura_Futura'].fillna(
+        df_merged[COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO])
+
+    # Contagem de quantas linhas foram substituídas
+    # Pega o número de linhas onde a coluna do merge não é nula
+    lojas_substituidas_futura = df_merged['Valor_Agenda_Futura_Futura'].notna().sum()
+
+    # Remove as colunas temporárias criadas pelo merge
+    df_anterior_atualizado = df_merged.drop(columns=['Valor_Agenda_Futura_Futura'])
+
+
+    print(f"\n   ✅ Atualização de valores concluída.")
+    print(f"      - Lojas com valores 'já liquidado' SOMADOS (da semanal): {lojas_somadas_semanal}")
+    print(
+        f"      - Lojas com valores 'a liquidar (agenda futura)' SUBSTITUÍDOS (da futura): {lojas_substituidas_futura}")
+
+    if lojas_substituidas_futura == 0 and len(df_futura_agrupado) > 0:
+        print("\n   ⚠️ ATENÇÃO: Nenhuma atualização de 'agenda futura' foi realizada pela planilha futura.")
+        logger.warning("Nenhuma atualização de agenda futura da planilha futura foi realizada.")
+
+    logger.info(
+        f"Atualização de valores concluída. Somadas: {lojas_somadas_semanal}, Substituídas: {lojas_substituidas_futura}")
+    instrumentacao.finalizar_etapa(linhas_saida=len(df_anterior_atualizado))
+
+    # --- Etapa 7/7: Finalização e Salvamento da Planilha Atualizada ---
+    print("\n--- Etapa 7/7: Finalização e Salvamento da Planilha Atualizada ---")
+    instrumentacao.iniciar_etapa("7/7 Salvamento", linhas_entrada=len(df_anterior_atualizado))
+
+    # Remove as colunas temporárias de CNPJ/Nome padronizados
+    df_final = df_anterior_atualizado.drop(columns=CHAVE_LOJA)
+
+    # Garante que as colunas na planilha final mantenham a ordem original da planilha anterior.
+    colunas_originais_df_anterior_inicial = df_anterior.columns.tolist()
+    colunas_finais_ordenadas = [col for col in colunas_originais_df_anterior_inicial if col in df_final.columns]
+    for col in df_final.columns:
+        if col not in colunas_finais_ordenadas:
+            colunas_finais_ordenadas.append(col)
+
+    df_final = df_final[colunas_finais_ordenadas]
+
+    # Na saída delta, só as alterações são gravadas à parte; a planilha é regravada se algo mudou
+    gravar_planilha = True
+    if saida_delta:
+        gravar_planilha = registrar_delta("controle_semanal", df_anterior_lido, df_final,
+                                          [COL_ANTERIOR_CNPJ, COL_ANTERIOR_NOME], PASTA_DELTAS)
+
+    if not gravar_planilha:
+        instrumentacao.finalizar_etapa(linhas_saida=0)
+        print(f"\n✅ Nenhuma linha mudou: a planilha '{PLANILHA_ANTERIOR_PATH}' não foi regravada.")
+        logger.info("Script finalizado sem alterações no relatório (saída delta).")
+    else:
+        # Salva o DataFrame final no mesmo arquivo da planilha anterior, substituindo a aba.
+        try:
+            print(f"\n💾 Salvando planilha atualizada em: '{PLANILHA_ANTERIOR_PATH}' (aba '{ABA_ANTERIOR}')...")
+            substituir_aba(PLANILHA_ANTERIOR_PATH, ABA_ANTERIOR, df_final)
+            instrumentacao.finalizar_etapa(linhas_saida=len(df_final))
+
+            print(f"\n🎉 SUCESSO! A planilha '{PLANILHA_ANTERIOR_PATH}' foi atualizada com sucesso.")
+            print("   Verifique o arquivo e o log para os resultados finais.")
+            logger.info("Script finalizado com sucesso. Planilha salva.")
+
+        except Exception as e:
+            error_msg = (
+                f"\n❌ ERRO FATAL: Ocorreu um erro ao salvar a planilha atualizada.\n"
+                f"   Por favor, feche o arquivo '{PLANILHA_ANTERIOR_PATH}' se estiver aberto\n"
+                f"   e tente novamente. Certifique-se de ter permissão de escrita na pasta.\n"
+                f"   Detalhes técnicos: {e}"
+            )
+            print(error_msg)
+            logger.critical(error_msg)
+            sys.exit(1)
+
+    print("\n" + "=" * 80)
+    print("               PROCESSAMENTO CONCLUÍDO COM SUCESSO!               ")
+    print("=" + "=" * 80)
+    caminho_metricas = instrumentacao.salvar()
+    print(f"⏱️ Métricas da execução gravadas em '{caminho_metricas}'.")
+    logger.info("Fim da execução do script.")
+
+
+if __name__ == "__main__":
+    main()
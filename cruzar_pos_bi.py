@@ -1,9 +1,21 @@
 import pandas as pd
 from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
 import sys
 import numpy as np  # Import numpy for np.nan
 
+from functools import partial
+
+from cache_matching import CacheMatching, CAMINHO_CACHE_PADRAO, MAX_ENTRADAS_PADRAO
+from cache_planilhas import CATEGORIA, INTEIRO, QUALQUER, ColunasFaltandoError, ler_excel_esquema
+from candidatos_nomes import IndiceNomes, casar_bloco_nomes, casar_bloco_nomes_dois_melhores
+from delta_planilha import PASTA_DELTAS_PADRAO, registrar_delta
+from escritor_planilha import substituir_aba
+from matching_paralelo import casar_em_paralelo, MAX_WORKERS_PADRAO, TAMANHO_BLOCO_PADRAO
+from memo_execucao import DIRETORIO_MEMO_PADRAO, MemoExecucao
+from normalizacao_nomes import chaves_canonicas
+from varredura_limiares import MARGEM_AMBIGUIDADE_PADRAO, PASTA_VARREDURAS_PADRAO, imprimir_varredura, \
+    resumir_varredura, salvar_varredura
+
 # --- Configurações dos Arquivos e Colunas ---
 
 # Planilha de Origem (pos_bi)
@@ -24,100 +36,196 @@ COL_DESTINO_NOME_DESCRICAO = "Descrição"  # Coluna para o fuzzy match na plani
 COL_DESTINO_POS_ADIQ = "POS Adiq"  # Nova coluna a ser criada/preenchida
 COL_DESTINO_POS_NAO_UTILIZADA = "POS NÃO UTILIZADA"  # Nova coluna a ser criada/preenchida
 
+# --- Esquemas de Leitura (colunas obrigatórias e seus tipos) ---
+# Da pos_bi, que é só referência, apenas estas colunas são carregadas.
+ESQUEMA_POS_BI = {
+    COL_POS_BI_NOME_EMPRESA: CATEGORIA,
+    COL_POS_BI_TOTAL_POS_ALOCADAS: INTEIRO,
+    COL_POS_BI_TOTAL_POS_NAO_UTILIZADAS: INTEIRO,
+}
+# A aba de destino é regravada inteira, então as demais colunas dela também são carregadas.
+ESQUEMA_DESTINO = {COL_DESTINO_NOME_DESCRICAO: QUALQUER}
+
 # --- Limiar para Fuzzy Matching de Nomes ---
 # Ajuste conforme a similaridade esperada dos nomes das empresas.
 # Para nomes, 75-85 geralmente é um bom ponto de partida.
 FUZZY_NAME_THRESHOLD = 80
 
-# --- Carregar Planilhas ---
-try:
-    print(f"🔄 Carregando '{PLANILHA_POS_BI_PATH}' (aba '{ABA_POS_BI}')...")
-    df_pos_bi = pd.read_excel(PLANILHA_POS_BI_PATH, sheet_name=ABA_POS_BI)
-
-    print(f"🔄 Carregando '{PLANILHA_DESTINO_PATH}' (aba '{ABA_DESTINO}')...")
-    df_destino = pd.read_excel(PLANILHA_DESTINO_PATH, sheet_name=ABA_DESTINO)
-
-    print("✅ Planilhas carregadas com sucesso.")
-
-except FileNotFoundError as e:
-    print(
-        f"\n❌ ERRO: Arquivo não encontrado. Verifique os caminhos dos arquivos e certifique-se de que estão na mesma pasta do script.")
-    print(f"Detalhes: {e}")
-    sys.exit(1)
-except ValueError as e:  # Captura o erro específico se a aba não for encontrada
-    print(f"\n❌ ERRO: A aba especificada não foi encontrada. Detalhes: {e}")
-    print(f"Verifique o nome da aba em '{PLANILHA_POS_BI_PATH}' ou '{PLANILHA_DESTINO_PATH}'.")
-    sys.exit(1)
-except Exception as e:
-    print(f"\n❌ Ocorreu um erro inesperado ao carregar os arquivos Excel. Detalhes: {e}")
-    print("Verifique se os arquivos não estão abertos em outro programa e se estão no formato correto.")
+# --- Caminho Rápido: Chave Canônica ---
+# Antes do fuzzy, os nomes são comparados pela chave canônica (sem acentos, pontuação e formas
+# jurídicas, com as palavras ordenadas). Linhas cuja chave corresponde a um único nome da pos_bi
+# são resolvidas por igualdade exata; só as demais passam pelo fuzzy matching.
+USAR_CHAVE_CANONICA = True
+
+# --- Geração de Candidatos (TF-IDF de n-gramas de caracteres) ---
+# Apenas os TOP_K_CANDIDATOS nomes mais parecidos de cada linha são pontuados com token_set_ratio.
+# Aumente o valor se algum match esperado não estiver sendo encontrado.
+TOP_K_CANDIDATOS = 10
+
+# --- Paralelismo do Fuzzy Matching ---
+MATCHING_WORKERS = MAX_WORKERS_PADRAO  # Número de processos (1 = execução serial)
+MATCHING_TAMANHO_BLOCO = TAMANHO_BLOCO_PADRAO  # Nomes enviados a cada processo por vez
+
+# --- Cache de Matching entre Execuções ---
+# Guarda o melhor match de cada nome em disco: nas próximas execuções, só os nomes novos
+# (ou uma pos_bi alterada) são pontuados novamente.
+USAR_CACHE_MATCHING = True
+CACHE_MATCHING_PATH = CAMINHO_CACHE_PADRAO
+CACHE_MATCHING_MAX_ENTRADAS = MAX_ENTRADAS_PADRAO
+
+# --- Saída Delta (também: --delta) ---
+# Compara a aba de destino antes e depois, linha a linha, e grava só as linhas alteradas (com os
+# valores antes e depois) em um arquivo pequeno em PASTA_DELTAS. Se nada mudou, a planilha não é regravada.
+SAIDA_DELTA = False
+PASTA_DELTAS = PASTA_DELTAS_PADRAO
+
+# --- Varredura de Limiares (python cruzar_pos_bi.py --varredura) ---
+# Pontua cada nome uma única vez, guardando o melhor e o segundo melhor candidato, e mostra
+# quantas linhas casariam (e quantas seriam ambíguas) em cada limiar. Não grava a planilha.
+LIMIARES_VARREDURA = list(range(62, 101, 2))
+MARGEM_AMBIGUIDADE = MARGEM_AMBIGUIDADE_PADRAO
+PASTA_VARREDURAS = PASTA_VARREDURAS_PADRAO
+
+# --- Memória de Execuções (pular reexecuções com as mesmas entradas) ---
+# Se as planilhas de entrada, os parâmetros abaixo (abas, colunas, limiares) e o código não mudaram
+# desde a última execução, e a saída dela continua igual, o script termina sem refazer o matching.
+# Para processar mesmo assim: --forcar
+USAR_MEMO_EXECUCAO = True
+MEMO_EXECUCAO_DIRETORIO = DIRETORIO_MEMO_PADRAO
+ENTRADAS_EXECUCAO = [PLANILHA_POS_BI_PATH, PLANILHA_DESTINO_PATH]
+SAIDA_EXECUCAO = PLANILHA_DESTINO_PATH
+
+
+# --- Colunas Essenciais (verificadas na leitura, pelos esquemas) ---
+def informar_colunas_faltando(erro):
+    print(f"\n❌ ERRO: As seguintes colunas esperadas não foram encontradas no DataFrame de '{erro.caminho}':")
+    for col in erro.faltando:
+        print(f"- '{col}'")
+    print(f"Colunas disponíveis: {erro.disponiveis}")
     sys.exit(1)
 
 
-# --- Validação de Colunas Essenciais ---
-def validar_colunas(df, df_nome_str, colunas_requeridas):
-    missing_cols = [col for col in colunas_requeridas if col not in df.columns]
-    if missing_cols:
-        print(f"\n❌ ERRO: As seguintes colunas esperadas não foram encontradas no DataFrame de '{df_nome_str}':")
-        for col in missing_cols:
-            print(f"- '{col}'")
-        print(f"Colunas disponíveis: {list(df.columns)}")
-        sys.exit(1)
-
-
-validar_colunas(df_pos_bi, PLANILHA_POS_BI_PATH,
-                [COL_POS_BI_NOME_EMPRESA, COL_POS_BI_TOTAL_POS_ALOCADAS, COL_POS_BI_TOTAL_POS_NAO_UTILIZADAS])
-validar_colunas(df_destino, PLANILHA_DESTINO_PATH, [COL_DESTINO_NOME_DESCRICAO])
-print("✅ Colunas essenciais verificadas.")
-
-# --- Preparação dos Dados para Fuzzy Matching ---
-print("🔄 Padronizando nomes para fuzzy matching...")
-
-# Criar uma versão padronizada dos nomes para o matching (minúsculas, sem espaços extras)
-df_pos_bi['NOME_EMPRESA_LIMPO'] = df_pos_bi[COL_POS_BI_NOME_EMPRESA].astype(str).str.lower().str.strip()
-df_destino['NOME_DESCRICAO_LIMPO'] = df_destino[COL_DESTINO_NOME_DESCRICAO].astype(str).str.lower().str.strip()
-
-# Criar uma lista de nomes limpos da pos_bi para o fuzzy matching (choices)
-lista_nomes_pos_bi = df_pos_bi['NOME_EMPRESA_LIMPO'].tolist()
-
-# Criar um dicionário para mapear o nome limpo da pos_bi de volta para os dados originais
-# Pode haver nomes repetidos em pos_bi, então vamos agrupar para ter um total único por nome limpo
-# Se um nome limpo tiver múltiplas entradas com diferentes totais, vamos somá-los.
-df_pos_bi_agrupado = df_pos_bi.groupby('NOME_EMPRESA_LIMPO').agg(
-    {
-        COL_POS_BI_TOTAL_POS_ALOCADAS: 'sum',
-        COL_POS_BI_TOTAL_POS_NAO_UTILIZADAS: 'sum'
-    }
-).reset_index()
-
-# Dicionário para busca rápida (Nome Limpo -> {Total POS Alocadas, Total POS Não Utilizadas})
-mapa_dados_pos_bi = df_pos_bi_agrupado.set_index('NOME_EMPRESA_LIMPO').to_dict('index')
+def carregar_planilhas():
+    """
+    Carrega a aba 'Export' da pos_bi e a aba de devolução da planilha de destino,
+    já verificando as colunas essenciais (ESQUEMA_POS_BI e ESQUEMA_DESTINO).
+    """
+    try:
+        print(f"🔄 Carregando '{PLANILHA_POS_BI_PATH}' (aba '{ABA_POS_BI}')...")
+        df_pos_bi = ler_excel_esquema(PLANILHA_POS_BI_PATH, ABA_POS_BI, ESQUEMA_POS_BI)
 
-print("✅ Nomes padronizados e dados de referência preparados.")
+        print(f"🔄 Carregando '{PLANILHA_DESTINO_PATH}' (aba '{ABA_DESTINO}')...")
+        df_destino = ler_excel_esquema(PLANILHA_DESTINO_PATH, ABA_DESTINO, ESQUEMA_DESTINO, manter_demais_colunas=True)
 
-# --- Inicializar Novas Colunas no DataFrame de Destino ---
-# Pre-encher as novas colunas com NaN. Elas serão preenchidas se um match for encontrado.
-df_destino[COL_DESTINO_POS_ADIQ] = np.nan
-df_destino[COL_DESTINO_POS_NAO_UTILIZADA] = np.nan
-print(f"✅ Novas colunas '{COL_DESTINO_POS_ADIQ}' e '{COL_DESTINO_POS_NAO_UTILIZADA}' inicializadas com NaN.")
+        print("✅ Planilhas carregadas com sucesso.")
+        print("✅ Colunas essenciais verificadas.")
 
-# --- Realizar Fuzzy Matching e Preencher Colunas ---
-print(
-    f"🔄 Iniciando o fuzzy matching de nomes e preenchimento das colunas '{COL_DESTINO_POS_ADIQ}' e '{COL_DESTINO_POS_NAO_UTILIZADA}'...")
-linhas_atualizadas = 0
+    except ColunasFaltandoError as e:
+        informar_colunas_faltando(e)
 
-for idx_dest, row_dest in df_destino.iterrows():
-    nome_destino_limpo = row_dest['NOME_DESCRICAO_LIMPO']
+    except FileNotFoundError as e:
+        print(
+            f"\n❌ ERRO: Arquivo não encontrado. Verifique os caminhos dos arquivos e certifique-se de que estão na mesma pasta do script.")
+        print(f"Detalhes: {e}")
+        sys.exit(1)
+    except ValueError as e:  # Captura o erro específico se a aba não for encontrada
+        print(f"\n❌ ERRO: A aba especificada não foi encontrada. Detalhes: {e}")
+        print(f"Verifique o nome da aba em '{PLANILHA_POS_BI_PATH}' ou '{PLANILHA_DESTINO_PATH}'.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Ocorreu um erro inesperado ao carregar os arquivos Excel. Detalhes: {e}")
+        print("Verifique se os arquivos não estão abertos em outro programa e se estão no formato correto.")
+        sys.exit(1)
 
-    # Se a lista de nomes de referência não estiver vazia
-    if lista_nomes_pos_bi:
-        # Encontra o melhor match fuzzy para o nome na planilha de destino
-        # usando token_set_ratio para lidar melhor com ordem e palavras extras/faltando
-        best_match_tuple = process.extractOne(
-            query=nome_destino_limpo,
-            choices=lista_nomes_pos_bi,
-            scorer=fuzz.token_set_ratio
-        )
+    return df_pos_bi, df_destino
+
+
+def padronizar_nomes(df_pos_bi, df_destino):
+    """
+    Cria as colunas de nomes limpos nas duas planilhas e retorna (lista_nomes_pos_bi, nome_pos_bi_exato):
+    a lista de nomes limpos da pos_bi (choices do fuzzy) e, para cada linha de destino, o nome
+    limpo da pos_bi encontrado pela chave canônica (NaN quando não há match exato).
+    """
+    # Criar uma versão padronizada dos nomes para o matching (minúsculas, sem espaços extras)
+    df_pos_bi['NOME_EMPRESA_LIMPO'] = df_pos_bi[COL_POS_BI_NOME_EMPRESA].astype(str).str.lower().str.strip()
+    df_destino['NOME_DESCRICAO_LIMPO'] = df_destino[COL_DESTINO_NOME_DESCRICAO].astype(str).str.lower().str.strip()
+
+    # Criar uma lista de nomes limpos da pos_bi para o fuzzy matching (choices)
+    lista_nomes_pos_bi = df_pos_bi['NOME_EMPRESA_LIMPO'].tolist()
+
+    # --- Caminho Rápido: igualdade exata da chave canônica ---
+    # Chaves que correspondem a mais de um nome da pos_bi são ambíguas e ficam para o fuzzy.
+    nome_pos_bi_exato = pd.Series(np.nan, index=df_destino.index, dtype=object)
+    if USAR_CHAVE_CANONICA:
+        df_pos_bi['NOME_CANONICO'] = chaves_canonicas(df_pos_bi[COL_POS_BI_NOME_EMPRESA])
+        pares = df_pos_bi.loc[df_pos_bi['NOME_CANONICO'] != '', ['NOME_CANONICO', 'NOME_EMPRESA_LIMPO']]
+        pares = pares.drop_duplicates().drop_duplicates(subset='NOME_CANONICO', keep=False)
+        chave_para_nome = dict(zip(pares['NOME_CANONICO'], pares['NOME_EMPRESA_LIMPO']))
+        nome_pos_bi_exato = chaves_canonicas(df_destino[COL_DESTINO_NOME_DESCRICAO]).map(chave_para_nome)
+
+    return lista_nomes_pos_bi, nome_pos_bi_exato
+
+
+def cruzar_com_pos_bi(df_pos_bi, df_destino, cache_matching=None):
+    """
+    Preenche as colunas 'POS Adiq' e 'POS NÃO UTILIZADA' de df_destino com os totais da pos_bi
+    da empresa correspondente (fuzzy matching de nomes). Retorna o DataFrame de destino atualizado.
+    """
+    # --- Preparação dos Dados para Fuzzy Matching ---
+    print("🔄 Padronizando nomes para fuzzy matching...")
+    lista_nomes_pos_bi, nome_pos_bi_exato = padronizar_nomes(df_pos_bi, df_destino)
+
+    # Criar um dicionário para mapear o nome limpo da pos_bi de volta para os dados originais
+    # Pode haver nomes repetidos em pos_bi, então vamos agrupar para ter um total único por nome limpo
+    # Se um nome limpo tiver múltiplas entradas com diferentes totais, vamos somá-los.
+    df_pos_bi_agrupado = df_pos_bi.groupby('NOME_EMPRESA_LIMPO').agg(
+        {
+            COL_POS_BI_TOTAL_POS_ALOCADAS: 'sum',
+            COL_POS_BI_TOTAL_POS_NAO_UTILIZADAS: 'sum'
+        }
+    ).reset_index()
+
+    # Dicionário para busca rápida (Nome Limpo -> {Total POS Alocadas, Total POS Não Utilizadas})
+    mapa_dados_pos_bi = df_pos_bi_agrupado.set_index('NOME_EMPRESA_LIMPO').to_dict('index')
+
+    print("✅ Nomes padronizados e dados de referência preparados.")
+
+    # --- Inicializar Novas Colunas no DataFrame de Destino ---
+    # Pre-encher as novas colunas com NaN. Elas serão preenchidas se um match for encontrado.
+    df_destino[COL_DESTINO_POS_ADIQ] = np.nan
+    df_destino[COL_DESTINO_POS_NAO_UTILIZADA] = np.nan
+    print(f"✅ Novas colunas '{COL_DESTINO_POS_ADIQ}' e '{COL_DESTINO_POS_NAO_UTILIZADA}' inicializadas com NaN.")
+
+    # --- Realizar Fuzzy Matching e Preencher Colunas ---
+    print(
+        f"🔄 Iniciando o fuzzy matching de nomes e preenchimento das colunas '{COL_DESTINO_POS_ADIQ}' e '{COL_DESTINO_POS_NAO_UTILIZADA}'...")
+    linhas_atualizadas = 0
+    linhas_exatas = 0
+
+    # Gera os candidatos dos nomes distintos da planilha de destino sem match exato em lote
+    # e re-pontua apenas esses candidatos com token_set_ratio. Cada processo monta o
+    # índice de nomes da pos_bi uma única vez e recebe blocos de nomes de destino.
+    nomes_destino_unicos = df_destino.loc[nome_pos_bi_exato.isna(), 'NOME_DESCRICAO_LIMPO'].unique().tolist()
+    casar_nomes = partial(casar_em_paralelo, referencias=lista_nomes_pos_bi,
+                          preparar=partial(IndiceNomes, scorer=fuzz.token_set_ratio, top_k=TOP_K_CANDIDATOS),
+                          casar_bloco=casar_bloco_nomes,
+                          max_workers=MATCHING_WORKERS, tamanho_bloco=MATCHING_TAMANHO_BLOCO)
+    if cache_matching:
+        # O top-k entra na chave do scorer porque muda quais candidatos são pontuados
+        melhores_matches = cache_matching.casar(nomes_destino_unicos, lista_nomes_pos_bi,
+                                                f"fuzz.token_set_ratio/top{TOP_K_CANDIDATOS}",
+                                                FUZZY_NAME_THRESHOLD, casar_nomes)
+    else:
+        melhores_matches = casar_nomes(nomes_destino_unicos)
+    matches_por_nome = dict(zip(nomes_destino_unicos, melhores_matches))
+
+    for idx_dest, nome_destino_limpo, nome_exato in zip(df_destino.index, df_destino['NOME_DESCRICAO_LIMPO'],
+                                                        nome_pos_bi_exato):
+        if isinstance(nome_exato, str):
+            best_match_tuple = (nome_exato, 100)
+            linhas_exatas += 1
+        else:
+            best_match_tuple = matches_por_nome.get(nome_destino_limpo)
 
         if best_match_tuple:
             matched_name_pos_bi, score = best_match_tuple[0], best_match_tuple[1]
@@ -132,30 +240,140 @@ for idx_dest, row_dest in df_destino.iterrows():
                         COL_POS_BI_TOTAL_POS_NAO_UTILIZADAS]
                     linhas_atualizadas += 1
 
-print(f"✅ Fuzzy matching de nomes concluído. {linhas_atualizadas} linhas atualizadas.")
-if linhas_atualizadas == 0:
-    print("\n⚠️ Nenhuma linha foi atualizada. Isso pode indicar:")
-    print("  - Nomes de empresas muito diferentes entre as planilhas.")
-    print(f"  - O limiar de similaridade de nomes ({FUZZY_NAME_THRESHOLD}%) pode ser muito alto.")
-    print(
-        "  - Considere diminuir 'FUZZY_NAME_THRESHOLD' ou inspecione os dados manualmente para entender as diferenças.")
+    print(f"✅ Fuzzy matching de nomes concluído. {linhas_atualizadas} linhas atualizadas "
+          f"({linhas_exatas} pela chave canônica, sem fuzzy).")
+    if linhas_atualizadas == 0:
+        print("\n⚠️ Nenhuma linha foi atualizada. Isso pode indicar:")
+        print("  - Nomes de empresas muito diferentes entre as planilhas.")
+        print(f"  - O limiar de similaridade de nomes ({FUZZY_NAME_THRESHOLD}%) pode ser muito alto.")
+        print(
+            "  - Considere diminuir 'FUZZY_NAME_THRESHOLD' ou inspecione os dados manualmente para entender as diferenças.")
+
+    # --- Limpeza (Remover colunas temporárias) ---
+    return df_destino.drop(columns=['NOME_DESCRICAO_LIMPO'])  # Remove a coluna temporária de nomes limpos
+
+
+def varrer_limiares(df_pos_bi, df_destino, limiares=LIMIARES_VARREDURA):
+    """
+    Pontua cada nome distinto de destino uma única vez (melhor e segundo melhor candidato)
+    e mostra, para cada limiar, as linhas casadas, as ambíguas e exemplos perto da fronteira.
+    As linhas resolvidas pela chave canônica não dependem do limiar e contam em todos eles.
+    """
+    print("🔄 Padronizando nomes para a varredura de limiares...")
+    lista_nomes_pos_bi, nome_pos_bi_exato = padronizar_nomes(df_pos_bi, df_destino)
+    linhas_exatas = int(nome_pos_bi_exato.notna().sum())
+
+    # Número de linhas de cada nome: a pontuação é feita por nome distinto
+    contagem = df_destino.loc[nome_pos_bi_exato.isna(), 'NOME_DESCRICAO_LIMPO'].value_counts(sort=False)
+    nomes = contagem.index.tolist()
+    print(f"🔄 Pontuando {len(nomes)} nomes distintos uma única vez ({linhas_exatas} linhas já resolvidas "
+          f"pela chave canônica)...")
+    dois_melhores = casar_em_paralelo(nomes, lista_nomes_pos_bi,
+                                      preparar=partial(IndiceNomes, scorer=fuzz.token_set_ratio,
+                                                       top_k=TOP_K_CANDIDATOS),
+                                      casar_bloco=casar_bloco_nomes_dois_melhores,
+                                      max_workers=MATCHING_WORKERS, tamanho_bloco=MATCHING_TAMANHO_BLOCO)
+
+    resumo = resumir_varredura(nomes, dois_melhores, contagem.to_numpy(), limiares, margem=MARGEM_AMBIGUIDADE,
+                               linhas_fora_da_varredura=linhas_exatas)
+    print(f"✅ Varredura concluída (ambíguas: segundo candidato a até {MARGEM_AMBIGUIDADE} pontos do melhor).")
+    imprimir_varredura(resumo, FUZZY_NAME_THRESHOLD, len(df_destino))
+
+    caminho = salvar_varredura("cruzar_pos_bi", resumo, {
+        "scorer": f"fuzz.token_set_ratio/top{TOP_K_CANDIDATOS}",
+        "limiar_atual": FUZZY_NAME_THRESHOLD,
+        "margem_ambiguidade": MARGEM_AMBIGUIDADE,
+        "linhas_chave_canonica": linhas_exatas,
+    }, PASTA_VARREDURAS)
+    print(f"\n📒 Varredura gravada em '{caminho}'.")
+
+
+def salvar_planilha(df_destino, caminho=PLANILHA_DESTINO_PATH):
+    """
+    Salva a planilha de destino sobrescrevendo APENAS a aba 'Devolução de Maquininhas - Inat'.
+    Isso é feito com substituir_aba, que troca só a aba no arquivo (as demais abas são copiadas sem alteração).
+    """
+    try:
+        substituir_aba(caminho, ABA_DESTINO, df_destino)
+
+        print(
+            f"\n🎉 Sucesso! A planilha '{caminho}' foi atualizada na aba '{ABA_DESTINO}' com os dados da pos_bi.")
+
+    except Exception as e:
+        print(f"\n❌ ERRO ao salvar a planilha '{caminho}'.")
+        print(f"Detalhes: {e}")
+        sys.exit(1)
 
-# --- Limpeza (Remover colunas temporárias) ---
-df_destino = df_destino.drop(columns=['NOME_DESCRICAO_LIMPO'])  # Remove a coluna temporária de nomes limpos
 
-# --- Salvar a Planilha de Destino Atualizada ---
-# Salvaremos a planilha de destino sobrescrevendo APENAS a aba 'Devolução de Maquininhas - Inat'.
-# Isso é feito usando ExcelWriter com mode='a' (append) e if_sheet_exists='replace'.
-try:
-    with pd.ExcelWriter(PLANILHA_DESTINO_PATH, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-        df_destino.to_excel(writer, sheet_name=ABA_DESTINO, index=False)
+def criar_cache_matching():
+    """
+    Retorna o cache de matching entre execuções, ou None se USAR_CACHE_MATCHING estiver desligado.
+    """
+    if not USAR_CACHE_MATCHING:
+        return None
+    return CacheMatching(CACHE_MATCHING_PATH, CACHE_MATCHING_MAX_ENTRADAS)
+
+
+def criar_memo_execucao():
+    """
+    Retorna a memória de execuções deste script, ou None se USAR_MEMO_EXECUCAO estiver desligado.
+    """
+    if not USAR_MEMO_EXECUCAO:
+        return None
+    return MemoExecucao("cruzar_pos_bi", ENTRADAS_EXECUCAO, parametros_execucao(), SAIDA_EXECUCAO,
+                        MEMO_EXECUCAO_DIRETORIO)
+
+
+def parametros_execucao():
+    """
+    Constantes que mudam o resultado do cruzamento (entram na impressão da memória de execuções).
+    """
+    return {
+        "abas": [ABA_POS_BI, ABA_DESTINO],
+        "colunas": [COL_POS_BI_NOME_EMPRESA, COL_POS_BI_TOTAL_POS_ALOCADAS, COL_POS_BI_TOTAL_POS_NAO_UTILIZADAS,
+                    COL_DESTINO_NOME_DESCRICAO, COL_DESTINO_POS_ADIQ, COL_DESTINO_POS_NAO_UTILIZADA],
+        "limiar": FUZZY_NAME_THRESHOLD,
+        "top_k": TOP_K_CANDIDATOS,
+        "chave_canonica": USAR_CHAVE_CANONICA,
+    }
 
-    print(
-        f"\n🎉 Sucesso! A planilha '{PLANILHA_DESTINO_PATH}' foi atualizada na aba '{ABA_DESTINO}' com os dados da pos_bi.")
 
-except Exception as e:
-    print(f"\n❌ ERRO ao salvar a planilha '{PLANILHA_DESTINO_PATH}'.")
-    print(f"Detalhes: {e}")
-    sys.exit(1)
+def main():
+    memo_execucao = criar_memo_execucao()
+    if memo_execucao and not {'--forcar', '--varredura'} & set(sys.argv[1:]) and memo_execucao.repetida():
+        print(f"✅ Entradas e parâmetros iguais aos da execução de {memo_execucao.data_ultima_execucao()}: "
+              f"'{SAIDA_EXECUCAO}' já está atualizada (use --forcar para processar de novo).")
+        print("\n✨ Processamento finalizado. ✨")
+        return
+
+    df_pos_bi, df_destino = carregar_planilhas()
+
+    if '--varredura' in sys.argv[1:]:
+        varrer_limiares(df_pos_bi, df_destino)
+        print("\n✨ Varredura finalizada (a planilha não foi alterada). ✨")
+        return
+
+    saida_delta = SAIDA_DELTA or '--delta' in sys.argv[1:]
+    df_destino_lido = df_destino.copy() if saida_delta else None
+
+    cache_matching = criar_cache_matching()
+    df_destino = cruzar_com_pos_bi(df_pos_bi, df_destino, cache_matching)
+
+    # --- Salvar a Planilha de Destino Atualizada ---
+    # Na saída delta, as linhas são casadas pela posição (o cruzamento não insere nem remove linhas)
+    if saida_delta and not registrar_delta("cruzar_pos_bi", df_destino_lido, df_destino, pasta=PASTA_DELTAS):
+        print(f"\n✅ Nenhuma linha mudou: a planilha '{PLANILHA_DESTINO_PATH}' não foi regravada.")
+    else:
+        salvar_planilha(df_destino)
+    if memo_execucao:
+        memo_execucao.registrar()
+
+    if cache_matching:
+        print(f"\n{cache_matching.resumo()}")
+        cache_matching.fechar()
+
+    print("\n✨ Processamento finalizado. ✨")
+
 
-print("\n✨ Processamento finalizado. ✨")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
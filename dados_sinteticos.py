@@ -0,0 +1,203 @@
+import os
+import random
+import unicodedata
+
+import pandas as pd
+
+from atualizar_planilha import (ABA_DEVOLUCAO, COL_DEVOLUCAO_CNPJ_CPF, COL_DEVOLUCAO_DESCRICAO,
+                                COL_DEVOLUCAO_POS_PLANILHA, PLANILHA_PRINCIPAL_PATH)
+from contasencerrar import (ARQUIVO_EXCEL as ARQUIVO_CONTAS, COL_CONTA, COL_DETALHAR_MOTIVO, COL_ENCERRAR_SIM_OU_NAO,
+                            COL_EXCLUIR, COL_INFORMAR_MOTIVO_NAO_ENCERRAR, NOME_ABA_PLANILHA1 as ABA_CONTAS_PLANILHA1,
+                            NOME_ABA_PLANILHA2 as ABA_CONTAS_PLANILHA2)
+from controle_semanal import (ABA_ANTERIOR, ABA_FUTURA, ABA_SEMANAL, COL_ANTERIOR_CNPJ, COL_ANTERIOR_NOME,
+                              COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO, COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO,
+                              COL_FUTURA_AGENDA_FUTURA, COL_FUTURA_CNPJ, COL_FUTURA_NOME, COL_SEMANAL_CNPJ,
+                              COL_SEMANAL_NOME, COL_SEMANAL_PAGAMENTOS, PLANILHA_ANTERIOR_PATH as PLANILHA_ANTERIOR,
+                              PLANILHA_FUTURA_PATH as PLANILHA_FUTURA, PLANILHA_SEMANAL_PATH as PLANILHA_SEMANAL)
+from cruzar_pos_bi import (ABA_POS_BI, COL_POS_BI_NOME_EMPRESA, COL_POS_BI_TOTAL_POS_ALOCADAS,
+                           COL_POS_BI_TOTAL_POS_NAO_UTILIZADAS, PLANILHA_POS_BI_PATH)
+from tratar_planilha_csv import NOME_ABA as ABA_INVENTARIO
+
+# --- Gerador de Dados Sintéticos ---
+# Cria, a partir de uma semente, as planilhas de entrada dos cinco scripts com dados realistas:
+# CNPJs/CPFs válidos (com dígitos verificadores), razões sociais com variações (LTDA/ME/EIRELI,
+# acentos, maiúsculas, erros de digitação) e números de série de POS. Os nomes dos arquivos, abas
+# e colunas vêm das configurações de cada script.
+
+SEMENTE_PADRAO = 42
+
+PALAVRAS_NOMES = ['comércio', 'alimentos', 'brasil', 'padaria', 'são', 'josé', 'mercado', 'silva', 'santos',
+                  'tecnologia', 'serviços', 'auto', 'peças', 'moda', 'café', 'açougue', 'farmácia', 'distribuidora',
+                  'materiais', 'construção', 'oliveira', 'souza', 'lanchonete', 'restaurante', 'pet', 'shop']
+SUFIXOS_NOMES = ['LTDA', 'ME', 'EIRELI', 'EPP', 'S/A', 'LTDA - ME', 'LTDA EPP', '']
+
+
+def _digitos_verificadores(base, pesos):
+    digitos = list(base)
+    for pesos_digito in pesos:
+        resto = sum(int(d) * p for d, p in zip(digitos, pesos_digito)) % 11
+        digitos.append('0' if resto < 2 else str(11 - resto))
+    return ''.join(digitos)
+
+
+def gerar_cnpj(rng):
+    base = ''.join(rng.choice('0123456789') for _ in range(8)) + '0001'
+    return _digitos_verificadores(base, [[5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2], [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]])
+
+
+def gerar_cpf(rng):
+    base = ''.join(rng.choice('0123456789') for _ in range(9))
+    return _digitos_verificadores(base, [list(range(10, 1, -1)), list(range(11, 1, -1))])
+
+
+def formatar_documento(documento):
+    if len(documento) == 14:
+        return f"{documento[:2]}.{documento[2:5]}.{documento[5:8]}/{documento[8:12]}-{documento[12:]}"
+    return f"{documento[:3]}.{documento[3:6]}.{documento[6:9]}-{documento[9:]}"
+
+
+def gerar_nome_empresa(rng):
+    palavras = ' '.join(rng.choice(PALAVRAS_NOMES) for _ in range(rng.randint(1, 4)))
+    return f"{palavras} {rng.choice(SUFIXOS_NOMES)}".strip().upper()
+
+
+def ruido_nome(nome, rng):
+    """
+    Variação de digitação de uma razão social: caixa, acentos, sufixo e pequenos erros.
+    """
+    variacao = rng.random()
+    if variacao < 0.2:
+        nome = nome.lower()
+    elif variacao < 0.4:
+        nome = nome.title()
+    if rng.random() < 0.3:
+        nome = unicodedata.normalize('NFKD', nome).encode('ascii', 'ignore').decode('ascii')
+    if rng.random() < 0.2:
+        for sufixo in sorted(SUFIXOS_NOMES, key=len, reverse=True):
+            if sufixo and nome.upper().endswith(sufixo):
+                nome = nome[:-len(sufixo)].strip()
+                break
+    if rng.random() < 0.15 and len(nome) > 3:
+        posicao = rng.randrange(len(nome) - 1)
+        nome = nome[:posicao] + nome[posicao + 1] + nome[posicao] + nome[posicao + 2:]
+    if rng.random() < 0.1:
+        nome = f"  {nome} "
+    return nome
+
+
+def gerar_serial_pos(rng):
+    return f"{rng.choice(['PAX', 'ING', 'GPOS', 'VX'])}{rng.randint(0, 10 ** 10):010d}"
+
+
+def _documento_como_planilha(documento, rng):
+    """
+    Como o documento costuma chegar nas exportações: formatado, só dígitos, número ou vazio.
+    """
+    forma = rng.random()
+    if forma < 0.4:
+        return formatar_documento(documento)
+    if forma < 0.7:
+        return documento
+    if forma < 0.97:
+        return int(documento)
+    return None
+
+
+def gerar_fixtures(diretorio, linhas, semente=SEMENTE_PADRAO):
+    """
+    Grava em 'diretorio' as planilhas de entrada dos cinco scripts. 'linhas' é o tamanho das
+    entradas principais (inventário, semanal e Planilha1); as demais são proporcionais.
+    Retorna {arquivo: número de linhas gravadas}.
+    """
+    rng = random.Random(semente)
+    os.makedirs(diretorio, exist_ok=True)
+    linhas = max(int(linhas), 10)
+
+    num_empresas = max(linhas // 5, 2)
+    documentos = [gerar_cnpj(rng) if rng.random() < 0.8 else gerar_cpf(rng) for _ in range(num_empresas)]
+    nomes = [gerar_nome_empresa(rng) for _ in range(num_empresas)]
+    tamanhos = {}
+
+    def gravar(nome_arquivo, abas):
+        with pd.ExcelWriter(os.path.join(diretorio, nome_arquivo), engine='openpyxl') as writer:
+            for nome_aba, df in abas.items():
+                df.to_excel(writer, sheet_name=nome_aba, index=False)
+        tamanhos[nome_arquivo] = sum(len(df) for df in abas.values())
+
+    # --- principal.xlsx: inventário (tratar_planilha_csv.py) e devolução (atualizar_planilha.py) ---
+    empresas_inventario = [rng.randrange(num_empresas) for _ in range(linhas)]
+    df_inventario = pd.DataFrame({
+        'ID': range(1, linhas + 1),
+        'RAZÃO EMPRESARIAL': [nomes[i] for i in empresas_inventario],
+        'CNPJ': [_documento_como_planilha(documentos[i], rng) for i in empresas_inventario],
+        'NÚMERO DE SÉRIE DA POS': [gerar_serial_pos(rng) for _ in range(linhas)],
+        'STATUS': [rng.choice(['ATIVA', 'INATIVA', 'EM TRÂNSITO']) for _ in range(linhas)],
+    })
+
+    num_devolucao = max(linhas // 4, 1)
+    descricoes, documentos_devolucao = [], []
+    for _ in range(num_devolucao):
+        i = rng.randrange(num_empresas)
+        documento = documentos[i]
+        if rng.random() < 0.2:  # Erro de digitação em um dígito
+            posicao = rng.randrange(len(documento))
+            documento = documento[:posicao] + rng.choice('0123456789') + documento[posicao + 1:]
+        descricoes.append(ruido_nome(nomes[i], rng))
+        documentos_devolucao.append(_documento_como_planilha(documento, rng))
+    df_devolucao = pd.DataFrame({
+        COL_DEVOLUCAO_DESCRICAO: descricoes,
+        COL_DEVOLUCAO_CNPJ_CPF: documentos_devolucao,
+        COL_DEVOLUCAO_POS_PLANILHA: [None] * num_devolucao,
+    })
+    gravar(PLANILHA_PRINCIPAL_PATH, {ABA_INVENTARIO: df_inventario, ABA_DEVOLUCAO: df_devolucao})
+
+    # --- pos_bi.xlsx (cruzar_pos_bi.py) ---
+    empresas_bi = rng.sample(range(num_empresas), max(num_empresas // 2, 1))
+    gravar(PLANILHA_POS_BI_PATH, {ABA_POS_BI: pd.DataFrame({
+        COL_POS_BI_NOME_EMPRESA: [ruido_nome(nomes[i], rng) for i in empresas_bi],
+        COL_POS_BI_TOTAL_POS_ALOCADAS: [rng.randint(0, 20) for _ in empresas_bi],
+        COL_POS_BI_TOTAL_POS_NAO_UTILIZADAS: [rng.randint(0, 5) for _ in empresas_bi],
+    })})
+
+    # --- PAMELA MESCLAR.xlsx (contasencerrar.py) ---
+    contas = [f"{rng.randint(10 ** 7, 10 ** 8 - 1)}-{rng.randint(0, 9)}" for _ in range(linhas)]
+    contas_planilha2 = [rng.choice(contas) if rng.random() < 0.9 else f"{rng.randint(0, 10 ** 6)}-X"
+                        for _ in range(max(linhas // 2, 1))]
+    gravar(ARQUIVO_CONTAS, {
+        ABA_CONTAS_PLANILHA1: pd.DataFrame({
+            # Cabeçalho com espaço no final, como nas planilhas reais (o script limpa os nomes das colunas)
+            f"{COL_CONTA} ": [f" {conta}" if rng.random() < 0.1 else conta for conta in contas],
+            COL_EXCLUIR: [rng.choice(['Encerrar', 'Manter', 'encerrar conta', 'manter ativa', None]) for _ in contas],
+            COL_DETALHAR_MOTIVO: [rng.choice(['Saldo em conta', 'Conta ativa', 'Pendência', None]) for _ in contas],
+        }),
+        ABA_CONTAS_PLANILHA2: pd.DataFrame({
+            COL_CONTA: contas_planilha2,
+            COL_ENCERRAR_SIM_OU_NAO: [rng.choice([None, None, 'Sim', 'Não']) for _ in contas_planilha2],
+            COL_INFORMAR_MOTIVO_NAO_ENCERRAR: [rng.choice([None, None, 'Já informado']) for _ in contas_planilha2],
+        }),
+    })
+
+    # --- anterior.xlsx, semana e adicional (controle_semanal.py) ---
+    lojas_anteriores = rng.sample(range(num_empresas), max(num_empresas // 2, 1))
+    gravar(PLANILHA_ANTERIOR, {ABA_ANTERIOR: pd.DataFrame({
+        COL_ANTERIOR_CNPJ: [documentos[i] for i in lojas_anteriores],
+        COL_ANTERIOR_NOME: [nomes[i] for i in lojas_anteriores],
+        COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO: [round(rng.uniform(0, 50_000), 2) for _ in lojas_anteriores],
+        COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO: [round(rng.uniform(0, 10_000), 2) for _ in lojas_anteriores],
+    })})
+
+    lojas_semana = [rng.randrange(num_empresas) for _ in range(linhas)]
+    gravar(PLANILHA_SEMANAL, {ABA_SEMANAL: pd.DataFrame({
+        COL_SEMANAL_CNPJ: [_documento_como_planilha(documentos[i], rng) for i in lojas_semana],
+        COL_SEMANAL_NOME: [nomes[i] for i in lojas_semana],
+        COL_SEMANAL_PAGAMENTOS: [round(rng.uniform(0, 2_000), 2) for _ in lojas_semana],
+    })})
+
+    lojas_futura = [rng.randrange(num_empresas) for _ in range(max(linhas // 5, 1))]
+    gravar(PLANILHA_FUTURA, {ABA_FUTURA: pd.DataFrame({
+        COL_FUTURA_CNPJ: [documentos[i] for i in lojas_futura],
+        COL_FUTURA_NOME: [nomes[i] for i in lojas_futura],
+        COL_FUTURA_AGENDA_FUTURA: [round(rng.uniform(0, 5_000), 2) for _ in lojas_futura],
+    })})
+
+    return tamanhos
@@ -0,0 +1,161 @@
+import numbers
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# --- Configurações Padrão da Saída Delta ---
+PASTA_DELTAS_PADRAO = "deltas"
+ABA_DELTA = "Alterações"
+
+INSERIDA = "inserida"
+ALTERADA = "alterada"
+REMOVIDA = "removida"
+
+# Números que diferem menos que isto são iguais: somas refeitas em outra ordem mudam o último
+# dígito do float (ex.: 59.91 e 59.910000000000004) e não são uma alteração de valor
+TOLERANCIA_NUMERICA = 1e-9
+
+# Acima disso o delta não cabe em uma aba do Excel e é gravado em Parquet (valores como texto)
+LIMITE_LINHAS_EXCEL = 1_048_575
+
+# Uma linha por célula: 'Linha antes'/'Linha depois' são os números das linhas no Excel (cabeçalho = 1)
+COLUNAS_DELTA = ["Operação", "Linha antes", "Linha depois", "Coluna", "Antes", "Depois"]
+
+
+def _chaves(df, colunas_chave):
+    """
+    Chave de cada linha: os valores de 'colunas_chave' (como texto) mais a ocorrência daquela
+    chave (0, 1, ...), para que chaves repetidas também sejam casadas uma a uma. Sem
+    'colunas_chave', a chave é a posição da linha.
+    """
+    if not colunas_chave:
+        return pd.Index(np.arange(len(df)))
+    partes = df[colunas_chave].astype(str)
+    ocorrencia = partes.groupby(colunas_chave, sort=False).cumcount().to_numpy()
+    return pd.MultiIndex.from_frame(partes.assign(_ocorrencia=ocorrencia))
+
+
+def _mesmo_valor(antes, depois):
+    """
+    Compara dois valores não vazios de qualquer tipo (texto, número, data), com TOLERANCIA_NUMERICA
+    entre números.
+    """
+    if isinstance(antes, numbers.Real) and isinstance(depois, numbers.Real) \
+            and not isinstance(antes, (bool, np.bool_)) and not isinstance(depois, (bool, np.bool_)):
+        return abs(float(antes) - float(depois)) <= TOLERANCIA_NUMERICA
+    try:
+        return bool(antes == depois)
+    except (TypeError, ValueError):
+        return False
+
+
+def _celulas(operacao, df, posicoes, linhas_antes, linhas_depois, lado):
+    """
+    Células não vazias das linhas 'posicoes' de df (linhas inseridas ou removidas).
+    """
+    partes = []
+    for coluna in df.columns:
+        valores = df[coluna].to_numpy()[posicoes]
+        preenchidas = ~pd.isna(valores)
+        if preenchidas.any():
+            partes.append(pd.DataFrame({
+                "Operação": operacao,
+                "Linha antes": linhas_antes[preenchidas] if linhas_antes is not None else None,
+                "Linha depois": linhas_depois[preenchidas] if linhas_depois is not None else None,
+                "Coluna": coluna,
+                lado: valores[preenchidas],
+            }))
+    return partes
+
+
+def calcular_delta(antes, depois, colunas_chave=None):
+    """
+    Compara duas versões de uma aba e retorna (alteracoes, contagem).
+
+    As linhas são casadas por 'colunas_chave' (ou pela posição) e comparadas primeiro pela
+    impressão digital (hash de todas as colunas); só as linhas com impressão diferente são
+    comparadas célula a célula. 'alteracoes' tem uma linha por célula (COLUNAS_DELTA): as
+    alteradas com o valor antes e depois, e as não vazias das linhas inseridas e removidas.
+    'contagem' é o número de linhas inseridas, alteradas e removidas.
+    """
+    colunas = list(depois.columns) + [coluna for coluna in antes.columns if coluna not in depois.columns]
+    antes = antes.reset_index(drop=True).reindex(columns=colunas)
+    depois = depois.reset_index(drop=True).reindex(columns=colunas)
+
+    posicao_antes = _chaves(antes, colunas_chave).get_indexer(_chaves(depois, colunas_chave))
+    casadas = np.flatnonzero(posicao_antes >= 0)
+    inseridas = np.flatnonzero(posicao_antes < 0)
+    removidas = np.setdiff1d(np.arange(len(antes)), posicao_antes[casadas])
+
+    impressao_antes = pd.util.hash_pandas_object(antes, index=False).to_numpy()
+    impressao_depois = pd.util.hash_pandas_object(depois, index=False).to_numpy()
+    suspeitas = casadas[impressao_depois[casadas] != impressao_antes[posicao_antes[casadas]]]
+
+    partes = []
+    linhas_alteradas = set()
+    for coluna in colunas:
+        valor_antes = antes[coluna].to_numpy()[posicao_antes[suspeitas]]
+        valor_depois = depois[coluna].to_numpy()[suspeitas]
+        vazio_antes, vazio_depois = pd.isna(valor_antes), pd.isna(valor_depois)
+        # A impressão também muda com o tipo (ex.: 1 e 1.0); só conta como alterada a célula de valor diferente
+        if valor_antes.dtype.kind in 'iuf' and valor_depois.dtype.kind in 'iuf':
+            with np.errstate(invalid='ignore'):
+                mesmo_valor = np.abs(valor_antes.astype(float) - valor_depois.astype(float)) <= TOLERANCIA_NUMERICA
+        else:
+            mesmo_valor = np.array([_mesmo_valor(a, d) for a, d in zip(valor_antes, valor_depois)], dtype=bool)
+        diferentes = ~((vazio_antes & vazio_depois) | (~vazio_antes & ~vazio_depois & mesmo_valor))
+        if diferentes.any():
+            linhas_alteradas.update(suspeitas[diferentes].tolist())
+            partes.append(pd.DataFrame({
+                "Operação": ALTERADA,
+                "Linha antes": posicao_antes[suspeitas][diferentes] + 2,
+                "Linha depois": suspeitas[diferentes] + 2,
+                "Coluna": coluna,
+                "Antes": valor_antes[diferentes],
+                "Depois": valor_depois[diferentes],
+            }))
+
+    partes += _celulas(INSERIDA, depois, inseridas, None, inseridas + 2, "Depois")
+    partes += _celulas(REMOVIDA, antes, removidas, removidas + 2, None, "Antes")
+
+    if partes:
+        alteracoes = pd.concat(partes, ignore_index=True).reindex(columns=COLUNAS_DELTA)
+        # Em ordem de linha da planilha nova (as removidas no fim) e, dentro da linha, na ordem das colunas
+        ordem_coluna = alteracoes["Coluna"].map({coluna: posicao for posicao, coluna in enumerate(colunas)})
+        alteracoes = alteracoes.assign(_ordem=ordem_coluna).sort_values(
+            ["Linha depois", "Linha antes", "_ordem"], kind='stable', na_position='last'
+        ).drop(columns="_ordem").reset_index(drop=True)
+    else:
+        alteracoes = pd.DataFrame(columns=COLUNAS_DELTA)
+
+    contagem = {INSERIDA: len(inseridas), ALTERADA: len(linhas_alteradas), REMOVIDA: len(removidas)}
+    return alteracoes, contagem
+
+
+def registrar_delta(nome, antes, depois, colunas_chave=None, pasta=PASTA_DELTAS_PADRAO):
+    """
+    Calcula o delta entre 'antes' e 'depois', mostra o resumo e grava as alterações em
+    pasta/<nome>_delta_<data>_<hora>.xlsx (ou .parquet, acima de LIMITE_LINHAS_EXCEL).
+    Retorna True se houve alguma alteração, ou seja, se a planilha completa precisa ser regravada.
+    """
+    alteracoes, contagem = calcular_delta(antes, depois, colunas_chave)
+    total = sum(contagem.values())
+    print(f"📦 Delta: {contagem[INSERIDA]} linhas inseridas, {contagem[ALTERADA]} alteradas e "
+          f"{contagem[REMOVIDA]} removidas, de {len(depois)} linhas ({len(alteracoes)} células).")
+    if total == 0:
+        return False
+
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"{nome}_delta_{datetime.now():%Y%m%d_%H%M%S}")
+    if len(alteracoes) <= LIMITE_LINHAS_EXCEL:
+        caminho += ".xlsx"
+        alteracoes.to_excel(caminho, sheet_name=ABA_DELTA, index=False)
+    else:
+        caminho += ".parquet"
+        for coluna in ["Antes", "Depois"]:  # O Parquet não aceita colunas com tipos misturados
+            alteracoes[coluna] = alteracoes[coluna].where(alteracoes[coluna].isna(), alteracoes[coluna].astype(str))
+        alteracoes.to_parquet(caminho, index=False)
+    print(f"✅ Alterações gravadas em '{caminho}'.")
+    return True
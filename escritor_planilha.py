@@ -0,0 +1,290 @@
+import datetime
+import numbers
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
+from openpyxl.utils.exceptions import IllegalCharacterError
+
+# --- Configurações do Escritor de Planilhas ---
+# Com a escrita rápida desativada, substituir_aba usa o pd.ExcelWriter(mode='a') de sempre.
+ESCRITA_RAPIDA_ATIVA = True
+
+# Mesmos formatos de data do pd.ExcelWriter
+FORMATO_DATA = "YYYY-MM-DD"
+FORMATO_DATA_HORA = "YYYY-MM-DD HH:MM:SS"
+
+_NS_PLANILHA = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_RELACOES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_PACOTE = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# Estilo do cabeçalho do pandas: negrito, borda fina e centralizado
+_FONTE_CABECALHO = '<font><b val="1"/></font>'
+_BORDA_CABECALHO = '<border><left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/></border>'
+
+
+class EstruturaNaoSuportada(Exception):
+    """
+    A planilha (ou o DataFrame) tem algo que a escrita rápida não trata; usa-se o pd.ExcelWriter.
+    """
+
+
+def _normalizar_xml(trecho):
+    return re.sub(r'\s+/>', '/>', trecho.strip())
+
+
+def _filhos(conteudo, tag):
+    return re.findall(rf'<{tag}\b[^>]*/>|<{tag}\b[^>]*>.*?</{tag}>', conteudo, flags=re.DOTALL)
+
+
+def _localizar_container(estilos, container):
+    """
+    Localiza <container ...>...</container> (ou <container .../>, vazio) no styles.xml.
+    Retorna (início, fim, atributos, conteúdo) ou None.
+    """
+    bloco = re.search(rf'<{container}\b([^>]*?)\s*/>|<{container}\b([^>]*)>(.*?)</{container}>', estilos,
+                      flags=re.DOTALL)
+    if bloco is None:
+        return None
+    if bloco.group(3) is None:
+        return bloco.start(), bloco.end(), bloco.group(1), ''
+    return bloco.start(), bloco.end(), bloco.group(2), bloco.group(3)
+
+
+def _garantir_elemento(estilos, container, tag, elemento):
+    """
+    Garante que 'elemento' exista dentro de <container> no styles.xml (compara o texto do XML).
+    Retorna (estilos, posição do elemento), acrescentando-o ao final e atualizando o 'count' se preciso.
+    """
+    bloco = _localizar_container(estilos, container)
+    if bloco is None:
+        raise EstruturaNaoSuportada(f"'<{container}>' não encontrado no styles.xml")
+    inicio, fim, atributos, conteudo = bloco
+
+    filhos = [_normalizar_xml(filho) for filho in _filhos(conteudo, tag)]
+    if _normalizar_xml(elemento) in filhos:
+        return estilos, filhos.index(_normalizar_xml(elemento))
+
+    if re.search(r'\bcount="\d+"', atributos):
+        atributos = re.sub(r'\bcount="\d+"', f'count="{len(filhos) + 1}"', atributos)
+    else:
+        atributos += f' count="{len(filhos) + 1}"'
+    novo_bloco = f'<{container}{atributos}>{conteudo}{elemento}</{container}>'
+    return estilos[:inicio] + novo_bloco + estilos[fim:], len(filhos)
+
+
+def _garantir_formato_numero(estilos, codigo):
+    """
+    Garante um <numFmt> com o código de formato informado (sem caracteres especiais de XML)
+    e retorna (estilos, numFmtId).
+    """
+    bloco = _localizar_container(estilos, 'numFmts')
+    formatos = _filhos(bloco[3], 'numFmt') if bloco else []
+    ids_usados = [163]  # Os formatos personalizados começam em 164
+    for formato in formatos:
+        id_formato = int(re.search(r'numFmtId="(\d+)"', formato).group(1))
+        if re.search(r'formatCode="([^"]*)"', formato).group(1) == codigo:
+            return estilos, id_formato
+        ids_usados.append(id_formato)
+
+    novo_id = max(ids_usados) + 1
+    elemento = f'<numFmt numFmtId="{novo_id}" formatCode="{codigo}"/>'
+    if bloco:
+        inicio, fim, _, conteudo = bloco
+        novo_bloco = f'<numFmts count="{len(formatos) + 1}">{conteudo}{elemento}</numFmts>'
+        return estilos[:inicio] + novo_bloco + estilos[fim:], novo_id
+
+    # O <numFmts> deve ser o primeiro filho do <styleSheet>
+    abertura = re.search(r'<styleSheet\b[^>]*>', estilos)
+    if abertura is None:
+        raise EstruturaNaoSuportada("'<styleSheet>' não encontrado no styles.xml")
+    return (estilos[:abertura.end()] + f'<numFmts count="1">{elemento}</numFmts>' + estilos[abertura.end():],
+            novo_id)
+
+
+def _preparar_estilos(estilos):
+    """
+    Acrescenta ao styles.xml os estilos usados pela aba nova (cabeçalho, data e data/hora), reaproveitando
+    os que já existirem de gravações anteriores. Retorna (estilos, {nome: índice no cellXfs}).
+    """
+    estilos, id_fonte = _garantir_elemento(estilos, 'fonts', 'font', _FONTE_CABECALHO)
+    estilos, id_borda = _garantir_elemento(estilos, 'borders', 'border', _BORDA_CABECALHO)
+    estilos, id_data = _garantir_formato_numero(estilos, FORMATO_DATA)
+    estilos, id_data_hora = _garantir_formato_numero(estilos, FORMATO_DATA_HORA)
+
+    indices = {}
+    for nome, xf in [
+        ('cabecalho', f'<xf numFmtId="0" fontId="{id_fonte}" fillId="0" borderId="{id_borda}" xfId="0" '
+                      f'applyFont="1" applyBorder="1" applyAlignment="1"><alignment horizontal="center" '
+                      f'vertical="top"/></xf>'),
+        ('data', f'<xf numFmtId="{id_data}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'),
+        ('data_hora', f'<xf numFmtId="{id_data_hora}" fontId="0" fillId="0" borderId="0" xfId="0" '
+                      f'applyNumberFormat="1"/>'),
+    ]:
+        estilos, indices[nome] = _garantir_elemento(estilos, 'cellXfs', 'xf', xf)
+    return estilos, indices
+
+
+def _texto_celula(referencia, texto, estilo=''):
+    if ILLEGAL_CHARACTERS_RE.search(texto):
+        raise IllegalCharacterError(f"{texto} cannot be used in worksheets.")
+    if len(texto) > 1 and texto.startswith('='):  # Como no openpyxl, texto iniciado por '=' é fórmula
+        return f'<c r="{referencia}"{estilo}><f>{escape(texto[1:])}</f></c>'
+    espaco = ' xml:space="preserve"' if texto != texto.strip() else ''
+    return f'<c r="{referencia}"{estilo} t="inlineStr"><is><t{espaco}>{escape(texto)}</t></is></c>'
+
+
+def _xml_celula(referencia, valor, estilos, estilo=''):
+    """
+    XML de uma célula, com as mesmas conversões do pd.DataFrame.to_excel. Células vazias retornam ''.
+    """
+    if valor is None or valor is pd.NaT or valor is pd.NA:
+        return ''
+    if isinstance(valor, str):
+        return _texto_celula(referencia, valor, estilo)
+    if isinstance(valor, (bool, np.bool_)):
+        return f'<c r="{referencia}"{estilo} t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, numbers.Integral):  # Números com 16 dígitos significativos, como o openpyxl
+        return f'<c r="{referencia}"{estilo}><v>{int(valor):.16g}</v></c>'
+    if isinstance(valor, numbers.Real):
+        valor = float(valor)
+        if np.isnan(valor):
+            return ''
+        if np.isinf(valor):  # inf_rep padrão do to_excel
+            return _texto_celula(referencia, 'inf' if valor > 0 else '-inf', estilo)
+        return f'<c r="{referencia}"{estilo}><v>{valor:.16g}</v></c>'
+    if isinstance(valor, datetime.datetime):
+        if valor.tzinfo is not None:
+            raise ValueError("Excel does not support datetimes with timezones. "
+                             "Please ensure that datetimes are timezone unaware before writing to Excel.")
+        return f'<c r="{referencia}" s="{estilos["data_hora"]}"><v>{to_excel(valor):.16g}</v></c>'
+    if isinstance(valor, datetime.date):
+        return f'<c r="{referencia}" s="{estilos["data"]}"><v>{to_excel(valor):.16g}</v></c>'
+    raise EstruturaNaoSuportada(f"tipo de valor não suportado na escrita rápida: {type(valor).__name__}")
+
+
+def _escrever_aba(arquivo, df, estilos):
+    """
+    Grava o XML da aba linha a linha (streaming), com strings inline.
+    """
+    letras = [get_column_letter(posicao) for posicao in range(1, df.shape[1] + 1)]
+    ultima_celula = f"{letras[-1]}{len(df) + 1}"
+    arquivo.write(
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<worksheet xmlns="{_NS_PLANILHA}" xmlns:r="{_NS_RELACOES}">'
+        f'<dimension ref="A1:{ultima_celula}"/><sheetData>'.encode('utf-8')
+    )
+
+    estilo_cabecalho = f' s="{estilos["cabecalho"]}"'
+    cabecalho = ''.join(_xml_celula(f"{letra}1", nome, estilos, estilo_cabecalho)
+                        for letra, nome in zip(letras, df.columns))
+    arquivo.write(f'<row r="1">{cabecalho}</row>'.encode('utf-8'))
+
+    for numero_linha, linha in enumerate(df.itertuples(index=False, name=None), start=2):
+        celulas = ''.join(_xml_celula(f"{letra}{numero_linha}", valor, estilos)
+                          for letra, valor in zip(letras, linha))
+        arquivo.write(f'<row r="{numero_linha}">{celulas}</row>'.encode('utf-8'))
+
+    arquivo.write(b'</sheetData></worksheet>')
+
+
+def _localizar_aba(zip_origem, nome_aba):
+    """
+    Retorna o caminho, dentro do .xlsx, do XML da aba 'nome_aba'.
+    """
+    workbook = ET.fromstring(zip_origem.read('xl/workbook.xml'))
+    id_relacao = None
+    for aba in workbook.iter(f'{{{_NS_PLANILHA}}}sheet'):
+        if aba.get('name') == nome_aba:
+            id_relacao = aba.get(f'{{{_NS_RELACOES}}}id')
+    if id_relacao is None:
+        raise EstruturaNaoSuportada(f"aba '{nome_aba}' não encontrada")
+
+    relacoes = ET.fromstring(zip_origem.read('xl/_rels/workbook.xml.rels'))
+    for relacao in relacoes.iter(f'{{{_NS_PACOTE}}}Relationship'):
+        if relacao.get('Id') == id_relacao:
+            alvo = relacao.get('Target')
+            return alvo.lstrip('/') if alvo.startswith('/') else posixpath.normpath(posixpath.join('xl', alvo))
+    raise EstruturaNaoSuportada(f"relação '{id_relacao}' da aba '{nome_aba}' não encontrada")
+
+
+def _substituir_aba_rapido(caminho, nome_aba, df):
+    """
+    Monta um novo .xlsx copiando as partes do original no nível do zip, sem abrir as outras abas,
+    e trocando apenas o XML da aba, o styles.xml e as referências ao calcChain.xml.
+    """
+    if isinstance(df.columns, pd.MultiIndex) or df.shape[1] == 0:
+        raise EstruturaNaoSuportada("cabeçalho vazio ou com múltiplos níveis")
+
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    descritor, caminho_temporario = tempfile.mkstemp(dir=diretorio, suffix='.xlsx.tmp')
+    os.close(descritor)
+    try:
+        with zipfile.ZipFile(caminho) as zip_origem:
+            parte_aba = _localizar_aba(zip_origem, nome_aba)
+            relacoes_aba = posixpath.join(posixpath.dirname(parte_aba), '_rels',
+                                          posixpath.basename(parte_aba) + '.rels')
+            # Desenhos, comentários e tabelas da aba ficariam órfãos no pacote; nesses casos usa-se o ExcelWriter
+            if relacoes_aba in zip_origem.namelist():
+                raise EstruturaNaoSuportada(f"aba '{nome_aba}' tem relações (desenhos, comentários ou tabelas)")
+            estilos, indices_estilo = _preparar_estilos(zip_origem.read('xl/styles.xml').decode('utf-8'))
+
+            with zipfile.ZipFile(caminho_temporario, 'w', compression=zipfile.ZIP_DEFLATED) as zip_destino:
+                for item in zip_origem.infolist():
+                    nome = item.filename
+                    # A cadeia de cálculo deixa de valer com a aba nova
+                    if nome == 'xl/calcChain.xml':
+                        continue
+                    if nome == parte_aba:
+                        with zip_destino.open(nome, 'w', force_zip64=True) as arquivo:
+                            _escrever_aba(arquivo, df, indices_estilo)
+                    elif nome == 'xl/styles.xml':
+                        zip_destino.writestr(item, estilos.encode('utf-8'))
+                    elif nome == '[Content_Types].xml':
+                        conteudo = zip_origem.read(nome).decode('utf-8')
+                        conteudo = re.sub(r'<Override\b[^>]*PartName="/xl/calcChain\.xml"[^>]*/>', '', conteudo)
+                        zip_destino.writestr(item, conteudo.encode('utf-8'))
+                    elif nome == 'xl/_rels/workbook.xml.rels':
+                        conteudo = zip_origem.read(nome).decode('utf-8')
+                        conteudo = re.sub(r'<Relationship\b[^>]*Target="/?(xl/)?calcChain\.xml"[^>]*/>', '',
+                                          conteudo)
+                        zip_destino.writestr(item, conteudo.encode('utf-8'))
+                    else:
+                        zip_destino.writestr(item, zip_origem.read(nome))
+
+        # O mkstemp cria o arquivo com permissão 0600; a planilha mantém as permissões que tinha
+        shutil.copymode(caminho, caminho_temporario)
+        # Troca atômica: quem abrir o arquivo vê a versão antiga ou a nova, nunca uma pela metade
+        os.replace(caminho_temporario, caminho)
+    finally:
+        # Se algo falhou (inclusive o replace, com a planilha aberta no Excel), não deixa o .tmp para trás
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+
+
+def substituir_aba(caminho, nome_aba, df):
+    """
+    Substitui a aba 'nome_aba' do arquivo 'caminho' pelo DataFrame (sem índice), mantendo as demais abas.
+    Equivale ao pd.ExcelWriter(caminho, engine='openpyxl', mode='a', if_sheet_exists='replace'), mas copia as
+    outras abas sem carregá-las e grava a aba nova em streaming, então o tempo depende só da aba substituída.
+    Se a aba não existir (ou a planilha tiver algo não suportado), usa o pd.ExcelWriter.
+    """
+    if ESCRITA_RAPIDA_ATIVA:
+        try:
+            _substituir_aba_rapido(caminho, nome_aba, df)
+            return
+        except EstruturaNaoSuportada:
+            pass
+
+    with pd.ExcelWriter(caminho, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+        df.to_excel(writer, sheet_name=nome_aba, index=False)
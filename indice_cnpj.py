@@ -0,0 +1,199 @@
+from fuzzywuzzy import fuzz
+
+from chave_documento import TAMANHO_RAIZ_CNPJ, TIPO_CNPJ
+
+# O python-Levenshtein é opcional (o próprio fuzzywuzzy recomenda instalá-lo).
+# Sem ele, usamos a implementação em Python puro mais abaixo.
+try:
+    from Levenshtein import distance as _distancia_c
+except ImportError:
+    _distancia_c = None
+
+
+# --- Distância de Edição ---
+def distancia_levenshtein(a, b):
+    """
+    Calcula a distância de Levenshtein (inserção, remoção e substituição com custo 1)
+    entre duas strings. Usa o python-Levenshtein quando disponível.
+    """
+    if _distancia_c is not None:
+        return _distancia_c(a, b)
+
+    if len(a) < len(b):
+        a, b = b, a
+    linha_anterior = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        linha_atual = [i]
+        for j, char_b in enumerate(b, start=1):
+            linha_atual.append(min(
+                linha_anterior[j] + 1,
+                linha_atual[j - 1] + 1,
+                linha_anterior[j - 1] + (char_a != char_b)
+            ))
+        linha_anterior = linha_atual
+    return linha_anterior[-1]
+
+
+def raio_maximo(tamanho_consulta, limiar):
+    """
+    Retorna a maior distância de Levenshtein que um candidato pode ter em relação a uma
+    consulta de 'tamanho_consulta' caracteres e ainda atingir 'limiar' no fuzz.ratio.
+
+    O fuzz.ratio vale round(100 * r), com r = 2 * M / (len(a) + len(b)) e M <= LCS(a, b).
+    Logo a distância de inserção/remoção (que limita a de Levenshtein) é no máximo
+    (1 - r) * (len(a) + len(b)). Retorna None quando o limiar não permite poda.
+    """
+    folga = 1 - (limiar - 0.5) / 100
+    if folga >= 1:
+        return None
+    if folga <= 0:
+        return 0
+    return int(2 * folga * tamanho_consulta / (1 - folga) + 1e-9)
+
+
+# --- Árvore BK ---
+class ArvoreBK:
+    """
+    Árvore BK sobre a distância de Levenshtein. Cada nó guarda a palavra, a posição dela
+    na lista de referência original e os filhos indexados pela distância ao nó.
+    """
+
+    def __init__(self, palavras):
+        self.raiz = None
+        for posicao, palavra in enumerate(palavras):
+            self.inserir(palavra, posicao)
+
+    def inserir(self, palavra, posicao):
+        if self.raiz is None:
+            self.raiz = (palavra, posicao, {})
+            return
+        no = self.raiz
+        while True:
+            distancia = distancia_levenshtein(palavra, no[0])
+            if distancia == 0:
+                return  # Palavra repetida: mantém a primeira posição
+            filho = no[2].get(distancia)
+            if filho is None:
+                no[2][distancia] = (palavra, posicao, {})
+                return
+            no = filho
+
+    def buscar(self, consulta, raio):
+        """
+        Retorna a lista de (palavra, posicao) a no máximo 'raio' de distância da consulta.
+        """
+        if self.raiz is None:
+            return []
+        encontrados = []
+        pilha = [self.raiz]
+        while pilha:
+            palavra, posicao, filhos = pilha.pop()
+            distancia = distancia_levenshtein(consulta, palavra)
+            if distancia <= raio:
+                encontrados.append((palavra, posicao))
+            for distancia_filho, filho in filhos.items():
+                if distancia - raio <= distancia_filho <= distancia + raio:
+                    pilha.append(filho)
+        return encontrados
+
+
+# --- Índice de CNPJs ---
+class IndiceCnpj:
+    """
+    Substitui o process.extractOne(scorer=fuzz.ratio) sobre a lista de CNPJs de referência.
+
+    1. Match exato por dicionário (hash);
+    2. Com 'priorizar_raiz', os estabelecimentos da mesma raiz (mesma empresa) são pontuados
+       primeiro, e o melhor deles é usado se atingir o limiar;
+    3. Para o restante, a árvore BK devolve apenas os CNPJs dentro do raio que o limiar
+       permite, e somente esses são pontuados com fuzz.ratio.
+
+    Sem 'priorizar_raiz', o resultado é o mesmo do extractOne sempre que o score atinge o
+    limiar: em caso de empate, vence o CNPJ que aparece primeiro na lista de referência.
+    """
+
+    def __init__(self, lista_cnpjs_ref, limiar, priorizar_raiz=False):
+        self.lista_cnpjs_ref = list(lista_cnpjs_ref)
+        self.limiar = limiar
+        self.priorizar_raiz = priorizar_raiz
+        self.posicoes = {}
+        self.por_raiz = {}  # raiz (8 dígitos) -> {estabelecimento + dígitos verificadores (6 dígitos): posicao}
+        for posicao, cnpj in enumerate(self.lista_cnpjs_ref):
+            self.posicoes.setdefault(cnpj, posicao)
+            if len(cnpj) == TIPO_CNPJ:
+                self.por_raiz.setdefault(cnpj[:TAMANHO_RAIZ_CNPJ], {}).setdefault(cnpj[TAMANHO_RAIZ_CNPJ:], posicao)
+        self.arvore = ArvoreBK(self.lista_cnpjs_ref)
+
+    def candidatos(self, cnpj_consulta):
+        """
+        Retorna os (cnpj, posicao) que podem atingir o limiar para a consulta.
+        """
+        raio = raio_maximo(len(cnpj_consulta), self.limiar)
+        if raio is None:
+            return [(cnpj, posicao) for posicao, cnpj in enumerate(self.lista_cnpjs_ref)]
+        return self.arvore.buscar(cnpj_consulta, raio)
+
+    def candidatos_raiz(self, cnpj_consulta):
+        """
+        Retorna os (cnpj, posicao) de referência com a mesma raiz da consulta (vazio se a
+        consulta não for um CNPJ de 14 dígitos ou se a raiz não estiver na referência).
+        """
+        if len(cnpj_consulta) != TIPO_CNPJ:
+            return []
+        raiz = cnpj_consulta[:TAMANHO_RAIZ_CNPJ]
+        return [(raiz + sufixo, posicao) for sufixo, posicao in self.por_raiz.get(raiz, {}).items()]
+
+    def melhor_match(self, cnpj_consulta):
+        """
+        Retorna (cnpj_ref, score) do melhor match com score >= limiar, ou None.
+        """
+        if not self.lista_cnpjs_ref:
+            return None
+
+        # Match exato: score 100, que só pode empatar com outro CNPJ em strings enormes
+        if cnpj_consulta in self.posicoes and raio_maximo(len(cnpj_consulta), 100) == 0:
+            return cnpj_consulta, 100
+
+        if self.priorizar_raiz:
+            melhor = self._melhor_entre(cnpj_consulta, self.candidatos_raiz(cnpj_consulta))
+            if melhor is not None:
+                return melhor
+        return self._melhor_entre(cnpj_consulta, self.candidatos(cnpj_consulta))
+
+    def _melhor_entre(self, cnpj_consulta, candidatos):
+        melhor = None
+        for cnpj_ref, posicao in candidatos:
+            score = fuzz.ratio(cnpj_consulta, cnpj_ref)
+            if score < self.limiar:
+                continue
+            if melhor is None or score > melhor[1] or (score == melhor[1] and posicao < melhor[2]):
+                melhor = (cnpj_ref, score, posicao)
+
+        if melhor is None:
+            return None
+        return melhor[0], melhor[1]
+
+    def dois_melhores(self, cnpj_consulta):
+        """
+        Retorna a lista com até dois (cnpj_ref, score) com score >= limiar, do maior score
+        para o menor (nos empates, vale a ordem da referência, como em melhor_match).
+        """
+        pontuados = sorted((-fuzz.ratio(cnpj_consulta, cnpj_ref), posicao, cnpj_ref)
+                           for cnpj_ref, posicao in self.candidatos(cnpj_consulta))
+        return [(cnpj_ref, -score_negativo) for score_negativo, _, cnpj_ref in pontuados[:2]
+                if -score_negativo >= self.limiar]
+
+
+# --- Funções para o matching_paralelo ---
+def casar_bloco_cnpjs(indice, cnpjs_consulta):
+    """
+    Retorna a lista de melhor_match (ou None) para cada CNPJ do bloco.
+    """
+    return [indice.melhor_match(cnpj) for cnpj in cnpjs_consulta]
+
+
+def casar_bloco_cnpjs_dois_melhores(indice, cnpjs_consulta):
+    """
+    Retorna a lista de dois_melhores para cada CNPJ do bloco (modo de varredura de limiares).
+    """
+    return [indice.dois_melhores(cnpj) for cnpj in cnpjs_consulta]
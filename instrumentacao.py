@@ -0,0 +1,197 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource  # Só existe em sistemas Unix
+except ImportError:
+    resource = None
+
+# --- Configurações Padrão da Instrumentação ---
+PASTA_METRICAS_PADRAO = "metricas"
+# O tracemalloc mede o pico de memória de cada etapa, mas deixa o código com muitas alocações
+# pequenas (ex.: a leitura do openpyxl) de 5 a 10 vezes mais lento; por isso fica desligado por
+# padrão. Sem ele, só o pico de memória do processo (RSS, em sistemas Unix) é registrado.
+MEDIR_MEMORIA_PADRAO = False
+
+
+class MedicaoEtapa:
+    """
+    Números de uma etapa: tempo de parede, tempo de CPU, pico de memória rastreada e linhas de
+    entrada/saída. 'linhas_entrada' e 'linhas_saida' podem ser preenchidas durante a etapa.
+    O 'pico_rss_processo_mb' é o pico do processo desde o início (acumulado, não da etapa); o
+    'aumento_pico_rss_mb' é quanto a etapa elevou esse pico (0 se não passou do pico anterior).
+    """
+
+    def __init__(self, nome, linhas_entrada=None):
+        self.nome = nome
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+        self.segundos = None
+        self.segundos_cpu = None
+        self.pico_memoria_mb = None
+        self.pico_rss_processo_mb = None
+        self.aumento_pico_rss_mb = None
+        self.arquivo_perfil = None
+        self._inicio = time.perf_counter()
+        self._inicio_cpu = time.process_time()
+        self._pico_rss_inicio_mb = _pico_rss_processo_mb()
+
+    def linhas_por_segundo(self):
+        linhas = self.linhas_entrada if self.linhas_entrada is not None else self.linhas_saida
+        if linhas is None or not self.segundos:
+            return None
+        return linhas / self.segundos
+
+    def como_dicionario(self):
+        taxa = self.linhas_por_segundo()
+        return {
+            "etapa": self.nome,
+            "segundos": round(self.segundos, 4),
+            "segundos_cpu": round(self.segundos_cpu, 4),
+            "pico_memoria_mb": None if self.pico_memoria_mb is None else round(self.pico_memoria_mb, 2),
+            "pico_rss_processo_mb": None if self.pico_rss_processo_mb is None else round(self.pico_rss_processo_mb, 1),
+            "aumento_pico_rss_mb": None if self.aumento_pico_rss_mb is None else round(self.aumento_pico_rss_mb, 1),
+            "linhas_entrada": self.linhas_entrada,
+            "linhas_saida": self.linhas_saida,
+            "linhas_por_segundo": None if taxa is None else round(taxa, 1),
+            "arquivo_perfil": self.arquivo_perfil,
+        }
+
+    def resumo(self):
+        texto = f"⏱️ Etapa {self.nome}: {self.segundos:.3f}s ({self.segundos_cpu:.3f}s de CPU)"
+        if self.pico_memoria_mb is not None:
+            texto += f", pico de memória {self.pico_memoria_mb:.1f} MB"
+        elif self.pico_rss_processo_mb is not None:
+            texto += (f", pico de memória do processo {self.pico_rss_processo_mb:.0f} MB"
+                      f" (+{self.aumento_pico_rss_mb:.0f} MB nesta etapa)")
+        if self.linhas_entrada is not None or self.linhas_saida is not None:
+            texto += f", linhas {self.linhas_entrada} -> {self.linhas_saida}"
+        taxa = self.linhas_por_segundo()
+        if taxa is not None:
+            texto += f" ({taxa:,.0f} linhas/s)".replace(",", ".")
+        return texto
+
+
+class Instrumentacao:
+    """
+    Mede as etapas de um script e grava os números no log e em um arquivo JSON por execução
+    (pasta_metricas/<nome>_<data>_<hora>.json). A etapa com nome 'etapa_perfil' também é
+    executada sob o cProfile, e o perfil é gravado ao lado do JSON (abre com pstats ou snakeviz).
+    O pico de memória de cada etapa (tracemalloc) só é medido com medir_memoria=True; por padrão
+    ficam só os números de memória do processo (RSS) de MedicaoEtapa.
+
+    Uso, com bloco:
+        with instrumentacao.etapa("Carregamento", linhas_entrada=n) as medicao:
+            ...
+            medicao.linhas_saida = len(df)
+    ou, em scripts sem funções, com iniciar_etapa(...) / finalizar_etapa(linhas_saida=...).
+    As etapas não devem ser aninhadas.
+    """
+
+    def __init__(self, nome_execucao, logger=None, pasta_metricas=PASTA_METRICAS_PADRAO,
+                 medir_memoria=MEDIR_MEMORIA_PADRAO, etapa_perfil=None):
+        self.nome_execucao = nome_execucao
+        self.logger = logger
+        self.pasta_metricas = pasta_metricas
+        self.medir_memoria = medir_memoria
+        self.etapa_perfil = etapa_perfil
+        self.inicio_execucao = datetime.now()
+        self.medicoes = []
+        self._atual = None
+        self._perfil = None
+        self._parou_tracemalloc = False
+        if medir_memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._parou_tracemalloc = True
+
+    def iniciar_etapa(self, nome, linhas_entrada=None):
+        if self._atual is not None:
+            self.finalizar_etapa()
+        if self.medir_memoria:
+            tracemalloc.reset_peak()
+        if nome == self.etapa_perfil:
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+        self._atual = MedicaoEtapa(nome, linhas_entrada)
+        return self._atual
+
+    def finalizar_etapa(self, linhas_saida=None):
+        medicao = self._atual
+        if medicao is None:
+            return None
+        medicao.segundos = time.perf_counter() - medicao._inicio
+        medicao.segundos_cpu = time.process_time() - medicao._inicio_cpu
+        if linhas_saida is not None:
+            medicao.linhas_saida = linhas_saida
+        if self.medir_memoria:
+            medicao.pico_memoria_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        medicao.pico_rss_processo_mb = _pico_rss_processo_mb()
+        if medicao.pico_rss_processo_mb is not None:
+            medicao.aumento_pico_rss_mb = medicao.pico_rss_processo_mb - medicao._pico_rss_inicio_mb
+        if self._perfil is not None:
+            self._perfil.disable()
+            medicao.arquivo_perfil = self._caminho_base() + f"_{_nome_arquivo(medicao.nome)}.prof"
+            os.makedirs(self.pasta_metricas, exist_ok=True)
+            self._perfil.dump_stats(medicao.arquivo_perfil)
+            self._perfil = None
+
+        self._atual = None
+        self.medicoes.append(medicao)
+        if self.logger is not None:
+            self.logger.info(medicao.resumo())
+        return medicao
+
+    @contextmanager
+    def etapa(self, nome, linhas_entrada=None):
+        medicao = self.iniciar_etapa(nome, linhas_entrada)
+        try:
+            yield medicao
+        finally:
+            self.finalizar_etapa()
+
+    def _caminho_base(self):
+        return os.path.join(self.pasta_metricas,
+                            f"{self.nome_execucao}_{self.inicio_execucao:%Y%m%d_%H%M%S}")
+
+    def salvar(self):
+        """
+        Finaliza a etapa em andamento (se houver) e grava o JSON de métricas da execução.
+        Retorna o caminho do arquivo gravado.
+        """
+        self.finalizar_etapa()
+        if self._parou_tracemalloc:
+            tracemalloc.stop()
+            self._parou_tracemalloc = False
+
+        os.makedirs(self.pasta_metricas, exist_ok=True)
+        caminho = self._caminho_base() + ".json"
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "execucao": self.nome_execucao,
+                "inicio": self.inicio_execucao.isoformat(timespec="seconds"),
+                "segundos_total": round(sum(medicao.segundos for medicao in self.medicoes), 4),
+                "etapas": [medicao.como_dicionario() for medicao in self.medicoes],
+            }, arquivo, ensure_ascii=False, indent=2)
+        if self.logger is not None:
+            self.logger.info(f"Métricas da execução gravadas em {caminho}.")
+        return caminho
+
+
+def _pico_rss_processo_mb():
+    """
+    Pico de memória residente do processo desde o início (ru_maxrss), em MB; None fora do Unix.
+    """
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _nome_arquivo(texto):
+    return "".join(c if c.isalnum() else "_" for c in texto).strip("_")
@@ -0,0 +1,141 @@
+import sqlite3
+import time
+
+import pandas as pd
+
+# --- Configurações Padrão do Livro Semanal ---
+CAMINHO_LIVRO_PADRAO = "livro_semanal.sqlite3"
+SEMANA_BASE = "BASE"  # Lançamento com o valor que a loja já tinha no relatório ao entrar no livro
+SEMANA_AJUSTE = "AJUSTE"  # Prefixo dos lançamentos de correções manuais (ex.: 'AJUSTE 1760650000.123456')
+_COLUNAS_CHAVE = ['cnpj_chave', 'cnpj_tipo', 'nome']
+
+
+class LivroSemanal:
+    """
+    Livro-razão (SQLite) dos pagamentos semanais por loja, persistente entre execuções.
+
+    Cada semana aplicada vira um conjunto de lançamentos (loja, semana, valor) e o saldo acumulado
+    de cada loja fica na tabela 'saldos', atualizada só com as lojas da semana. Aplicar de novo uma
+    semana já registrada não altera nada. Correções manuais do relatório entram como ajustes.
+    """
+
+    def __init__(self, caminho=CAMINHO_LIVRO_PADRAO):
+        self.caminho = caminho
+        self.conexao = sqlite3.connect(caminho)
+        self.conexao.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS lancamentos (
+                semana TEXT NOT NULL,
+                cnpj_chave INTEGER NOT NULL,
+                cnpj_tipo INTEGER NOT NULL,
+                nome TEXT NOT NULL,
+                valor REAL NOT NULL,
+                PRIMARY KEY (semana, cnpj_chave, cnpj_tipo, nome)
+            );
+            CREATE TABLE IF NOT EXISTS saldos (
+                cnpj_chave INTEGER NOT NULL,
+                cnpj_tipo INTEGER NOT NULL,
+                nome TEXT NOT NULL,
+                valor REAL NOT NULL,
+                PRIMARY KEY (cnpj_chave, cnpj_tipo, nome)
+            );
+            CREATE TABLE IF NOT EXISTS semanas (
+                semana TEXT PRIMARY KEY,
+                aplicada_em REAL NOT NULL,
+                lojas INTEGER NOT NULL,
+                total REAL NOT NULL
+            );
+            """
+        )
+        self.conexao.commit()
+
+    @staticmethod
+    def _linhas(df_valores):
+        """
+        Converte um DataFrame (cnpj_chave, cnpj_tipo, nome, valor) em tuplas com tipos nativos do Python.
+        """
+        return list(zip(df_valores.iloc[:, 0].astype('int64').tolist(), df_valores.iloc[:, 1].astype('int64').tolist(),
+                        df_valores.iloc[:, 2].astype(str).tolist(), df_valores.iloc[:, 3].astype(float).tolist()))
+
+    def semana_aplicada(self, semana):
+        """
+        Retorna a data (timestamp) em que a semana foi aplicada, ou None se ainda não foi.
+        """
+        linha = self.conexao.execute("SELECT aplicada_em FROM semanas WHERE semana = ?", (semana,)).fetchone()
+        return None if linha is None else linha[0]
+
+    def registrar_saldos_iniciais(self, df_valores):
+        """
+        Registra como saldo inicial (SEMANA_BASE) o valor das lojas que ainda não estão no livro.
+        'df_valores' tem as colunas (cnpj_chave, cnpj_tipo, nome, valor), nessa ordem.
+        Retorna quantas lojas entraram no livro.
+        """
+        linhas = self._linhas(df_valores)
+        antes = self.conexao.total_changes
+        with self.conexao:
+            self.conexao.executemany(
+                "INSERT OR IGNORE INTO saldos (cnpj_chave, cnpj_tipo, nome, valor) VALUES (?, ?, ?, ?)", linhas)
+            novas = self.conexao.total_changes - antes
+            self.conexao.executemany(
+                "INSERT OR IGNORE INTO lancamentos (semana, cnpj_chave, cnpj_tipo, nome, valor) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(SEMANA_BASE, *linha) for linha in linhas]
+            )
+        return novas
+
+    def registrar_semana(self, semana, df_valores):
+        """
+        Lança os pagamentos da semana e soma-os aos saldos, em uma única transação.
+        Retorna False (sem alterar nada) se a semana já tinha sido aplicada.
+        """
+        if self.semana_aplicada(semana) is not None:
+            return False
+
+        linhas = self._linhas(df_valores)
+        with self.conexao:
+            self.conexao.executemany(
+                "INSERT INTO lancamentos (semana, cnpj_chave, cnpj_tipo, nome, valor) VALUES (?, ?, ?, ?, ?)",
+                [(semana, *linha) for linha in linhas]
+            )
+            self.conexao.executemany(
+                "INSERT INTO saldos (cnpj_chave, cnpj_tipo, nome, valor) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (cnpj_chave, cnpj_tipo, nome) DO UPDATE SET valor = valor + excluded.valor",
+                linhas
+            )
+            self.conexao.execute(
+                "INSERT INTO semanas (semana, aplicada_em, lojas, total) VALUES (?, ?, ?, ?)",
+                (semana, time.time(), len(linhas), sum(linha[3] for linha in linhas))
+            )
+        return True
+
+    def registrar_ajustes(self, df_valores):
+        """
+        Registra correções manuais: o saldo de cada loja passa a ser o valor informado e a diferença
+        para o saldo anterior vira um lançamento de ajuste (SEMANA_AJUSTE + data), em uma única transação.
+        'df_valores' tem as colunas (cnpj_chave, cnpj_tipo, nome, valor), nessa ordem, só com lojas
+        que já estão no livro. Retorna o identificador dos lançamentos.
+        """
+        semana = f"{SEMANA_AJUSTE} {time.time():.6f}"
+        linhas = self._linhas(df_valores)
+        with self.conexao:
+            self.conexao.executemany(
+                "INSERT INTO lancamentos (semana, cnpj_chave, cnpj_tipo, nome, valor) "
+                "SELECT ?, cnpj_chave, cnpj_tipo, nome, ? - valor FROM saldos "
+                "WHERE cnpj_chave = ? AND cnpj_tipo = ? AND nome = ?",
+                [(semana, valor, chave, tipo, nome) for chave, tipo, nome, valor in linhas]
+            )
+            self.conexao.executemany(
+                "UPDATE saldos SET valor = ? WHERE cnpj_chave = ? AND cnpj_tipo = ? AND nome = ?",
+                [(valor, chave, tipo, nome) for chave, tipo, nome, valor in linhas]
+            )
+        return semana
+
+    def saldos(self):
+        """
+        Saldo acumulado de cada loja, em uma Series indexada por (cnpj_chave, cnpj_tipo, nome).
+        """
+        df_saldos = pd.read_sql_query("SELECT cnpj_chave, cnpj_tipo, nome, valor FROM saldos", self.conexao)
+        return df_saldos.set_index(_COLUNAS_CHAVE)['valor']
+
+    def fechar(self):
+        self.conexao.close()
@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# --- Configurações Padrão ---
+MAX_WORKERS_PADRAO = os.cpu_count() or 1
+TAMANHO_BLOCO_PADRAO = 500  # Consultas enviadas a cada worker por tarefa
+
+# Estado de cada processo worker (ex.: o índice de referência), criado uma única vez
+# pelo initializer do pool para não reenviar a lista de referência a cada bloco.
+_ESTADO_WORKER = None
+
+
+def _inicializar_worker(preparar, referencias):
+    global _ESTADO_WORKER
+    _ESTADO_WORKER = preparar(referencias)
+
+
+def _casar_bloco_no_worker(casar_bloco, bloco):
+    return casar_bloco(_ESTADO_WORKER, bloco)
+
+
+def casar_em_paralelo(consultas, referencias, preparar, casar_bloco,
+                      max_workers=MAX_WORKERS_PADRAO, tamanho_bloco=TAMANHO_BLOCO_PADRAO):
+    """
+    Executa o matching de 'consultas' contra 'referencias' distribuindo blocos de consultas
+    entre processos.
+
+    - preparar(referencias) monta o estado usado no matching (ex.: IndiceCnpj, IndiceNomes);
+      é executado uma única vez em cada worker, que recebe as referências pelo initializer.
+    - casar_bloco(estado, bloco) devolve uma lista de resultados alinhada com o bloco.
+
+    Ambas precisam ser funções (ou classes/partial) definidas em nível de módulo, para que
+    possam ser enviadas aos workers. O resultado volta na ordem original das consultas e é
+    idêntico ao da execução serial, usada quando há um único worker ou um único bloco.
+    """
+    consultas = list(consultas)
+    max_workers = max(1, int(max_workers or 1))
+    tamanho_bloco = max(1, int(tamanho_bloco))
+
+    if max_workers == 1 or len(consultas) <= tamanho_bloco:
+        return casar_bloco(preparar(referencias), consultas)
+
+    blocos = [consultas[inicio:inicio + tamanho_bloco] for inicio in range(0, len(consultas), tamanho_bloco)]
+    max_workers = min(max_workers, len(blocos))
+
+    resultados = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_inicializar_worker,
+                             initargs=(preparar, referencias)) as executor:
+        # executor.map devolve os blocos na ordem em que foram enviados
+        for resultado_bloco in executor.map(partial(_casar_bloco_no_worker, casar_bloco), blocos):
+            resultados.extend(resultado_bloco)
+    return resultados
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+
+# --- Configurações Padrão da Memória de Execuções ---
+DIRETORIO_MEMO_PADRAO = ".memo_execucao"
+_TAMANHO_BLOCO_HASH = 1024 * 1024
+# O código do script e dos módulos desta pasta que ele importa também entra na impressão: mudar uma
+# regra refaz a execução, mas editar um script não relacionado (ex.: benchmark.py) não
+_PASTA_CODIGO = os.path.dirname(os.path.abspath(__file__))
+
+
+def _hash_arquivo(caminho):
+    """
+    SHA-256 do conteúdo do arquivo, lido em blocos; None se o arquivo não existir.
+    """
+    if not os.path.exists(caminho):
+        return None
+    hasher = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(_TAMANHO_BLOCO_HASH), b''):
+            hasher.update(bloco)
+    return hasher.hexdigest()
+
+
+def _arquivos_codigo():
+    """
+    Arquivos .py desta pasta carregados no processo: o script em execução (__main__) e os módulos
+    do projeto que ele importou.
+    """
+    arquivos = set()
+    for modulo in list(sys.modules.values()):
+        caminho = getattr(modulo, '__file__', None)
+        if caminho and caminho.endswith('.py') and \
+                os.path.dirname(os.path.abspath(caminho)) == _PASTA_CODIGO:
+            arquivos.add(os.path.abspath(caminho))
+    return sorted(arquivos)
+
+
+class MemoExecucao:
+    """
+    Lembra a última execução de um script: a impressão das entradas (conteúdo dos arquivos,
+    parâmetros como abas, colunas e limiares, e o código do script e dos módulos do projeto que
+    ele importa) e o hash da saída gerada.
+    Se nada mudou e a saída continua a mesma, a execução pode ser pulada.
+
+    A impressão é registrada depois da gravação da saída, com os arquivos como ficaram. Assim,
+    um script que atualiza a própria entrada (ex.: cruzar_pos_bi.py) também reconhece a nova
+    execução sobre o resultado da anterior, que daria o mesmo resultado.
+
+    Uso:
+        memo = MemoExecucao("cruzar_pos_bi", [entrada1, entrada2], parametros, saida)
+        if memo.repetida():
+            return
+        ...  # processa e grava a saída
+        memo.registrar()
+    """
+
+    def __init__(self, nome, entradas, parametros, saida, diretorio=DIRETORIO_MEMO_PADRAO):
+        self.nome = nome
+        self.entradas = list(entradas)
+        self.parametros = parametros
+        self.saida = saida
+        self.caminho = os.path.join(diretorio, f"{nome}.json")
+        # Lista fixada na criação, para a verificação e o registro usarem os mesmos arquivos
+        self.arquivos_codigo = _arquivos_codigo()
+
+    def impressao(self):
+        """
+        Hash das entradas, dos parâmetros e do código do script e dos módulos do projeto que ele importa.
+        """
+        codigo = self.arquivos_codigo
+        conteudo = {
+            "entradas": {os.path.abspath(caminho): _hash_arquivo(caminho) for caminho in self.entradas},
+            "parametros": self.parametros,
+            "codigo": {os.path.basename(caminho): _hash_arquivo(caminho) for caminho in codigo},
+        }
+        texto = json.dumps(conteudo, sort_keys=True, ensure_ascii=False, default=repr)
+        return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+    def _registro(self):
+        try:
+            with open(self.caminho, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return None
+
+    def repetida(self):
+        """
+        True se as entradas e os parâmetros são os da última execução registrada e a saída
+        gerada por ela ainda existe, sem alterações.
+        """
+        registro = self._registro()
+        if registro is None or registro.get("impressao") != self.impressao():
+            return False
+        return registro.get("hash_saida") is not None and registro["hash_saida"] == _hash_arquivo(self.saida)
+
+    def data_ultima_execucao(self):
+        registro = self._registro()
+        return registro.get("data") if registro else None
+
+    def registrar(self):
+        """
+        Grava a impressão atual e o hash da saída. Falhas de gravação não interrompem o script.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+            with open(self.caminho, 'w', encoding='utf-8') as arquivo:
+                json.dump({
+                    "execucao": self.nome,
+                    "data": datetime.now().isoformat(timespec="seconds"),
+                    "impressao": self.impressao(),
+                    "saida": os.path.abspath(self.saida),
+                    "hash_saida": _hash_arquivo(self.saida),
+                }, arquivo, ensure_ascii=False, indent=2)
+        except OSError:
+            pass
@@ -0,0 +1,32 @@
+import pandas as pd
+
+# --- Formas Jurídicas Removidas da Chave Canônica ---
+# Comparadas palavra a palavra, já sem acentos e pontuação ('S/A' e 'S.A.' viram 'sa').
+SUFIXOS_SOCIETARIOS = ['ltda', 'me', 'epp', 'eireli', 'sa']
+
+_RE_SA = r'\bs\s*[/.]\s*a\b'  # S/A, S.A., s / a
+_RE_NAO_ALFANUMERICO = r'[^a-z0-9]+'
+
+
+def chaves_canonicas(nomes, sufixos=SUFIXOS_SOCIETARIOS):
+    """
+    Chave canônica de cada nome de empresa: minúsculas, sem acentos, pontuação e formas
+    jurídicas, com as palavras em ordem alfabética separadas por um espaço.
+    Ex.: "ACME COMERCIO LTDA - ME" e "acme comércio ltda" viram "acme comercio".
+
+    Células vazias (ou só com a forma jurídica) viram ''. Cada nome distinto é processado
+    uma única vez, e a série devolvida tem o mesmo índice de 'nomes'.
+    """
+    nomes = pd.Series(nomes)
+    texto = nomes.astype(object).where(nomes.notna(), '').astype(str)
+    unicos = pd.Series(texto.unique())
+
+    limpos = (unicos.str.lower()
+              .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+              .str.replace(_RE_SA, ' sa ', regex=True)
+              .str.replace(_RE_NAO_ALFANUMERICO, ' ', regex=True))
+    remover = set(sufixos)
+    chaves = [' '.join(sorted(palavra for palavra in palavras if palavra not in remover))
+              for palavras in limpos.str.split()]
+
+    return texto.map(dict(zip(unicos, chaves)))
@@ -0,0 +1,118 @@
+import os
+import sys
+
+import atualizar_planilha
+import cruzar_pos_bi
+import tratar_planilha_csv
+from cache_planilhas import ColunasFaltandoError, ler_excel_esquema
+from instrumentacao import Instrumentacao
+
+# --- Pipeline em Memória ---
+# Executa em um único processo a cadeia:
+#   tratar_planilha_csv.py -> atualizar_planilha.py -> cruzar_pos_bi.py
+# passando os DataFrames diretamente entre as etapas, sem gravar e reler as planilhas intermediárias.
+# As configurações (caminhos, abas, colunas e limiares) são as de cada script.
+
+# Grava também as planilhas intermediárias (quantidade_maquinas_por_empresa.xlsx e a aba de devolução
+# antes do cruzamento, em PLANILHA_INTERMEDIARIA_PATH) para conferência.
+# Também pode ser ativado passando '--debug' na linha de comando.
+SALVAR_INTERMEDIARIOS = False
+
+# Arquivo final: a aba de devolução com 'POS Planilha', 'POS Adiq' e 'POS NÃO UTILIZADA' preenchidas.
+PLANILHA_FINAL_PATH = atualizar_planilha.NOVA_PLANILHA_SAIDA_PATH
+# Intermediário do '--debug' (só 'POS Planilha' preenchida), com nome próprio para não ser sobrescrito pelo final
+PLANILHA_INTERMEDIARIA_PATH = "{}_intermediaria{}".format(*os.path.splitext(PLANILHA_FINAL_PATH))
+
+# Tempo, CPU, memória e linhas de cada etapa vão para um JSON por execução nesta pasta.
+# Uma etapa pode ser executada sob o cProfile com --perfil="<nome da etapa>".
+PASTA_METRICAS = "metricas"
+# Pico de memória de cada etapa com o tracemalloc (deixa o script bem mais lento). Também: --memoria
+MEDIR_MEMORIA = False
+
+
+def carregar_entradas():
+    """
+    Conta as máquinas do inventário e carrega as abas de devolução e da pos_bi.
+    """
+    try:
+        df_quantidade = tratar_planilha_csv.contar_maquinas_arquivo(tratar_planilha_csv.arquivo_xlsx)
+
+        print(f"🔄 Carregando '{atualizar_planilha.PLANILHA_PRINCIPAL_PATH}' "
+              f"(aba '{atualizar_planilha.ABA_DEVOLUCAO}')...")
+        df_devolucao = ler_excel_esquema(atualizar_planilha.PLANILHA_PRINCIPAL_PATH, atualizar_planilha.ABA_DEVOLUCAO,
+                                         atualizar_planilha.ESQUEMA_DEVOLUCAO, manter_demais_colunas=True)
+
+        print(f"🔄 Carregando '{cruzar_pos_bi.PLANILHA_POS_BI_PATH}' (aba '{cruzar_pos_bi.ABA_POS_BI}')...")
+        df_pos_bi = ler_excel_esquema(cruzar_pos_bi.PLANILHA_POS_BI_PATH, cruzar_pos_bi.ABA_POS_BI,
+                                      cruzar_pos_bi.ESQUEMA_POS_BI)
+
+        print("✅ Entradas carregadas com sucesso.")
+        return df_quantidade, df_devolucao, df_pos_bi
+
+    except ColunasFaltandoError as e:
+        print(f"\n❌ ERRO: As seguintes colunas esperadas não foram encontradas em '{e.caminho}' (aba '{e.sheet_name}'):")
+        for col in e.faltando:
+            print(f"- '{col}'")
+        print(f"Colunas disponíveis: {e.disponiveis}")
+        sys.exit(1)
+    except FileNotFoundError as e:
+        print(f"\n❌ ERRO: Arquivo não encontrado. Verifique os caminhos configurados em cada script.")
+        print(f"Detalhes: {e}")
+        sys.exit(1)
+    except ValueError as e:  # Aba não encontrada
+        print(f"\n❌ ERRO: A aba especificada não foi encontrada. Detalhes: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Ocorreu um erro inesperado ao carregar as entradas. Detalhes: {e}")
+        print("Verifique se os arquivos não estão abertos em outro programa e se estão no formato correto.")
+        sys.exit(1)
+
+
+def main():
+    salvar_intermediarios = SALVAR_INTERMEDIARIOS or '--debug' in sys.argv[1:]
+    etapa_perfil = next((arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--perfil=")), None)
+    medir_memoria = MEDIR_MEMORIA or '--memoria' in sys.argv[1:]
+    instrumentacao = Instrumentacao("pipeline_maquininhas", pasta_metricas=PASTA_METRICAS,
+                                    medir_memoria=medir_memoria, etapa_perfil=etapa_perfil)
+
+    print("\n--- Etapa 1/3: Contagem de máquinas por empresa ---")
+    with instrumentacao.etapa("1/3 Contagem e carregamento") as medicao:
+        df_quantidade, df_devolucao, df_pos_bi = carregar_entradas()
+        medicao.linhas_saida = len(df_quantidade) + len(df_devolucao) + len(df_pos_bi)
+    if salvar_intermediarios:
+        print(f"🐞 Salvando intermediário: '{tratar_planilha_csv.arquivo_saida}'...")
+        df_quantidade.to_excel(tratar_planilha_csv.arquivo_saida, index=False)
+
+    print("\n--- Etapa 2/3: Preenchimento de 'POS Planilha' por CNPJ ---")
+    cache_cnpj = atualizar_planilha.criar_cache_matching()
+    with instrumentacao.etapa("2/3 Match por CNPJ", linhas_entrada=len(df_devolucao)) as medicao:
+        df_devolucao = atualizar_planilha.preencher_pos_planilha(df_devolucao, df_quantidade, cache_cnpj)
+        medicao.linhas_saida = len(df_devolucao)
+    if salvar_intermediarios:
+        print("🐞 Salvando intermediário:")
+        atualizar_planilha.salvar_planilha(df_devolucao, PLANILHA_INTERMEDIARIA_PATH)
+
+    print("\n--- Etapa 3/3: Cruzamento com a pos_bi por nome ---")
+    cache_nomes = cruzar_pos_bi.criar_cache_matching()
+    with instrumentacao.etapa("3/3 Match por nome", linhas_entrada=len(df_devolucao)) as medicao:
+        df_devolucao = cruzar_pos_bi.cruzar_com_pos_bi(df_pos_bi, df_devolucao, cache_nomes)
+        medicao.linhas_saida = len(df_devolucao)
+
+    # --- Única gravação da planilha final ---
+    with instrumentacao.etapa("Salvamento", linhas_entrada=len(df_devolucao)):
+        atualizar_planilha.salvar_planilha(df_devolucao, PLANILHA_FINAL_PATH)
+
+    for cache_matching in (cache_cnpj, cache_nomes):
+        if cache_matching:
+            print(f"\n{cache_matching.resumo()}")
+            cache_matching.fechar()
+
+    for medicao in instrumentacao.medicoes:
+        print(medicao.resumo())
+    print(f"⏱️ Métricas da execução gravadas em '{instrumentacao.salvar()}'.")
+
+    print("\n✨ Pipeline finalizado. ✨")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import logging
+import os
+from logging.handlers import MemoryHandler
+
+import pandas as pd
+
+# --- Configurações Padrão dos Relatórios ---
+# O console mostra só a contagem e uma amostra; a lista completa vai para um CSV em PASTA_RELATORIOS_PADRAO.
+AMOSTRA_CONSOLE_PADRAO = 10
+AMOSTRA_COLUNAS_PADRAO = 15  # Nomes de colunas mostrados antes de '... (+N)'
+PASTA_RELATORIOS_PADRAO = "relatorios"
+# Registros de log guardados em memória antes de irem para o arquivo (erros são gravados na hora)
+CAPACIDADE_BUFFER_LOG_PADRAO = 1000
+
+
+def gravar_lista(df, nome, pasta=PASTA_RELATORIOS_PADRAO):
+    """
+    Grava a lista completa em pasta/<nome>.csv de uma só vez (utf-8 com BOM, para abrir no Excel
+    com acentos) e retorna o caminho.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"{nome}.csv")
+    df.to_csv(caminho, index=False, encoding='utf-8-sig')
+    return caminho
+
+
+def relatar_lista(df, nome, formatar, titulo, amostra=AMOSTRA_CONSOLE_PADRAO, pasta=PASTA_RELATORIOS_PADRAO,
+                  recuo=""):
+    """
+    Mostra no console o título com a quantidade de linhas de df e só as 'amostra' primeiras,
+    cada uma formatada por formatar(linha) (linha = tupla com os valores das colunas). A lista
+    completa é gravada com gravar_lista. Retorna o caminho do CSV (None se df estiver vazio).
+    """
+    if df.empty:
+        return None
+    caminho = gravar_lista(df, nome, pasta)
+    print(f"{recuo}{titulo} ({len(df)}):")
+    for linha in df.head(amostra).itertuples(index=False, name=None):
+        print(f"{recuo}{formatar(linha)}")
+    if len(df) > amostra:
+        print(f"{recuo}... e mais {len(df) - amostra}. Lista completa em '{caminho}'.")
+    else:
+        print(f"{recuo}Lista completa em '{caminho}'.")
+    return caminho
+
+
+def descrever_colunas(colunas, amostra=AMOSTRA_COLUNAS_PADRAO):
+    """
+    Texto com a quantidade de colunas e os primeiros nomes (os demais viram '... (+N)').
+    """
+    colunas = [str(coluna) for coluna in colunas]
+    texto = ", ".join(f"'{coluna}'" for coluna in colunas[:amostra])
+    if len(colunas) > amostra:
+        texto += f", ... (+{len(colunas) - amostra})"
+    return f"{len(colunas)} colunas: {texto}"
+
+
+def mostrar_amostra(df, linhas=5, colunas=AMOSTRA_COLUNAS_PADRAO):
+    """
+    Imprime as primeiras linhas de df limitando também as colunas exibidas (planilhas largas).
+    """
+    with pd.option_context('display.max_columns', colunas, 'display.width', 200):
+        print(df.head(linhas))
+
+
+def bufferizar_log(logger=None, capacidade=CAPACIDADE_BUFFER_LOG_PADRAO, nivel_descarga=logging.ERROR):
+    """
+    Troca cada handler do logger (por padrão, o raiz) por um MemoryHandler que o envolve: os
+    registros são gravados em lotes de 'capacidade', ou na hora a partir de 'nivel_descarga'.
+    O logging.shutdown, chamado na saída do Python, grava o que ainda estiver no buffer.
+    """
+    logger = logger or logging.getLogger()
+    for handler in list(logger.handlers):
+        if isinstance(handler, MemoryHandler):
+            continue
+        logger.removeHandler(handler)
+        logger.addHandler(MemoryHandler(capacidade, flushLevel=nivel_descarga, target=handler))
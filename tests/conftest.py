@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Os scripts ficam na raiz do repositório e são importados como módulos soltos
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
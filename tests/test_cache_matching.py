@@ -0,0 +1,65 @@
+import pytest
+
+from cache_matching import CacheMatching, impressao_referencias
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CacheMatching(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.fechar()
+
+
+def _casar_contando(chamadas):
+    def casar(consultas):
+        chamadas.append(list(consultas))
+        return [None if consulta == "sem" else (consulta.upper(), 90) for consulta in consultas]
+    return casar
+
+
+def test_casar_consulta_so_as_faltantes(cache):
+    chamadas = []
+    casar = _casar_contando(chamadas)
+    assert cache.casar(["a", "b", "a", "sem"], ["A", "B"], "ratio", 90, casar) == \
+        [("A", 90), ("B", 90), ("A", 90), None]
+    assert chamadas == [["a", "b", "sem"]]
+
+    # Resultados None também ficam no cache
+    assert cache.casar(["sem", "c", "a"], ["A", "B"], "ratio", 90, casar) == [None, ("C", 90), ("A", 90)]
+    assert chamadas[1:] == [["c"]]
+    assert (cache.acertos, cache.falhas) == (2, 4)
+
+
+def test_chave_inclui_referencia_scorer_e_limiar(cache):
+    chamadas = []
+    casar = _casar_contando(chamadas)
+    cache.casar(["a"], ["A", "B"], "ratio", 90, casar)
+    cache.casar(["a"], ["B", "A"], "ratio", 90, casar)  # A ordem decide os empates
+    cache.casar(["a"], ["A", "B"], "token_set_ratio", 90, casar)
+    cache.casar(["a"], ["A", "B"], "ratio", 95, casar)
+    assert len(chamadas) == 4
+    assert impressao_referencias(["A", "B"]) != impressao_referencias(["AB"])
+
+
+def test_persistente_entre_execucoes(tmp_path):
+    caminho = str(tmp_path / "cache.sqlite3")
+    chamadas = []
+    primeiro = CacheMatching(caminho)
+    primeiro.casar(["a"], ["A"], "ratio", 90, _casar_contando(chamadas))
+    primeiro.fechar()
+
+    segundo = CacheMatching(caminho)
+    assert segundo.casar(["a"], ["A"], "ratio", 90, _casar_contando(chamadas)) == [("A", 90)]
+    segundo.fechar()
+    assert len(chamadas) == 1
+
+
+def test_remove_as_usadas_ha_mais_tempo(tmp_path):
+    cache = CacheMatching(str(tmp_path / "cache.sqlite3"), max_entradas=2)
+    referencia = impressao_referencias(["A"])
+    cache.gravar({"a": ("A", 90)}, referencia, "ratio", 90)
+    cache.gravar({"b": ("B", 90)}, referencia, "ratio", 90)
+    cache.buscar(["a"], referencia, "ratio", 90)  # 'a' passa a ser a usada mais recentemente
+    cache.gravar({"c": ("C", 90)}, referencia, "ratio", 90)
+    assert set(cache.buscar(["a", "b", "c"], referencia, "ratio", 90)) == {"a", "c"}
+    cache.fechar()
@@ -0,0 +1,63 @@
+import random
+
+from fuzzywuzzy import fuzz, process
+
+from candidatos_nomes import IndiceNomes
+
+PALAVRAS = ['comercio', 'acme', 'bar', 'restaurante', 'padaria', 'sao', 'jose', 'silva', 'materiais',
+            'construcao', 'mercado', 'central', 'auto', 'pecas', 'farmacia', 'popular', 'ltda', 'me', 'eireli']
+
+
+def _nomes(semente, quantidade):
+    aleatorio = random.Random(semente)
+    referencia = [' '.join(aleatorio.sample(PALAVRAS, aleatorio.randint(2, 4))).upper() for _ in range(quantidade)]
+    consultas = []
+    for nome in aleatorio.sample(referencia, 60):
+        letras = list(nome)
+        for _ in range(aleatorio.randint(0, 2)):
+            letras[aleatorio.randrange(len(letras))] = aleatorio.choice('abcdefghij')
+        consultas.append(''.join(letras) + aleatorio.choice(['', ' LTDA', ' - ME']))
+    return referencia, consultas + ['', '???', 'NOME QUE NAO EXISTE']
+
+
+def test_top_k_com_toda_a_referencia_igual_ao_extract_one():
+    referencia, consultas = _nomes(1, 120)
+    indice = IndiceNomes(referencia, top_k=len(referencia))
+    for consulta, match in zip(consultas, indice.melhores_matches(consultas)):
+        candidatos = indice.candidatos([consulta])[0]
+        if len(candidatos) == 0:
+            assert match is None
+            continue
+        # Com todos os nomes que compartilham n-gramas, o resultado é o do extractOne sobre eles
+        esperado = process.extractOne(consulta, [indice.lista_nomes_ref[p] for p in candidatos],
+                                      scorer=fuzz.token_set_ratio)
+        assert match == (esperado[0], esperado[1])
+        assert match[1] == process.extractOne(consulta, referencia, scorer=fuzz.token_set_ratio)[1]
+
+
+def test_empate_vai_para_a_primeira_ocorrencia():
+    referencia = ['BAR DO ZE', 'ACME COMERCIO', 'COMERCIO ACME', 'ACME COMERCIO']
+    indice = IndiceNomes(referencia)
+    assert indice.lista_nomes_ref == ['BAR DO ZE', 'ACME COMERCIO', 'COMERCIO ACME']
+    assert indice.melhores_matches(['acme comercio'])[0] == \
+        process.extractOne('acme comercio', referencia, scorer=fuzz.token_set_ratio)
+
+
+def test_nome_exato_sempre_encontrado():
+    referencia, _ = _nomes(2, 500)
+    indice = IndiceNomes(referencia, top_k=5, tamanho_bloco=64)
+    for nome, match in zip(referencia, indice.melhores_matches(referencia)):
+        assert match[1] == 100
+
+
+def test_dois_melhores_comeca_pelo_melhor_match():
+    referencia, consultas = _nomes(3, 200)
+    indice = IndiceNomes(referencia)
+    for pares, melhor in zip(indice.dois_melhores(consultas), indice.melhores_matches(consultas)):
+        assert (pares[0] if pares else None) == melhor
+        assert [score for _, score in pares] == sorted((score for _, score in pares), reverse=True)
+
+
+def test_referencia_vazia_ou_sem_caracteres():
+    assert IndiceNomes([]).melhores_matches(['ACME']) == [None]
+    assert IndiceNomes(['!!!', '']).melhores_matches(['ACME']) == [None]
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from chave_documento import (CHAVE_INVALIDA, TIPO_CNPJ, TIPO_CPF, TIPO_INVALIDO, TIPO_VAZIO, chaves_documento,
+                             limpar_documento, raizes_cnpj)
+
+
+def test_limpar_documento():
+    serie = pd.Series(['12.345.678/0001-95', '123.456.789-09', 12345678000195.0, None, np.nan, '', ' 0123 '],
+                      dtype=object)
+    assert limpar_documento(serie).tolist() == ['12345678000195', '12345678909', '12345678000195', '', '', '',
+                                                '0123']
+
+
+def test_limpar_documento_coluna_float_com_vazios():
+    # Coluna lida do Excel com células vazias: float64 com NaN
+    serie = pd.Series([12345678000195.0, np.nan, 12345678909.0])
+    assert limpar_documento(serie).tolist() == ['12345678000195', '', '12345678909']
+
+
+def test_limpar_documento_coluna_texto_com_vazios():
+    # No pandas 3 a coluna é do tipo str e o astype(str) mantém o NaN
+    serie = pd.Series(['12.345.678/0001-95', None], dtype='string')
+    assert limpar_documento(serie).tolist() == ['12345678000195', '']
+
+
+def test_chaves_documento_preservam_zeros_a_esquerda():
+    chave, tipo = chaves_documento(pd.Series(['01.234.567/0001-89', '012.345.678-90', None, '1' * 19]))
+    assert chave.tolist() == [1234567000189, 1234567890, 0, CHAVE_INVALIDA]
+    assert tipo.tolist() == [TIPO_CNPJ, TIPO_CPF, TIPO_VAZIO, TIPO_INVALIDO]
+    assert chave.dtype == np.int64 and tipo.dtype == np.int8
+    # Documentos diferentes com o mesmo número só se distinguem pelo tipo
+    assert chaves_documento(pd.Series(['00000000000123', '00000000123']))[1].tolist() == [TIPO_CNPJ, TIPO_CPF]
+
+
+def test_raizes_cnpj():
+    raizes = raizes_cnpj(pd.Series(['12345678000195', '12345678909', '']))
+    assert raizes.iloc[0] == '12345678'
+    assert raizes.iloc[1:].isna().all()
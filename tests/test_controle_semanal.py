@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+import controle_semanal as cs
+
+
+def _relatorio(linhas):
+    return pd.DataFrame(linhas, columns=['CNPJ_CHAVE', 'CNPJ_TIPO', 'NOME_LIMPO',
+                                         cs.COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO,
+                                         cs.COL_ANTERIOR_VALOR_LIQUIDAR_FUTURO, 'Observação',
+                                         cs.COL_ANTERIOR_CNPJ, cs.COL_ANTERIOR_NOME])
+
+
+def _referencia(df):
+    """
+    Consolidação com uma agregação por coluna, como era antes do consolidar_duplicatas.
+    """
+    agregacoes = {col: 'first' for col in df.columns if col not in cs.CHAVE_LOJA}
+    agregacoes[cs.COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] = 'sum'
+    return df.groupby(cs.CHAVE_LOJA, as_index=False, dropna=False).agg(agregacoes)
+
+
+def _comparar(df):
+    resultado = cs.consolidar_duplicatas(df)
+    esperado = _referencia(df)[resultado.columns]
+    pd.testing.assert_frame_equal(resultado.reset_index(drop=True), esperado, check_dtype=False)
+
+
+def test_consolidar_duplicatas_soma_valor_e_usa_primeiro_nao_vazio():
+    _comparar(_relatorio([
+        [2, 14, 'loja b', 10.0, 1.0, None, '2', 'Loja B'],
+        [1, 14, 'loja a', 5.0, 2.0, 'obs a', '1', 'Loja A'],
+        [2, 14, 'loja b', np.nan, 3.0, 'obs b', '2', 'LOJA B'],
+        [2, 14, 'loja b', 7.5, np.nan, 'outra', '2', 'Loja B'],
+    ]))
+
+
+def test_consolidar_duplicatas_com_nome_vazio_na_chave():
+    # No pandas 3 o padronizar_nome mantém o nome vazio como NaN, que faz parte da chave
+    _comparar(_relatorio([
+        [3, 14, np.nan, 4.0, 1.0, None, '3', None],
+        [1, 14, 'loja a', 5.0, 2.0, 'obs a', '1', 'Loja A'],
+        [3, 14, np.nan, 6.0, 8.0, 'obs c', '3', None],
+        [1, 14, 'loja a', 1.0, 2.0, None, '1', 'Loja A'],
+    ]))
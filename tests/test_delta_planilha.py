@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from delta_planilha import ALTERADA, COLUNAS_DELTA, INSERIDA, REMOVIDA, calcular_delta, registrar_delta
+
+
+def _linhas(alteracoes, colunas=COLUNAS_DELTA):
+    """
+    Linhas do delta como listas, com None nas células vazias.
+    """
+    tabela = alteracoes[colunas].astype(object)
+    return tabela.where(tabela.notna(), None).values.tolist()
+
+
+def test_sem_alteracoes():
+    df = pd.DataFrame({"CNPJ": ["1", "2"], "Valor": [1.5, np.nan]})
+    alteracoes, contagem = calcular_delta(df, df.copy(), ["CNPJ"])
+    assert list(alteracoes.columns) == COLUNAS_DELTA and alteracoes.empty
+    assert contagem == {INSERIDA: 0, ALTERADA: 0, REMOVIDA: 0}
+
+
+def test_inseridas_alteradas_e_removidas_por_chave():
+    antes = pd.DataFrame({"CNPJ": ["1", "2", "3"], "Valor": [10.0, 20.0, 30.0], "Obs": ["a", None, "c"]})
+    depois = pd.DataFrame({"CNPJ": ["2", "1", "4"], "Valor": [20.0, 11.0, 40.0], "Obs": [None, "a", None]})
+    alteracoes, contagem = calcular_delta(antes, depois, ["CNPJ"])
+
+    assert contagem == {INSERIDA: 1, ALTERADA: 1, REMOVIDA: 1}
+    assert _linhas(alteracoes) == [
+        [ALTERADA, 2, 3, "Valor", 10.0, 11.0],
+        [INSERIDA, None, 4, "CNPJ", None, "4"],
+        [INSERIDA, None, 4, "Valor", None, 40.0],
+        [REMOVIDA, 4, None, "CNPJ", "3", None],
+        [REMOVIDA, 4, None, "Valor", 30.0, None],
+        [REMOVIDA, 4, None, "Obs", "c", None],
+    ]
+
+
+def test_chaves_repetidas_casadas_uma_a_uma():
+    antes = pd.DataFrame({"CNPJ": ["1", "1"], "Valor": [1, 2]})
+    depois = pd.DataFrame({"CNPJ": ["1", "1", "1"], "Valor": [1, 3, 5]})
+    alteracoes, contagem = calcular_delta(antes, depois, ["CNPJ"])
+    assert contagem == {INSERIDA: 1, ALTERADA: 1, REMOVIDA: 0}
+    assert alteracoes.loc[alteracoes["Operação"] == ALTERADA, ["Antes", "Depois"]].values.tolist() == [[2, 3]]
+
+
+def test_tipo_e_soma_refeita_nao_contam_como_alteracao():
+    antes = pd.DataFrame({"Qtd": [1, 2], "Valor": [59.91, 1.0], "Texto": ["x", "y"]})
+    depois = pd.DataFrame({"Qtd": [1.0, 2.0], "Valor": [59.910000000000004, 1.0], "Texto": ["x", "y"]})
+    assert calcular_delta(antes, depois)[1][ALTERADA] == 0
+
+
+def test_colunas_novas_e_removidas():
+    antes = pd.DataFrame({"A": [1], "B": ["b"]})
+    depois = pd.DataFrame({"A": [1], "C": ["c"]})
+    alteracoes, contagem = calcular_delta(antes, depois)
+    assert contagem[ALTERADA] == 1
+    assert _linhas(alteracoes, ["Coluna", "Antes", "Depois"]) == [["C", None, "c"], ["B", "b", None]]
+
+
+def test_registrar_delta(tmp_path):
+    antes = pd.DataFrame({"A": [1, 2]})
+    assert not registrar_delta("teste", antes, antes.copy(), pasta=str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+    assert registrar_delta("teste", antes, pd.DataFrame({"A": [1, 3]}), pasta=str(tmp_path))
+    [arquivo] = tmp_path.iterdir()
+    assert arquivo.name.startswith("teste_delta_") and arquivo.suffix == ".xlsx"
+    assert pd.read_excel(arquivo)[["Coluna", "Antes", "Depois"]].values.tolist() == [["A", 2, 3]]
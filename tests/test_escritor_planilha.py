@@ -0,0 +1,91 @@
+import datetime
+import os
+import stat
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.comments import Comment
+
+import escritor_planilha
+from escritor_planilha import EstruturaNaoSuportada, substituir_aba
+
+
+def _criar_planilha(caminho):
+    with pd.ExcelWriter(caminho, engine='openpyxl') as writer:
+        pd.DataFrame({"x": [1, 2]}).to_excel(writer, sheet_name="Dados", index=False)
+        pd.DataFrame({"y": ["a"]}).to_excel(writer, sheet_name="Outra", index=False)
+    return caminho
+
+
+@pytest.fixture
+def planilha(tmp_path):
+    return _criar_planilha(tmp_path / "planilha.xlsx")
+
+
+def _dados():
+    return pd.DataFrame({
+        "Texto": ["a", None, "<&>"],
+        "Inteiro": [1, 2, 3],
+        "Valor": [1.5, np.nan, -2.25],
+        "Data": pd.to_datetime(["2024-01-31 00:00:00", None, "2024-02-01 10:30:00"]),
+        "Dia": [datetime.date(2024, 3, 1), None, None],
+    })
+
+
+def _ler(caminho, aba):
+    return pd.read_excel(caminho, sheet_name=aba)
+
+
+def test_mesmo_resultado_que_o_excel_writer(planilha, tmp_path, monkeypatch):
+    substituir_aba(planilha, "Dados", _dados())
+
+    referencia = _criar_planilha(tmp_path / "referencia.xlsx")
+    monkeypatch.setattr(escritor_planilha, "ESCRITA_RAPIDA_ATIVA", False)
+    substituir_aba(referencia, "Dados", _dados())
+
+    assert load_workbook(planilha).sheetnames == ["Dados", "Outra"]
+    pd.testing.assert_frame_equal(_ler(planilha, "Dados"), _ler(referencia, "Dados"))
+    pd.testing.assert_frame_equal(_ler(planilha, "Outra"), pd.DataFrame({"y": ["a"]}))
+
+
+def test_mantem_permissoes_e_nao_deixa_temporario(planilha):
+    os.chmod(planilha, 0o644)
+    substituir_aba(planilha, "Dados", _dados())
+    assert stat.S_IMODE(os.stat(planilha).st_mode) == 0o644
+    assert sorted(arquivo.name for arquivo in planilha.parent.iterdir()) == ["planilha.xlsx"]
+
+
+def test_falha_nao_deixa_temporario_nem_altera_a_planilha(planilha, monkeypatch):
+    original = planilha.read_bytes()
+
+    def falhar(*args):
+        raise OSError("planilha aberta")
+    monkeypatch.setattr(escritor_planilha.os, "replace", falhar)
+    with pytest.raises(OSError):
+        substituir_aba(planilha, "Dados", _dados())
+    assert planilha.read_bytes() == original
+    assert [arquivo.name for arquivo in planilha.parent.iterdir()] == ["planilha.xlsx"]
+
+
+def test_aba_com_relacoes_usa_o_excel_writer(tmp_path):
+    caminho = tmp_path / "comentario.xlsx"
+    pasta = Workbook()
+    pasta.active.title = "Dados"
+    pasta.active["A1"] = "x"
+    pasta.active["A1"].comment = Comment("nota", "autor")
+    pasta.save(caminho)
+
+    with pytest.raises(EstruturaNaoSuportada):
+        escritor_planilha._substituir_aba_rapido(caminho, "Dados", _dados())
+    assert [arquivo.name for arquivo in tmp_path.iterdir()] == ["comentario.xlsx"]
+
+    substituir_aba(caminho, "Dados", _dados())
+    assert _ler(caminho, "Dados")["Inteiro"].tolist() == [1, 2, 3]
+
+
+def test_aba_inexistente_e_criada(planilha):
+    substituir_aba(planilha, "Nova", _dados())
+    assert load_workbook(planilha).sheetnames == ["Dados", "Outra", "Nova"]
+    assert _ler(planilha, "Nova")["Texto"].tolist()[::2] == ["a", "<&>"]
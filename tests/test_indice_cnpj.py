@@ -0,0 +1,104 @@
+import random
+
+import pytest
+from fuzzywuzzy import fuzz, process
+
+from indice_cnpj import ArvoreBK, IndiceCnpj, distancia_levenshtein, raio_maximo
+
+
+def _cnpjs_com_erros(semente, quantidade):
+    """
+    Lista de referência com CNPJs, CPFs e repetidos, e consultas com erros de digitação.
+    """
+    aleatorio = random.Random(semente)
+    referencia = [''.join(aleatorio.choice('0123456789') for _ in range(aleatorio.choice([11, 14, 14, 14])))
+                  for _ in range(quantidade)]
+    referencia += aleatorio.sample(referencia, 10)  # Repetidos: o empate vai para a primeira ocorrência
+    consultas = []
+    for cnpj in aleatorio.sample(referencia, 150):
+        digitos = list(cnpj)
+        for _ in range(aleatorio.randint(0, 3)):
+            operacao = aleatorio.choice(['trocar', 'remover', 'inserir'])
+            posicao = aleatorio.randrange(len(digitos))
+            if operacao == 'trocar':
+                digitos[posicao] = aleatorio.choice('0123456789')
+            elif operacao == 'remover' and len(digitos) > 1:
+                del digitos[posicao]
+            else:
+                digitos.insert(posicao, aleatorio.choice('0123456789'))
+        consultas.append(''.join(digitos))
+    # Raízes iguais com estabelecimentos diferentes geram empates e quase-empates
+    consultas += [cnpj[:8] + '000199' for cnpj in referencia[:20] if len(cnpj) == 14]
+    return referencia, consultas
+
+
+def _extract_one(consulta, referencia, limiar):
+    melhor = process.extractOne(consulta, referencia, scorer=fuzz.ratio)
+    return (melhor[0], melhor[1]) if melhor and melhor[1] >= limiar else None
+
+
+@pytest.mark.parametrize("limiar", [70, 85, 90, 95, 100])
+def test_melhor_match_igual_ao_extract_one(limiar):
+    referencia, consultas = _cnpjs_com_erros(limiar, 300)
+    indice = IndiceCnpj(referencia, limiar)
+    for consulta in consultas:
+        assert indice.melhor_match(consulta) == _extract_one(consulta, referencia, limiar), consulta
+
+
+def test_empate_vai_para_o_primeiro_da_referencia():
+    consulta = '12345678000100'
+    for referencia in [['12345678000101', '12345678000109'], ['12345678000109', '12345678000101'],
+                       ['99999999999999', '12345678000109', '12345678000101', '12345678000109']]:
+        assert IndiceCnpj(referencia, 90).melhor_match(consulta) == _extract_one(consulta, referencia, 90)
+        assert IndiceCnpj(referencia, 90).dois_melhores(consulta)[0] == _extract_one(consulta, referencia, 90)
+
+
+def test_dois_melhores_comeca_pelo_melhor_match():
+    referencia, consultas = _cnpjs_com_erros(7, 300)
+    indice = IndiceCnpj(referencia, 80)
+    for consulta in consultas:
+        pares = indice.dois_melhores(consulta)
+        melhor = indice.melhor_match(consulta)
+        assert (pares[0] if pares else None) == melhor
+        if len(pares) == 2:
+            assert pares[0][1] >= pares[1][1] >= 80
+
+
+def test_priorizar_raiz_prefere_a_mesma_empresa():
+    referencia = ['11111111000100', '11111112000199', '22222222000100']
+    consulta = '11111112000100'
+    # Sem prioridade vence o CNPJ de outra raiz, a um dígito de distância (como no extractOne)
+    assert IndiceCnpj(referencia, 85).melhor_match(consulta) == ('11111111000100', 93)
+    assert IndiceCnpj(referencia, 85).melhor_match(consulta) == _extract_one(consulta, referencia, 85)
+    assert IndiceCnpj(referencia, 85, priorizar_raiz=True).melhor_match(consulta) == ('11111112000199', 86)
+    # Se nenhum da mesma raiz atinge o limiar, a busca segue pelas demais empresas
+    assert IndiceCnpj(referencia, 90, priorizar_raiz=True).melhor_match(consulta) == ('11111111000100', 93)
+
+
+def test_referencia_vazia():
+    assert IndiceCnpj([], 90).melhor_match('12345678000195') is None
+
+
+def test_arvore_bk_encontra_todos_dentro_do_raio():
+    aleatorio = random.Random(3)
+    palavras = [''.join(aleatorio.choice('0123') for _ in range(aleatorio.randint(3, 8))) for _ in range(200)]
+    arvore = ArvoreBK(palavras)
+    # Palavras repetidas aparecem uma vez, com a posição da primeira ocorrência
+    primeiras = {}
+    for posicao, palavra in enumerate(palavras):
+        primeiras.setdefault(palavra, posicao)
+    for consulta in palavras[:20] + ['0000', '12']:
+        for raio in range(4):
+            esperado = sorted((palavra, posicao) for palavra, posicao in primeiras.items()
+                              if distancia_levenshtein(consulta, palavra) <= raio)
+            assert sorted(arvore.buscar(consulta, raio)) == esperado
+
+
+def test_raio_maximo_nao_descarta_candidatos_que_atingem_o_limiar():
+    for limiar in [50, 80, 90, 95, 100]:
+        for tamanho in [8, 11, 14, 20]:
+            raio = raio_maximo(tamanho, limiar)
+            # Pior caso para o raio: um candidato a 'raio + 1' remoções da consulta não atinge o limiar
+            for tamanho_candidato in range(1, tamanho + 1):
+                if raio is not None and tamanho - tamanho_candidato > raio:
+                    assert fuzz.ratio('1' * tamanho, '1' * tamanho_candidato) < limiar
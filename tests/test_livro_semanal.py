@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import controle_semanal as cs
+from livro_semanal import SEMANA_BASE, LivroSemanal
+
+
+@pytest.fixture
+def livro(tmp_path):
+    livro = LivroSemanal(str(tmp_path / "livro.sqlite3"))
+    yield livro
+    livro.fechar()
+
+
+def _valores(linhas):
+    return pd.DataFrame(linhas, columns=['cnpj_chave', 'cnpj_tipo', 'nome', 'valor'])
+
+
+def _relatorio(linhas):
+    return pd.DataFrame(linhas, columns=['CNPJ_CHAVE', 'CNPJ_TIPO', 'NOME_LIMPO', cs.COL_ANTERIOR_CNPJ,
+                                         cs.COL_ANTERIOR_NOME, cs.COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO])
+
+
+def test_semana_aplicada_uma_vez_so(livro):
+    livro.registrar_saldos_iniciais(_valores([(1, 14, 'a', 100.0), (2, 14, 'b', 0.0)]))
+    assert livro.registrar_semana('s1', _valores([(1, 14, 'a', 10.0), (3, 11, 'c', 5.0)]))
+    assert not livro.registrar_semana('s1', _valores([(1, 14, 'a', 10.0)]))
+    assert livro.saldos().to_dict() == {(1, 14, 'a'): 110.0, (2, 14, 'b'): 0.0, (3, 11, 'c'): 5.0}
+
+
+def test_saldos_iniciais_nao_sobrescrevem_lojas_do_livro(livro):
+    assert livro.registrar_saldos_iniciais(_valores([(1, 14, 'a', 100.0)])) == 1
+    assert livro.registrar_saldos_iniciais(_valores([(1, 14, 'a', 999.0), (2, 14, 'b', 1.0)])) == 1
+    assert livro.saldos()[(1, 14, 'a')] == 100.0
+    bases = livro.conexao.execute("SELECT COUNT(*) FROM lancamentos WHERE semana = ?", (SEMANA_BASE,)).fetchone()
+    assert bases[0] == 2
+
+
+def test_correcao_manual_vale_na_semana_seguinte(livro):
+    livro.registrar_saldos_iniciais(_valores([(1, 14, 'a', 100.0), (2, 14, 'b', 50.0)]))
+    livro.registrar_semana('s1', _valores([(2, 14, 'b', 5.0)]))
+
+    # O operador corrige à mão a loja 'a', que não teve pagamento na semana
+    relatorio = _relatorio([(1, 14, 'a', '1', 'A', 80.0), (2, 14, 'b', '2', 'B', 55.0)])
+    saldos, divergentes = cs.conciliar_com_livro(livro, relatorio, np.array([True, False]))
+    assert saldos.tolist() == [80.0, 55.0]
+    assert divergentes[['Valor_Planilha', 'Saldo_Livro']].values.tolist() == [[80.0, 100.0]]
+
+    # O ajuste fica no livro: a divergência não se repete e o próximo pagamento soma sobre a correção
+    relatorio[cs.COL_ANTERIOR_VALOR_LIQUIDADO_PASSADO] = saldos
+    _, divergentes = cs.conciliar_com_livro(livro, relatorio, np.array([True, True]))
+    assert divergentes.empty
+    livro.registrar_semana('s2', _valores([(1, 14, 'a', 20.0)]))
+    assert livro.saldos()[(1, 14, 'a')] == 100.0
+    ajuste = livro.conexao.execute("SELECT valor FROM lancamentos WHERE semana LIKE 'AJUSTE %'").fetchall()
+    assert ajuste == [(-20.0,)]
+
+
+def test_lojas_com_pagamento_seguem_o_livro(livro):
+    livro.registrar_saldos_iniciais(_valores([(1, 14, 'a', 100.0)]))
+    livro.registrar_semana('s1', _valores([(1, 14, 'a', 10.0)]))
+    relatorio = _relatorio([(1, 14, 'a', '1', 'A', 100.0)])
+    saldos, divergentes = cs.conciliar_com_livro(livro, relatorio, np.array([False]))
+    assert saldos.tolist() == [110.0] and divergentes.empty
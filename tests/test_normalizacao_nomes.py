@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+
+from normalizacao_nomes import chaves_canonicas
+
+
+def test_formas_juridicas_acentos_e_ordem_das_palavras():
+    nomes = pd.Series(['ACME COMÉRCIO LTDA - ME', 'acme comercio ltda', 'Comércio Acme S/A', 'Comercio ACME S.A.',
+                       'Padaria São José EIRELI'])
+    assert chaves_canonicas(nomes).tolist() == ['acme comercio'] * 4 + ['jose padaria sao']
+
+
+def test_vazios_e_so_forma_juridica():
+    nomes = pd.Series(['LTDA', None, np.nan, '', ' - '], dtype=object)
+    assert chaves_canonicas(nomes).tolist() == [''] * 5
+
+
+def test_mantem_o_indice():
+    nomes = pd.Series(['Bar do Zé', 'BAR DO ZE'], index=[10, 20])
+    assert chaves_canonicas(nomes).to_dict() == {10: 'bar do ze', 20: 'bar do ze'}
+
+
+def test_sa_dentro_de_palavra_nao_e_removido():
+    assert chaves_canonicas(['Casa Nova', 'Mesa Posta SA']).tolist() == ['casa nova', 'mesa posta']
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+import tratar_planilha_csv as tratar
+
+
+@pytest.fixture
+def inventario(tmp_path, monkeypatch):
+    """
+    O mesmo inventário em .xlsx, .csv e .parquet, com razão social e CNPJ vazios, CNPJ formatado
+    e numérico, espaços extras e uma linha totalmente vazia no meio.
+    """
+    monkeypatch.chdir(tmp_path)  # O cache de planilhas do modo não streaming fica na pasta temporária
+    df = pd.DataFrame({
+        'RAZÃO EMPRESARIAL': ['Loja A', 'Loja A', None, 'Loja B', None, ' Loja C ', None, 'Loja A'],
+        'CNPJ': ['12.345.678/0001-95', 12345678000195, '11222333000181', None, None, '98765432000110', None,
+                 '123.456.789-09'],
+        'NÚMERO DE SÉRIE DA POS': ['s1', 's2', 's3', 's4', 's5', None, None, 's8'],
+        'Outra': [1, 2, 3, 4, 5, 6, None, 8],
+    })
+    with pd.ExcelWriter('inventario.xlsx') as writer:
+        df.to_excel(writer, sheet_name=tratar.NOME_ABA, index=False)
+    texto = df.assign(CNPJ=df['CNPJ'].map(lambda valor: None if valor is None else str(valor)))  # CNPJ como texto
+    texto.to_csv('inventario.csv', index=False)
+    texto.to_parquet('inventario.parquet', index=False)
+    return tmp_path
+
+
+def test_leitores_do_inventario_dao_o_mesmo_resultado(inventario, monkeypatch):
+    esperado = pd.DataFrame({
+        'RAZÃO EMPRESARIAL': ['Loja A', 'Loja A', 'Loja B', 'Loja C'],
+        'CNPJ': ['12345678000195', '12345678909', '', '98765432000110'],
+        'Quantidade de Máquinas': [2, 1, 1, 1],
+    })
+    monkeypatch.setattr(tratar, 'MODO_STREAMING', True)
+    resultados = {arquivo: tratar.contar_maquinas_arquivo(arquivo)
+                  for arquivo in ['inventario.xlsx', 'inventario.csv', 'inventario.parquet']}
+    monkeypatch.setattr(tratar, 'MODO_STREAMING', False)
+    resultados['pandas'] = tratar.contar_maquinas_arquivo('inventario.xlsx')
+
+    for origem, resultado in resultados.items():
+        pd.testing.assert_frame_equal(resultado.reset_index(drop=True), esperado, check_dtype=False,
+                                      obj=origem)
@@ -0,0 +1,33 @@
+import json
+
+from varredura_limiares import resumir_varredura, salvar_varredura
+
+
+def test_resumir_varredura():
+    consultas = ['a', 'b', 'c', 'd']
+    dois_melhores = [[('A', 100), ('A2', 98)], [('B', 92), ('B2', 80)], [('C', 88)], []]
+    pesos = [3, 2, 1, 5]
+    resumo = resumir_varredura(consultas, dois_melhores, pesos, [85, 90, 95], margem=5, linhas_fora_da_varredura=4)
+
+    assert [linha["limiar"] for linha in resumo] == [85, 90, 95]
+    assert [linha["linhas_casadas"] for linha in resumo] == [4 + 6, 4 + 5, 4 + 3]
+    # Só 'a' tem o segundo candidato a até 5 pontos do melhor
+    assert [linha["linhas_ambiguas"] for linha in resumo] == [3, 3, 3]
+    # A consulta sem candidato nunca casa nem aparece nas amostras
+    assert resumo[1]["amostras"] == [{"consulta": "b", "melhor": "B", "score": 92, "segundo": "B2",
+                                      "score_segundo": 80},
+                                     {"consulta": "c", "melhor": "C", "score": 88}]
+
+
+def test_amostras_limitadas_e_mais_proximas_primeiro():
+    dois_melhores = [[('X', score)] for score in [91, 90, 89, 92, 95]]
+    resumo = resumir_varredura(list('vwxyz'), dois_melhores, [1] * 5, [90], amostras_por_limiar=2)
+    assert [amostra["consulta"] for amostra in resumo[0]["amostras"]] == ['w', 'v']
+
+
+def test_salvar_varredura(tmp_path):
+    resumo = resumir_varredura(['a'], [[('A', 90)]], [1], [90])
+    caminho = salvar_varredura("teste", resumo, {"margem": 5}, pasta=str(tmp_path))
+    with open(caminho, encoding="utf-8") as arquivo:
+        conteudo = json.load(arquivo)
+    assert conteudo == {"execucao": "teste", "parametros": {"margem": 5}, "limiares": resumo}
@@ -1,13 +1,17 @@
 import pandas as pd
 import sys  # Importa sys para poder encerrar o script em caso de erro
+import os
+import openpyxl
 
-# --- Configurações do Arquivo ---
-import pandas as pd
-import sys  # Importa sys para poder encerrar o script em caso de erro
+from cache_planilhas import CATEGORIA, QUALQUER, TEXTO, ColunasFaltandoError, ler_excel_esquema
+from chave_documento import limpar_documento
+from relatorios import descrever_colunas, mostrar_amostra
 
 # --- Configurações do Arquivo ---
+# Aceita a planilha Excel (.xlsx) ou uma exportação do inventário em CSV (.csv) ou Parquet (.parquet).
+# O formato é detectado pela extensão do arquivo.
 arquivo_xlsx = 'principal.xlsx'
-NOME_ABA = 'Inventário Analítico SPD'  # Nome exato da aba onde estão os dados
+NOME_ABA = 'Inventário Analítico SPD'  # Nome exato da aba onde estão os dados (apenas para .xlsx)
 
 # --- Nomes das Colunas Originais no Excel e Seus Novos Nomes ---
 # ATENÇÃO: Este mapeamento foi CORRIGIDO com base nos nomes das colunas
@@ -19,68 +23,229 @@ COLUNAS_PARA_PROCESSAR = {
     'NÚMERO DE SÉRIE DA POS': 'MÁQUINA'  # Cabeçalho original: 'NÚMERO DE SÉRIE DA POS' -> Novo nome: 'MÁQUINA'
 }
 
+# Esquema de leitura do modo não streaming: só estas colunas são carregadas. O CNPJ é lido como
+# texto (para não virar float) e a razão social como categoria (os nomes se repetem por máquina).
+ESQUEMA_INVENTARIO = {
+    'RAZÃO EMPRESARIAL': CATEGORIA,
+    'CNPJ': TEXTO,
+    'NÚMERO DE SÉRIE DA POS': QUALQUER,
+}
+
 # --- Caminho do arquivo de saída ---
 arquivo_saida = 'quantidade_maquinas_por_empresa.xlsx'
 
-# --- Início do Script ---
-try:
-    print(f"🔄 Lendo o arquivo '{arquivo_xlsx}' na aba '{NOME_ABA}'...")
-
-    # Lê o arquivo Excel da aba específica.
-    # Por padrão, pd.read_excel() usa a primeira linha como cabeçalho (header=0).
-    df = pd.read_excel(arquivo_xlsx, sheet_name=NOME_ABA)
+# --- Modo de Leitura ---
+# True: lê a aba linha a linha (openpyxl em modo somente leitura), guardando apenas as contagens
+# por (RAZÃO EMPRESARIAL, CNPJ). A memória cresce com o número de empresas, não de máquinas.
+# False: carrega a aba inteira com o pandas (útil para inspecionar as primeiras linhas lidas).
+MODO_STREAMING = True
 
-    print(f"✅ Arquivo '{arquivo_xlsx}' lido com sucesso da aba '{NOME_ABA}'.")
-    print("\n--- Primeiras linhas do arquivo lido (com cabeçalhos originais) ---")
-    print(df.head())
-    print("------------------------------------------------------------------")
-    print(f"Colunas originais encontradas: {list(df.columns)}")
+# --- Leitura de CSV ---
+TAMANHO_CHUNK_CSV = 500_000  # Linhas lidas por vez do CSV
+SEPARADOR_CSV = ','  # Use ';' para CSVs exportados pelo Excel em português
+ENCODING_CSV = 'utf-8'  # Use 'latin-1' se os acentos aparecerem quebrados
 
-    # --- Validação das Colunas Essenciais ---
-    # Verifica se todas as colunas originais esperadas existem no DataFrame
-    missing_cols = [col for col in COLUNAS_PARA_PROCESSAR.keys() if col not in df.columns]
 
+def validar_colunas_inventario(colunas_disponiveis, origem):
+    """
+    Verifica se as colunas originais de COLUNAS_PARA_PROCESSAR existem.
+    Em caso de falha, imprime as colunas faltando e encerra o script.
+    """
+    missing_cols = [col for col in COLUNAS_PARA_PROCESSAR.keys() if col not in colunas_disponiveis]
     if missing_cols:
-        print(f"\n❌ ERRO: A aba '{NOME_ABA}' está faltando as seguintes colunas essenciais:")
+        print(f"\n❌ ERRO: A aba '{origem}' está faltando as seguintes colunas essenciais:")
         for col in missing_cols:
             print(f"- '{col}'")
         print(
             "Por favor, verifique se os nomes das colunas no seu Excel correspondem EXATAMENTE ao mapeamento no script.")
-        print(f"As colunas DISPONÍVEIS na planilha são: {list(df.columns)}")  # Adicionado para clareza
+        print(f"As colunas DISPONÍVEIS na planilha são: {list(colunas_disponiveis)}")  # Adicionado para clareza
         sys.exit(1)  # Encerra o script com erro
 
-    # --- Seleciona as colunas relevantes e as renomeia ---
+
+def contar_maquinas(df):
+    """
+    Seleciona e renomeia as colunas de COLUNAS_PARA_PROCESSAR, limpa os dados e conta as
+    máquinas por (RAZÃO EMPRESARIAL, CNPJ). Retorna uma Series indexada pelo par.
+    Pode ser chamada por partes (chunks) e as contagens somadas com combinar_contagens.
+    """
     # Cria um novo DataFrame apenas com as colunas que você precisa e já as renomeia
     df_processar = df[list(COLUNAS_PARA_PROCESSAR.keys())].rename(columns=COLUNAS_PARA_PROCESSAR)
 
-    print(f"\n✅ Colunas relevantes selecionadas e renomeadas para: {list(df_processar.columns)}")
-
     # --- Limpeza e Padronização dos Dados das Colunas ---
-    # Assegura que os valores são strings e remove espaços em branco extras
-    df_processar['RAZÃO EMPRESARIAL'] = df_processar['RAZÃO EMPRESARIAL'].astype(str).str.strip()
+    # Assegura que os valores são strings e remove espaços em branco extras. As células vazias continuam
+    # vazias (até o pandas 2, o astype(str) as transformaria na empresa 'nan') e o groupby as descarta.
+    razao = df_processar['RAZÃO EMPRESARIAL']
+    df_processar['RAZÃO EMPRESARIAL'] = razao.astype(str).str.strip().where(razao.notna())
 
-    # Para CNPJ: Converte para string, remove quaisquer caracteres não numéricos e remove espaços
-    df_processar['CNPJ'] = df_processar['CNPJ'].astype(str).str.replace(r'[^\d]', '', regex=True).str.strip()
+    # Para CNPJ: Converte para string, remove o '.0' de floats e quaisquer caracteres não numéricos
+    df_processar['CNPJ'] = limpar_documento(df_processar['CNPJ'])
 
     df_processar['MÁQUINA'] = df_processar['MÁQUINA'].astype(str).str.strip()
-    print("✅ Dados das colunas 'RAZÃO EMPRESARIAL', 'CNPJ' e 'MÁQUINA' limpos e padronizados.")
 
     # --- Agrupa e Conta as Máquinas ---
-    print("\n🔄 Agrupando por 'RAZÃO EMPRESARIAL' e 'CNPJ' e contando as máquinas...")
-    resultado = df_processar.groupby(['RAZÃO EMPRESARIAL', 'CNPJ']).size().reset_index(name='Quantidade de Máquinas')
+    return df_processar.groupby(['RAZÃO EMPRESARIAL', 'CNPJ']).size()
+
+
+def combinar_contagens(contagens_parciais):
+    """
+    Soma as contagens parciais de cada chunk e devolve o DataFrame final
+    (RAZÃO EMPRESARIAL, CNPJ, Quantidade de Máquinas), ordenado como o groupby.
+    """
+    contagens = pd.concat(contagens_parciais)
+    if len(contagens_parciais) > 1:
+        contagens = contagens.groupby(level=[0, 1]).sum()
+    return contagens.reset_index(name='Quantidade de Máquinas')
+
+
+def contar_maquinas_streaming(caminho, nome_aba):
+    """
+    Lê a aba linha a linha, extrai apenas as colunas de COLUNAS_PARA_PROCESSAR e conta as
+    máquinas por (RAZÃO EMPRESARIAL, CNPJ) em um dicionário.
+    Retorna o mesmo DataFrame que o groupby(...).size() do modo completo: as linhas sem
+    RAZÃO EMPRESARIAL são descartadas e o CNPJ é limpo com o limpar_documento.
+    """
+    workbook = openpyxl.load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = workbook[nome_aba].iter_rows(values_only=True)
+        cabecalho = list(next(linhas, ()))
+        print(f"Colunas originais encontradas: {descrever_colunas(cabecalho)}")
+        validar_colunas_inventario(cabecalho, nome_aba)
+
+        # Posições das colunas de agrupamento (a primeira ocorrência, como no pandas)
+        idx_razao = cabecalho.index('RAZÃO EMPRESARIAL')
+        idx_cnpj = cabecalho.index('CNPJ')
+        print("✅ Colunas 'RAZÃO EMPRESARIAL', 'CNPJ' e 'MÁQUINA' localizadas. Lendo linha a linha...")
+
+        # Contagem por (razão social, CNPJ como veio na célula); o CNPJ é limpo uma vez por chave, no final
+        contagens = {}
+        for linha in linhas:
+            razao = linha[idx_razao] if idx_razao < len(linha) else None
+            if razao is None:  # Como o groupby, que descarta as chaves vazias (inclui as linhas vazias)
+                continue
+            cnpj = linha[idx_cnpj] if idx_cnpj < len(linha) else None
+            chave = (str(razao).strip(), cnpj)
+            contagens[chave] = contagens.get(chave, 0) + 1
+    finally:
+        workbook.close()
+
+    df_contagens = pd.DataFrame(
+        [(razao, cnpj, quantidade) for (razao, cnpj), quantidade in contagens.items()],
+        columns=['RAZÃO EMPRESARIAL', 'CNPJ', 'Quantidade de Máquinas']
+    )
+    df_contagens['CNPJ'] = limpar_documento(df_contagens['CNPJ'])
+    resultado = df_contagens.groupby(['RAZÃO EMPRESARIAL', 'CNPJ'], as_index=False)['Quantidade de Máquinas'].sum()
+    print(f"✅ Leitura concluída. {len(resultado)} combinações de empresa/CNPJ encontradas.")
+    return resultado
+
+
+def contar_maquinas_csv(caminho):
+    """
+    Lê o CSV em chunks de TAMANHO_CHUNK_CSV linhas, apenas com as colunas necessárias e como texto,
+    contando as máquinas de cada chunk e somando as contagens parciais no final.
+    """
+    cabecalho = pd.read_csv(caminho, sep=SEPARADOR_CSV, encoding=ENCODING_CSV, nrows=0).columns
+    print(f"Colunas originais encontradas: {descrever_colunas(cabecalho)}")
+    validar_colunas_inventario(cabecalho, caminho)
+
+    contagens_parciais = []
+    linhas_lidas = 0
+    leitor = pd.read_csv(caminho, sep=SEPARADOR_CSV, encoding=ENCODING_CSV,
+                         usecols=list(COLUNAS_PARA_PROCESSAR.keys()), dtype=str, chunksize=TAMANHO_CHUNK_CSV)
+    for chunk in leitor:
+        contagens_parciais.append(contar_maquinas(chunk))
+        linhas_lidas += len(chunk)
+        print(f"   ... {linhas_lidas} linhas processadas")
+
+    if not contagens_parciais:
+        contagens_parciais.append(contar_maquinas(pd.DataFrame(columns=list(COLUNAS_PARA_PROCESSAR.keys()))))
+    return combinar_contagens(contagens_parciais)
+
+
+def contar_maquinas_parquet(caminho):
+    """
+    Lê do Parquet apenas as colunas necessárias (projeção de colunas) e conta as máquinas.
+    """
+    import pyarrow.parquet as pq  # Dependência necessária apenas para arquivos .parquet
+
+    cabecalho = pq.read_schema(caminho).names
+    print(f"Colunas originais encontradas: {descrever_colunas(cabecalho)}")
+    validar_colunas_inventario(cabecalho, caminho)
+
+    df = pd.read_parquet(caminho, columns=list(COLUNAS_PARA_PROCESSAR.keys()))
+    return combinar_contagens([contar_maquinas(df)])
+
+
+def contar_maquinas_por_empresa(df):
+    """
+    Recebe o inventário já carregado (com os cabeçalhos originais) e retorna o DataFrame
+    (RAZÃO EMPRESARIAL, CNPJ, Quantidade de Máquinas).
+    """
+    validar_colunas_inventario(df.columns, NOME_ABA)
+    return combinar_contagens([contar_maquinas(df)])
+
+
+def contar_maquinas_arquivo(caminho=arquivo_xlsx):
+    """
+    Lê o inventário no formato indicado pela extensão (.xlsx, .csv ou .parquet) e retorna
+    o DataFrame (RAZÃO EMPRESARIAL, CNPJ, Quantidade de Máquinas).
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+
+    if extensao == '.csv':
+        print(f"🔄 Lendo o arquivo CSV '{caminho}' em partes de {TAMANHO_CHUNK_CSV} linhas...")
+        resultado = contar_maquinas_csv(caminho)
+    elif extensao in ('.parquet', '.pq'):
+        print(f"🔄 Lendo as colunas necessárias do arquivo Parquet '{caminho}'...")
+        resultado = contar_maquinas_parquet(caminho)
+    elif MODO_STREAMING:
+        print(f"🔄 Lendo o arquivo '{caminho}' na aba '{NOME_ABA}'...")
+        print("\n🔄 Modo streaming: contando as máquinas por 'RAZÃO EMPRESARIAL' e 'CNPJ' durante a leitura...")
+        resultado = contar_maquinas_streaming(caminho, NOME_ABA)
+    else:
+        print(f"🔄 Lendo o arquivo '{caminho}' na aba '{NOME_ABA}'...")
+
+        # Lê o arquivo Excel da aba específica.
+        # Por padrão, pd.read_excel() usa a primeira linha como cabeçalho (header=0).
+        # A leitura passa pelo cache local de planilhas (reaproveitada se o arquivo não mudou)
+        # e carrega apenas as colunas de ESQUEMA_INVENTARIO, já verificando se existem.
+        try:
+            df = ler_excel_esquema(caminho, NOME_ABA, ESQUEMA_INVENTARIO)
+        except ColunasFaltandoError as e:
+            validar_colunas_inventario(e.disponiveis, NOME_ABA)
+
+        print(f"✅ Arquivo '{caminho}' lido com sucesso da aba '{NOME_ABA}'.")
+        print("\n--- Primeiras linhas do arquivo lido (com cabeçalhos originais) ---")
+        mostrar_amostra(df)
+        print("------------------------------------------------------------------")
+        print(f"Colunas carregadas: {descrever_colunas(df.columns)}")
+
+        print("\n🔄 Agrupando por 'RAZÃO EMPRESARIAL' e 'CNPJ' e contando as máquinas...")
+        resultado = contar_maquinas_por_empresa(df)
+
     print("✅ Agrupamento e contagem de máquinas por empresa/CNPJ concluídos.")
+    return resultado
+
+
+def main():
+    try:
+        resultado = contar_maquinas_arquivo(arquivo_xlsx)
 
-    # --- Salva o Resultado ---
-    print(f"\n🔄 Salvando o resultado em: '{arquivo_saida}'...")
-    resultado.to_excel(arquivo_saida, index=False)  # index=False para não incluir a coluna de índice do DataFrame
+        # --- Salva o Resultado ---
+        print(f"\n🔄 Salvando o resultado em: '{arquivo_saida}'...")
+        resultado.to_excel(arquivo_saida, index=False)  # index=False para não incluir a coluna de índice do DataFrame
 
-    print(f'\n🎉 Sucesso! O resultado foi salvo em: {arquivo_saida}')
+        print(f'\n🎉 Sucesso! O resultado foi salvo em: {arquivo_saida}')
 
-except FileNotFoundError:
-    print(f"\n❌ ERRO: O arquivo '{arquivo_xlsx}' não foi encontrado.")
-    print("Por favor, verifique se o nome do arquivo está correto e se ele está na mesma pasta do script.")
-    sys.exit(1)
-except Exception as e:
-    print(f"\n❌ Ocorreu um erro inesperado durante a execução do script: {e}")
-    print("Verifique os detalhes do erro acima e a estrutura da sua planilha Excel.")
-    sys.exit(1)
\ No newline at end of file
+    except FileNotFoundError:
+        print(f"\n❌ ERRO: O arquivo '{arquivo_xlsx}' não foi encontrado.")
+        print("Por favor, verifique se o nome do arquivo está correto e se ele está na mesma pasta do script.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n❌ Ocorreu um erro inesperado durante a execução do script: {e}")
+        print("Verifique os detalhes do erro acima e a estrutura da sua planilha Excel.")
+        sys.exit(1)
+
+
+# --- Início do Script ---
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+# --- Configurações Padrão da Varredura de Limiares ---
+# Linhas cujo melhor e segundo melhor candidato diferem em até MARGEM pontos são ambíguas:
+# um erro de digitação a mais ou a menos poderia trocar o match.
+MARGEM_AMBIGUIDADE_PADRAO = 5
+AMOSTRAS_POR_LIMIAR_PADRAO = 3  # Pares mostrados por limiar, os mais próximos da fronteira
+FAIXA_FRONTEIRA_PADRAO = 2  # Só entram nas amostras pares com score a até esta distância do limiar
+PASTA_VARREDURAS_PADRAO = "varreduras"
+
+
+def resumir_varredura(consultas, dois_melhores, pesos, limiares, margem=MARGEM_AMBIGUIDADE_PADRAO,
+                      amostras_por_limiar=AMOSTRAS_POR_LIMIAR_PADRAO, faixa_fronteira=FAIXA_FRONTEIRA_PADRAO,
+                      linhas_fora_da_varredura=0):
+    """
+    Avalia vários limiares a partir de uma única pontuação.
+
+    'dois_melhores' tem, para cada consulta distinta, a lista com até dois (referencia, score)
+    do maior para o menor, e 'pesos' o número de linhas da planilha com aquela consulta.
+    'linhas_fora_da_varredura' são linhas casadas sem depender do limiar (ex.: match exato),
+    somadas às casadas de todos os limiares.
+
+    Retorna uma lista com um dicionário por limiar: linhas casadas (melhor score >= limiar),
+    linhas ambíguas (casadas e com o segundo candidato a até 'margem' pontos) e amostras de
+    pares com o melhor score perto do limiar.
+    """
+    consultas = list(consultas)
+    # Sem candidato: score1 -1 (não casa em nenhum limiar) e score2 muito baixo (não é ambígua)
+    score1 = np.array([pares[0][1] if pares else -1 for pares in dois_melhores], dtype=float)
+    score2 = np.array([pares[1][1] if len(pares) > 1 else -1000 for pares in dois_melhores], dtype=float)
+    pesos = np.asarray(pesos, dtype=np.int64)
+
+    resultado = []
+    for limiar in limiares:
+        casadas = score1 >= limiar
+        ambiguas = casadas & (score1 - score2 <= margem)
+        distancia = np.abs(score1 - limiar)
+        perto = np.flatnonzero(distancia <= faixa_fronteira)
+        perto = perto[np.argsort(distancia[perto], kind='stable')][:amostras_por_limiar]
+        resultado.append({
+            "limiar": limiar,
+            "linhas_casadas": int(pesos[casadas].sum()) + linhas_fora_da_varredura,
+            "linhas_ambiguas": int(pesos[ambiguas].sum()),
+            "amostras": [_descrever_amostra(consultas[i], dois_melhores[i]) for i in perto],
+        })
+    return resultado
+
+
+def _descrever_amostra(consulta, pares):
+    amostra = {"consulta": consulta, "melhor": pares[0][0], "score": pares[0][1]}
+    if len(pares) > 1:
+        amostra["segundo"], amostra["score_segundo"] = pares[1]
+    return amostra
+
+
+def imprimir_varredura(resumo, limiar_atual=None, total_linhas=None):
+    """
+    Mostra a tabela da varredura; o limiar em uso no script é marcado com '<- atual'.
+    """
+    print(f"\n{'Limiar':>7} {'Casadas':>9} {'Ambíguas':>9}  Amostras perto do limiar")
+    for linha in resumo:
+        marca = " <- atual" if linha["limiar"] == limiar_atual else ""
+        print(f"{linha['limiar']:>7} {linha['linhas_casadas']:>9} {linha['linhas_ambiguas']:>9}{marca}")
+        for amostra in linha["amostras"]:
+            texto = f"           '{amostra['consulta']}' -> '{amostra['melhor']}' ({amostra['score']})"
+            if "segundo" in amostra:
+                texto += f" | 2º '{amostra['segundo']}' ({amostra['score_segundo']})"
+            print(texto)
+    if total_linhas is not None:
+        print(f"Total de linhas avaliadas: {total_linhas}.")
+
+
+def salvar_varredura(nome, resumo, parametros, pasta=PASTA_VARREDURAS_PADRAO):
+    """
+    Grava a varredura em pasta/varredura_<nome>_<data>_<hora>.json e retorna o caminho.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f"varredura_{nome}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump({"execucao": nome, "parametros": parametros, "limiares": resumo},
+                  arquivo, ensure_ascii=False, indent=2, default=str)
+    return caminho